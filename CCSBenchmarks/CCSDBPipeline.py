@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import pstats
+import argparse
+import cProfile
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class CCSDBPipeline:
+    """
+    :Class Name: CCSDBPipeline
+    :Description: This class times the database stage of the ingestion, ccs_complete_db_pipeline, on generated
+                  rows of the prediction schema. It runs on the embedded sqlite backend by default, so it needs
+                  no network nor credentials, and can profile the stage with cProfile.
+
+                  Usage: python CCSBenchmarks/CCSDBPipeline.py --rows 100000 --files 4 --profile 20
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, backend="sqlite", fetch_size=5000, export_format="csv"):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets the settings of the database stage.
+
+        :param backend: The storage backend, sqlite or cassandra
+        :param fetch_size: The number of rows in each page of the export
+        :param export_format: csv or columnar
+        """
+        self.backend = backend
+        self.fetch_size = fetch_size
+        self.export_format = export_format
+
+    def ccs_run(self, num_rows, num_files, profile_top=0):
+        """
+        :Method Name: ccs_run
+        :Description: This method runs the database stage once on num_files files of num_rows rows each.
+
+        :param num_rows: The number of rows of each file
+        :param num_files: The number of files uploaded
+        :param profile_top: The number of functions of the profile to print, 0 to not profile
+        :return: The time taken in seconds
+        """
+        from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
+        from CCSCommonTasks.CCSDBOperation import CCSDBOperation
+        from CCSCommonTasks.CCSStorageBackend import CCSStorageBackend
+
+        with tempfile.TemporaryDirectory() as workspace:
+            validator = CCSDataFormatValidator(is_training=False, path=workspace, workspace=workspace)
+            column_names = validator.ccs_value_from_schema()[2]
+            random = np.random.RandomState(0)
+            upload_files = {f"file_{file_no}.xls": pd.DataFrame(random.rand(num_rows, len(column_names)) * 100,
+                                                                columns=list(column_names))
+                            for file_no in range(num_files)}
+
+            if self.backend == "sqlite":
+                from CCSCommonTasks.CCSSQLiteBackend import CCSSQLiteBackend
+                storage_backend = CCSSQLiteBackend(os.path.join(workspace, "good_data.sqlite3"))
+            else:
+                storage_backend = CCSStorageBackend.ccs_create(self.backend)
+            db_operator = CCSDBOperation(is_training=False, workspace=workspace, fetch_size=self.fetch_size,
+                                         export_format=self.export_format, storage_backend=storage_backend)
+
+            profiler = cProfile.Profile() if profile_top else None
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            num_exported = db_operator.ccs_complete_db_pipeline(column_names, validator, upload_files)
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+
+        total_rows = num_rows * num_files
+        print(f"{self.backend}: {total_rows} rows inserted, {num_exported} exported ({self.export_format}) in "
+              f"{elapsed:.2f} s, {total_rows / elapsed:.0f} rows/s")
+        if profiler is not None:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(profile_top)
+        return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Timing and profile of the database stage of the ingestion")
+    parser.add_argument("--backend", choices=["sqlite", "cassandra"], default="sqlite")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--fetch-size", type=int, default=5000)
+    parser.add_argument("--format", choices=["csv", "columnar"], default="csv")
+    parser.add_argument("--profile", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    CCSDBPipeline(backend=args.backend, fetch_size=args.fetch_size,
+                  export_format=args.format).ccs_run(args.rows, args.files, profile_top=args.profile)
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+class CCSImportTime:
+    """
+    :Class Name: CCSImportTime
+    :Description: This class measures the cold start of a serving process. It imports a module in a fresh
+                  interpreter with python -X importtime and reports the total import time, the slowest
+                  packages, the peak resident memory and which heavy training and database libraries got
+                  loaded, so that an import creeping back onto the serving path shows up.
+
+                  Usage: python CCSBenchmarks/CCSImportTime.py --module main --top 15
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Libraries which are only needed for training or for the database, not for serving predictions.
+    heavy_modules = ["xgboost", "kneed", "scipy.stats", "sklearn.ensemble", "sklearn.svm", "sklearn.model_selection",
+                     "sklearn.impute", "sklearn.feature_selection", "cassandra.cluster",
+                     "CCSTraining.CCSTrainingPipeline"]
+
+    def __init__(self, module="main"):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets the module whose import is measured.
+
+        :param module: The module to import, e.g. main
+        """
+        self.module = module
+
+    def ccs_measure(self):
+        """
+        :Method Name: ccs_measure
+        :Description: This method imports the module in a new interpreter and collects the measurements.
+
+        :return: dictionary with 'total_ms', 'max_rss_mb', 'loaded_heavy_modules' and 'imports', a list of
+                 (ms, package) sorted by the import time of the package
+        :On Failure: RuntimeError
+        """
+        script = ("import sys, json, resource\n"
+                  f"import {self.module}\n"
+                  "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+                  "if sys.platform == 'darwin':\n"
+                  "    rss = rss / 1024\n"
+                  f"print(json.dumps({{'rss_kb': rss, 'modules': [m for m in {self.heavy_modules!r} "
+                  "if m in sys.modules]}))\n")
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"Importing {self.module} failed: {process.stderr[-2000:]}")
+
+        total_ms = 0.0
+        packages = {}
+        for line in process.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative_ms = int(cumulative) / 1000
+            # Top level imports are not indented, their cumulative time includes all their sub imports.
+            if not name.startswith("  "):
+                total_ms += cumulative_ms
+            # The first import of a package includes all the modules it imports, so the largest cumulative
+            # time of any module of a package is close to what the package costs.
+            package = name.strip().split(".")[0]
+            if package != self.module:
+                packages[package] = max(packages.get(package, 0.0), cumulative_ms)
+
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        return {
+            "total_ms": total_ms,
+            "max_rss_mb": result["rss_kb"] / 1024,
+            "loaded_heavy_modules": result["modules"],
+            "imports": sorted(((ms, package) for package, ms in packages.items()), reverse=True)
+        }
+
+    def ccs_report(self, top):
+        """
+        :Method Name: ccs_report
+        :Description: This method prints the import time report.
+
+        :param top: The number of slowest packages to list
+        :return: The measurements, see ccs_measure
+        """
+        measurement = self.ccs_measure()
+        print(f"import {self.module}: {measurement['total_ms']:.0f} ms, peak RSS {measurement['max_rss_mb']:.0f} MB")
+        print(f"heavy modules loaded: {', '.join(measurement['loaded_heavy_modules']) or 'none'}")
+        for ms, name in measurement["imports"][:top]:
+            print(f"{ms:>10.1f} ms  {name}")
+        return measurement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and memory report of a serving process")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    CCSImportTime(module=args.module).ccs_report(args.top)
@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CCSLoadTest:
+    """
+    :Class Name: CCSLoadTest
+    :Description: This class runs a load test against the /api/predict endpoint of the web application started
+                  in pre-fork mode with an increasing number of worker processes, and reports the throughput
+                  for each of them to show how serving scales with the number of cores.
+
+                  Usage: python CCSBenchmarks/CCSLoadTest.py --workers 1 2 4 --requests 2000 --concurrency 32
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, port=5055, rows_per_request=1, threads=4):
+        """
+        :Method Name: __init__
+        :Description: This constructor builds the request payload from the bundled prediction data.
+
+        :param port: The port on which the server under test is started
+        :param rows_per_request: The number of mixes sent in each request
+        :param threads: The number of threads per worker process
+        """
+        self.port = port
+        self.threads = threads
+        self.url = f"http://127.0.0.1:{port}/api/predict"
+
+        records = pd.read_csv("prediction_file.csv").drop(columns=["id"]).head(rows_per_request)
+        self.payload = json.dumps(records.to_dict(orient="records")).encode()
+
+    def ccs_start_server(self, workers):
+        """
+        :Method Name: ccs_start_server
+        :Description: This method starts the application in pre-fork mode and waits until it answers.
+
+        :param workers: The number of worker processes
+        :return: The server process
+        :On Failure: RuntimeError
+        """
+        process = subprocess.Popen([sys.executable, "main.py", "--server", "prefork", "--port", str(self.port),
+                                    "--workers", str(workers), "--threads", str(self.threads)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{self.port}/", timeout=1)
+                return process
+            except OSError:
+                time.sleep(0.2)
+
+        process.terminate()
+        raise RuntimeError(f"Server with {workers} workers did not start")
+
+    def ccs_send_request(self, _):
+        """
+        :Method Name: ccs_send_request
+        :Description: This method sends a single prediction request.
+        :return: The HTTP status code
+        """
+        request = urllib.request.Request(self.url, data=self.payload, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def ccs_run_load(self, num_requests, concurrency):
+        """
+        :Method Name: ccs_run_load
+        :Description: This method sends the given number of requests from the given number of concurrent clients.
+
+        :param num_requests: The total number of requests
+        :param concurrency: The number of concurrent clients
+        :return: requests per second, number of failed requests
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(self.ccs_send_request, range(num_requests)))
+        elapsed = time.perf_counter() - start
+
+        failures = sum(1 for status in statuses if status != 200)
+        return num_requests / elapsed, failures
+
+    def ccs_run(self, worker_counts, num_requests, concurrency):
+        """
+        :Method Name: ccs_run
+        :Description: This method runs the load test for every worker count and prints the throughput table.
+
+        :param worker_counts: list of worker process counts to test
+        :param num_requests: The number of requests sent for each worker count
+        :param concurrency: The number of concurrent clients
+        :return: list of (workers, requests per second, failures)
+        """
+        results = []
+        for workers in worker_counts:
+            process = self.ccs_start_server(workers)
+            try:
+                # Warm up so that every worker has served a request before measuring.
+                self.ccs_run_load(concurrency * 2, concurrency)
+                throughput, failures = self.ccs_run_load(num_requests, concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+            results.append((workers, throughput, failures))
+
+        baseline = results[0][1]
+        print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'failed':>7}   (cores: {os.cpu_count()})")
+        for workers, throughput, failures in results:
+            print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>8.2f} {failures:>7}")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of /api/predict in pre-fork mode")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=1, help="mixes per request")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    CCSLoadTest(port=args.port, rows_per_request=args.rows, threads=args.threads).ccs_run(
+        args.workers, args.requests, args.concurrency)
@@ -1,6 +1,7 @@
 import os
-import logging
 import pandas as pd
+from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSBeforeUpload:
@@ -14,50 +15,58 @@ class CCSBeforeUpload:
     Version: 1.0
     """
 
-    def __init__(self, is_training):
+    def __init__(self, is_training, workspace=""):
+        """
+        :Method Name: __init__
+        :Description: This constructor initializes the paths and the logging feature.
+        :param is_training: Whether this class is instantiated for training.
+        :param workspace: directory of the job under which the validation manifest is stored.
+        """
 
         if is_training:
-            self.good_raw_path = "CCSDIV/ValidatedData/GoodRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/ValidatedData/manifest.json")
             if not os.path.isdir("CCSLogFiles/training/"):
                 os.mkdir("CCSLogFiles/training/")
             self.log_path = "CCSLogFiles/training/CCSBeforeUpload.txt"
             self.operation = "TRAINING"
         else:
-            self.good_raw_path = "CCSDIV/PredictionData/GoodRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/PredictionData/manifest.json")
             if not os.path.isdir("CCSLogFiles/prediction/"):
                 os.mkdir("CCSLogFiles/prediction/")
             self.log_path = "CCSLogFiles/prediction/CCSBeforeUpload.txt"
             self.operation = "PREDICTION"
 
-        self.ccs_before_upload_logging = logging.getLogger("ccs_before_upload_log")
-        self.ccs_before_upload_logging.setLevel(logging.INFO)
-        ccs_before_upload_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_before_upload_handler.setFormatter(formatter)
-        self.ccs_before_upload_logging.addHandler(ccs_before_upload_handler)
+        self.ccs_before_upload_logging = CCSLogger().ccs_get_logger(self.log_path)
 
-    def ee_replace_missing_with_null(self):
+    def ee_replace_missing_with_null(self, parsed_files=None):
         """
         :Method Name: ee_replace_missing_with_null
-        :Description: This method replaces all the missing values with 'null'.
-        :return: None
+        :Description: This method prepares the good files for the upload to the database. The missing values are
+                      kept as NaN in the tables, so the numerical columns keep their float datatype; they are
+                      bound as null when the rows are inserted (see CCSDBOperation.ccs_insert_good_data), so the
+                      files do not have to be rewritten.
+        :param parsed_files: dictionary of filename -> the already parsed table of each good file. The good files
+                             of the validation manifest are parsed if None. The tables are not modified.
+        :return: dictionary of filename -> table, ready for the upload to the database
         :On Failure: Exception
         """
 
         try:
 
-            # Find all the files in the acceptable files folder and fill 'null' wherever there are missing values.
-            # 'null' is being used so that cassandra database can accept missing values even in numerical columns.
+            if parsed_files is None:
+                manifest = CCSDataFormatValidator.ccs_load_manifest(self.manifest_path)
+                parsed_files = {filename: pd.read_excel(verdict["path"])
+                                for filename, verdict in sorted(manifest.items()) if verdict["valid"]}
 
-            for filename in os.listdir(self.good_raw_path):
-                print(filename)
-                temp_df = pd.read_excel(os.path.join(self.good_raw_path, filename))
-                temp_df.fillna('null', inplace=True)
-                temp_df.to_excel(os.path.join(self.good_raw_path, filename), header=True, index=None)
-                message = f"{self.operation}: {filename} transformed successfully"
+            transformed_files = {}
+            for filename, parsed_df in parsed_files.items():
+                transformed_files[filename] = parsed_df
+                message = f"{self.operation}: {filename} transformed successfully, " \
+                          f"{int(parsed_df.isna().sum().sum())} missing values to be stored as null"
                 self.ccs_before_upload_logging.info(message)
 
+            return transformed_files
+
         except Exception as e:
             message = f"Data Transformation Failed: {str(e)}"
             self.ccs_before_upload_logging.error(message)
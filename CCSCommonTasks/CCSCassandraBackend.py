@@ -0,0 +1,162 @@
+import os
+from CCSCommonTasks.CCSLogger import CCSLogger
+from CCSCommonTasks.CCSStorageBackend import CCSStorageBackend
+from CCSCommonTasks.CCSSessionManager import CCSSessionManager
+
+
+class CCSCassandraBackend(CCSStorageBackend):
+    """
+    :Class Name: CCSCassandraBackend
+    :Description: This class stores the good data in the cassandra database of DataStax Astra, through the
+                  session shared by the process (see CCSSessionManager). Insertions are prepared statements sent
+                  concurrently and tables are read with the paging of the driver.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    name = "cassandra"
+
+    def __init__(self, insert_concurrency=None):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature, the session manager and the settings of the
+                      insertions.
+
+        :param insert_concurrency: maximum number of insertions in flight at a time. Read from
+                                   CCS_DB_INSERT_CONCURRENCY if None.
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSCassandraBackend.txt")
+
+        self.ccs_cassandra_backend_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        if insert_concurrency is None:
+            insert_concurrency = int(os.getenv("CCS_DB_INSERT_CONCURRENCY", 64))
+        self.insert_concurrency = insert_concurrency
+        self.session_manager = CCSSessionManager()
+        # Prepared insertions: query -> prepared statement.
+        self.prepared_statements = {}
+
+    def ccs_session(self):
+        """
+        :Method Name: ccs_session
+        :Description: This method gives the session connected to the keyspace of the project. The session is
+                      shared by the whole process, it must not be shut down after use.
+        :return: cassandra session
+        :On Failure: cassandra.cluster.NoHostAvailable, Exception
+        """
+        return self.session_manager.ccs_get_session()
+
+    def ccs_create_table(self, table_name, column_types):
+        """
+        :Method Name: ccs_create_table
+        :Description: This method creates the table with the datatypes of the schema, which are cql datatypes.
+                      See CCSStorageBackend for the parameters.
+        :On Failure: Exception
+        """
+        try:
+            columns = "".join(f"\"{col_name}\" {col_type}," for col_name, col_type in column_types.items())
+            # columns[:-1] is used to not consider the ',' at the end.
+            self.ccs_session().execute(f"CREATE TABLE IF NOT EXISTS {table_name}(id int primary key,{columns[:-1]});")
+
+        except Exception as e:
+            message = f"Error while creating the table {table_name}: {str(e)}"
+            self.ccs_cassandra_backend_logging.error(message)
+            raise e
+
+    def ccs_truncate_table(self, table_name):
+        """
+        :Method Name: ccs_truncate_table
+        :Description: This method deletes all the rows of the table.
+                      See CCSStorageBackend for the parameters.
+        :On Failure: Exception
+        """
+        try:
+            self.ccs_session().execute(f"truncate table {table_name};")
+
+        except Exception as e:
+            message = f"Error while truncating the table {table_name}: {str(e)}"
+            self.ccs_cassandra_backend_logging.error(message)
+            raise e
+
+    def ccs_insert_rows(self, table_name, column_names, rows):
+        """
+        :Method Name: ccs_insert_rows
+        :Description: This method inserts the rows with a prepared statement, with at most insert_concurrency
+                      of them in flight at a time.
+                      See CCSStorageBackend for the parameters.
+        :On Failure: ImportError if the cassandra driver is not installed, Exception
+        """
+        try:
+            from cassandra.concurrent import execute_concurrent_with_args
+
+            session = self.ccs_session()
+            col_names = ",".join(["id"] + [f"\"{col_name}\"" for col_name in column_names])
+            placeholders = ",".join("?" * (len(column_names) + 1))
+            query = f"INSERT INTO {table_name}({col_names}) VALUES ({placeholders});"
+            # The insertion is prepared only once as it is the same for all the files.
+            if query not in self.prepared_statements:
+                self.prepared_statements[query] = session.prepare(query)
+
+            execute_concurrent_with_args(session, self.prepared_statements[query], rows,
+                                         concurrency=self.insert_concurrency, raise_on_first_error=True)
+
+        except Exception as e:
+            message = f"Error while inserting rows into the table {table_name}: {str(e)}"
+            self.ccs_cassandra_backend_logging.error(message)
+            raise e
+
+    @staticmethod
+    def ccs_result_pages(results):
+        """
+        :Method Name: ccs_result_pages
+        :Description: This method goes through a paged result page by page. The next page is only fetched
+                      once the current one has been handed over.
+        :param results: cassandra.cluster.ResultSet of a statement with a fetch size
+        :return: generator of lists of rows
+        """
+        while True:
+            yield results.current_rows
+            if not results.has_more_pages:
+                break
+            results.fetch_next_page()
+
+    def ccs_read_pages(self, table_name, column_names=None, fetch_size=5000):
+        """
+        :Method Name: ccs_read_pages
+        :Description: This method reads the table with a statement of fetch_size rows per page.
+                      See CCSStorageBackend for the parameters.
+        :On Failure: ImportError if the cassandra driver is not installed, Exception
+        """
+        try:
+            from cassandra.query import SimpleStatement
+
+            if column_names:
+                selected_columns = ",".join(["id"] + [f"\"{col_name}\"" for col_name in column_names])
+            else:
+                selected_columns = "*"
+            statement = SimpleStatement(f"select {selected_columns} from {table_name};", fetch_size=fetch_size)
+
+            results = self.ccs_session().execute(statement)
+            # The names of the columns come with the result, no separate query on system_schema is needed.
+            headers = list(results.column_names)
+            pages = ([tuple(row[header] for header in headers) for row in page]
+                     for page in self.ccs_result_pages(results))
+            return headers, pages
+
+        except Exception as e:
+            message = f"Error while reading the table {table_name}: {str(e)}"
+            self.ccs_cassandra_backend_logging.error(message)
+            raise e
+
+    def ccs_handle_error(self, error):
+        """
+        :Method Name: ccs_handle_error
+        :Description: This method closes the session if the error means the connection is lost, so that the
+                      next operation connects again.
+                      See CCSStorageBackend for the parameters.
+        """
+        self.session_manager.ccs_invalidate(error)
@@ -0,0 +1,233 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSColumnarStore:
+    """
+    :Class Name: CCSColumnarStore
+    :Description: This class stores a dataset as a directory of binary columns, one .npy file per column with
+                  the datatype given in the schema, plus a manifest.json describing the columns. It replaces the
+                  csv handoff between ingestion and the pipelines: the columns are memory-mapped when read, so
+                  no float text has to be parsed and a block of rows only touches the pages it needs.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Datatypes of the schema and the numpy datatype they are stored with.
+    schema_dtypes = {"float": "float64", "int": "int64"}
+
+    def __init__(self, path):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the directory of the dataset.
+
+        :param path: The directory in which the columns and the manifest are stored
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSColumnarStore.txt")
+
+        self.ccs_columnar_store_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+
+    def ccs_exists(self):
+        """
+        :Method Name: ccs_exists
+        :Description: This method checks whether a complete dataset has been written to the directory.
+        :return: True if the dataset exists
+        """
+        return os.path.isfile(self.manifest_path)
+
+    def ccs_write(self, dataframe, column_types, index_label="id"):
+        """
+        :Method Name: ccs_write
+        :Description: This method writes a dataframe as binary columns. The dataset is written next to the
+                      directory and then renamed into place, so readers never see a partially written dataset.
+
+        :param dataframe: The dataframe to store
+        :param column_types: The datatypes of the columns of the dataframe in order, as in the schema
+        :param index_label: The name under which the index is stored as the first column, None to not store it
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            temp_path = f"{self.path.rstrip(os.sep)}.{os.getpid()}.tmp"
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+
+            columns = []
+            if index_label is not None:
+                columns.append((index_label, np.asarray(dataframe.index, dtype="int64")))
+            for (column, values), column_type in zip(dataframe.items(), column_types):
+                columns.append((column, values.to_numpy(dtype=self.schema_dtypes.get(column_type, "float64"))))
+
+            manifest = {"num_rows": len(dataframe), "columns": []}
+            for column_no, (column, values) in enumerate(columns):
+                filename = f"{column_no}.npy"
+                np.save(os.path.join(temp_path, filename), values)
+                manifest["columns"].append({"name": column, "dtype": str(values.dtype), "file": filename})
+
+            with open(os.path.join(temp_path, "manifest.json"), 'w') as f:
+                json.dump(manifest, f)
+
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(temp_path, self.path)
+
+            message = f"{len(dataframe)} rows and {len(columns)} columns written to {self.path}"
+            self.ccs_columnar_store_logging.info(message)
+
+        except Exception as e:
+            message = f"Error while writing the columnar dataset {self.path}: {str(e)}"
+            self.ccs_columnar_store_logging.error(message)
+            raise e
+
+    def ccs_write_chunks(self, chunks, column_names, column_types=None, block_size=100000):
+        """
+        :Method Name: ccs_write_chunks
+        :Description: This method writes a dataset given block by block, e.g. as it is read from a database.
+                      Every block is appended to raw column files as it comes, which are turned into .npy files
+                      once the number of rows is known, so only one block is held in memory at a time. As with
+                      ccs_write, the dataset is renamed into place once complete.
+
+        :param chunks: iterable of pandas dataframes, each with the columns column_names
+        :param column_names: The names of the columns, in order
+        :param column_types: dictionary of column name -> datatype as in the schema, float for the columns
+                             not in it. The values of a float column may be missing.
+        :param block_size: The number of values copied at a time into the .npy files
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            temp_path = f"{self.path.rstrip(os.sep)}.{os.getpid()}.tmp"
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+
+            column_types = column_types or {}
+            dtypes = [np.dtype(self.schema_dtypes.get(column_types.get(column), "float64"))
+                      for column in column_names]
+            raw_paths = [os.path.join(temp_path, f"{column_no}.raw") for column_no in range(len(column_names))]
+
+            num_rows = 0
+            raw_files = [open(raw_path, 'wb') for raw_path in raw_paths]
+            try:
+                for chunk in chunks:
+                    for raw_file, column, dtype in zip(raw_files, column_names, dtypes):
+                        raw_file.write(chunk[column].to_numpy(dtype=dtype).tobytes())
+                    num_rows += len(chunk)
+            finally:
+                for raw_file in raw_files:
+                    raw_file.close()
+
+            manifest = {"num_rows": num_rows, "columns": []}
+            for column_no, (column, dtype, raw_path) in enumerate(zip(column_names, dtypes, raw_paths)):
+                filename = f"{column_no}.npy"
+                values = np.lib.format.open_memmap(os.path.join(temp_path, filename), mode="w+", dtype=dtype,
+                                                   shape=(num_rows,))
+                with open(raw_path, 'rb') as raw_file:
+                    for start in range(0, num_rows, block_size):
+                        block = np.fromfile(raw_file, dtype=dtype, count=min(block_size, num_rows - start))
+                        values[start:start + len(block)] = block
+                values.flush()
+                del values
+                os.remove(raw_path)
+                manifest["columns"].append({"name": column, "dtype": str(dtype), "file": filename})
+
+            with open(os.path.join(temp_path, "manifest.json"), 'w') as f:
+                json.dump(manifest, f)
+
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(temp_path, self.path)
+
+            message = f"{num_rows} rows and {len(column_names)} columns written to {self.path}"
+            self.ccs_columnar_store_logging.info(message)
+
+        except Exception as e:
+            message = f"Error while writing the columnar dataset {self.path}: {str(e)}"
+            self.ccs_columnar_store_logging.error(message)
+            raise e
+
+    def ccs_read_manifest(self):
+        """
+        :Method Name: ccs_read_manifest
+        :Description: This method reads the description of the stored columns.
+        :return: dictionary with 'num_rows' and 'columns', a list of dictionaries with 'name', 'dtype' and 'file'
+        """
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def ccs_open_columns(self):
+        """
+        :Method Name: ccs_open_columns
+        :Description: This method memory-maps every stored column. Nothing is read from disk until the
+                      values are accessed.
+        :return: number of rows, dictionary of column name -> memory-mapped numpy array
+        :On Failure: Exception
+        """
+        try:
+            manifest = self.ccs_read_manifest()
+            columns = {}
+            for column in manifest["columns"]:
+                columns[column["name"]] = np.load(os.path.join(self.path, column["file"]), mmap_mode="r")
+            return manifest["num_rows"], columns
+
+        except Exception as e:
+            message = f"Error while opening the columnar dataset {self.path}: {str(e)}"
+            self.ccs_columnar_store_logging.error(message)
+            raise e
+
+    def ccs_read(self):
+        """
+        :Method Name: ccs_read
+        :Description: This method reads the whole dataset.
+        :return: pandas dataframe
+        """
+        num_rows, columns = self.ccs_open_columns()
+        return pd.DataFrame({name: np.array(values) for name, values in columns.items()})
+
+    def ccs_read_chunks(self, chunk_size):
+        """
+        :Method Name: ccs_read_chunks
+        :Description: This method reads the dataset in blocks of a fixed number of rows. Only the pages of the
+                      block being read are loaded, so the memory used does not depend on the size of the dataset.
+
+        :param chunk_size: The number of rows in each block
+        :return: generator of pandas dataframes, with the same index as the rows would have in ccs_read
+        """
+        num_rows, columns = self.ccs_open_columns()
+        for start in range(0, num_rows, chunk_size):
+            stop = min(start + chunk_size, num_rows)
+            yield pd.DataFrame({name: np.array(values[start:stop]) for name, values in columns.items()},
+                               index=pd.RangeIndex(start, stop))
+
+    def ccs_export_csv(self, csv_path, chunk_size=100000):
+        """
+        :Method Name: ccs_export_csv
+        :Description: This method exports the dataset to a csv file, block by block.
+
+        :param csv_path: The path of the csv file to write
+        :param chunk_size: The number of rows written at a time
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            with open(csv_path, 'w', newline='') as f:
+                include_header = True
+                for chunk in self.ccs_read_chunks(chunk_size):
+                    chunk.to_csv(f, header=include_header, index=False)
+                    include_header = False
+
+            message = f"Columnar dataset {self.path} exported to {csv_path}"
+            self.ccs_columnar_store_logging.info(message)
+
+        except Exception as e:
+            message = f"Error while exporting the columnar dataset {self.path} to csv: {str(e)}"
+            self.ccs_columnar_store_logging.error(message)
+            raise e
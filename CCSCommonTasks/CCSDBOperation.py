@@ -1,30 +1,52 @@
 import os
-import cassandra
-from cassandra.query import dict_factory
+import time
 import pandas as pd
 
-import logging
 import csv
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
+from CCSCommonTasks.CCSColumnarStore import CCSColumnarStore
+from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
+from CCSCommonTasks.CCSLogger import CCSLogger
+from CCSCommonTasks.CCSStorageBackend import CCSStorageBackend
 
 
 class CCSDBOperation:
     """
-    This class will handle all the relevant operations related to Cassandra Database.
+    This class will handle all the relevant operations related to the database of the good data. The database
+    is reached through a CCSStorageBackend, cassandra or an embedded sqlite file (see CCS_STORAGE_BACKEND).
 
     Written By: Jobin Mathew
     Interning at iNeuron Intelligence
     Version: 1.0
     """
 
-    def __init__(self, is_training):
+    def __init__(self, is_training, workspace="", insert_concurrency=None, fetch_size=None, export_format=None,
+                 storage_backend=None):
         """
         :Method Name: __init__
         :Description: This constructor initializes the variable that will be utilized
                       in all the class methods
         :param is_training: Boolean variable to inform whether training has to be done
+        :param workspace: directory of the job under which the intermediate files are stored.
+        :param insert_concurrency: maximum number of insertions in flight at a time. Read from
+                                   CCS_DB_INSERT_CONCURRENCY if None.
+        :param fetch_size: number of rows read from the database in each page of the export. Read from
+                           CCS_DB_FETCH_SIZE if None.
+        :param export_format: 'csv' to export the good data to a csv file, 'columnar' to a CCSColumnarStore
+                              dataset. Read from CCS_DB_EXPORT_FORMAT if None.
+        :param storage_backend: CCSStorageBackend or name of the backend, 'cassandra' or 'sqlite'. Read from
+                                CCS_STORAGE_BACKEND if None.
         """
+        if not isinstance(storage_backend, CCSStorageBackend):
+            storage_backend = CCSStorageBackend.ccs_create(storage_backend, insert_concurrency=insert_concurrency)
+        self.storage_backend = storage_backend
+        if fetch_size is None:
+            fetch_size = int(os.getenv("CCS_DB_FETCH_SIZE", 5000))
+        self.fetch_size = fetch_size
+        if export_format is None:
+            export_format = os.getenv("CCS_DB_EXPORT_FORMAT", "csv")
+        if export_format not in ("csv", "columnar"):
+            raise ValueError(f"Unknown export format {export_format}, expected csv or columnar")
+        self.export_format = export_format
 
         if is_training:
             if not os.path.isdir("CCSLogFiles/training/"):
@@ -33,8 +55,9 @@ class CCSDBOperation:
             self.operation = "TRAINING"
             self.log_path = os.path.join("CCSLogFiles/training", "CCSDBOperation.txt")
 
-            self.good_file_dir = "CCSDIV/ValidatedData/GoodRaw/"
-            self.bad_file_dir = "CCSDIV/ValidatedData/BadRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/ValidatedData/manifest.json")
+            self.data_file = os.path.join(workspace, "db_validated_file.csv")
+            self.columnar_path = os.path.join(workspace, "db_validated_data")
             self.table_name = "good_training_data"
         else:
             if not os.path.isdir("CCSLogFiles/prediction/"):
@@ -43,56 +66,12 @@ class CCSDBOperation:
             self.operation = "PREDICTION"
             self.log_path = os.path.join("CCSLogFiles/prediction/", "CCSDBOperation.txt")
 
-            self.good_file_dir = "CCSDIV/PredictionData/GoodRaw/"
-            self.bad_file_dir = "CCSDIV/PredictionData/BadRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/PredictionData/manifest.json")
+            self.data_file = os.path.join(workspace, "db_prediction_file.csv")
+            self.columnar_path = os.path.join(workspace, "db_prediction_data")
             self.table_name = "good_prediction_data"
 
-        self.ccs_db_operation_logging = logging.getLogger("ccs_db_operation_log")
-        self.ccs_db_operation_logging.setLevel(logging.INFO)
-        ccs_db_operation_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_db_operation_handler.setFormatter(formatter)
-        self.ccs_db_operation_logging.addHandler(ccs_db_operation_handler)
-
-    def ccs_db_connection(self):
-        """
-        :Method Name: ccs_db_connection
-        :Description: This method connects to the keyspace used for storing the validated
-                      good dataset for this work.
-        :return: session which is a cassandra database connection
-        :On Failure: cassandra.cluster.NoHostAvailable, Exception
-        """
-        try:
-
-            cloud_config = {
-                'secure_connect_bundle': 'secure-connect-ineuron.zip'
-            }
-            auth_provider = PlainTextAuthProvider(os.getenv('CASSANDRA_CLIENT_ID'),
-                                                  os.getenv('CASSANDRA_CLIENT_SECRET'))
-            cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider)
-
-            session = cluster.connect()
-            session.row_factory = dict_factory
-            message = f"{self.operation}: Connection successful with cassandra database"
-            self.ccs_db_operation_logging.info(message)
-
-            session.execute("USE concrete_compressive_strength_internship;")
-
-            message = f"{self.operation}: accessed the concrete_compressive_strength_internship keyspace"
-            self.ccs_db_operation_logging.info(message)
-
-            return session
-
-        except cassandra.cluster.NoHostAvailable:
-            message = f"{self.operation}: Connection Unsuccessful with cassandra database due to Incorrect " \
-                      f"credentials or no connection from datastax"
-            self.ccs_db_operation_logging.error(message)
-            raise cassandra.cluster.NoHostAvailable
-        except Exception as e:
-            message = f"{self.operation}: Connection Unsuccessful with cassandra database: {str(e)}"
-            self.ccs_db_operation_logging.error(message)
-            raise e
+        self.ccs_db_operation_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_create_table(self, column_names):
         """
@@ -106,180 +85,135 @@ class CCSDBOperation:
 
         try:
 
-            session = self.ccs_db_connection()
-
-            table_creation_query = f"CREATE TABLE IF NOT EXISTS {self.table_name}(id int primary key,"
-            for col_name in column_names:
-                table_creation_query += f"\"{col_name}\" {column_names[col_name]},"
-            # table_creation_query[:-1] is used to not consider the ',' at the end.
-            table_creation_query = table_creation_query[:-1] + ");"
-            print(table_creation_query)
-            session.execute(table_creation_query)
-            message = f"{self.operation}: The table for Good Data created"
+            self.storage_backend.ccs_create_table(self.table_name, column_names)
+            message = f"{self.operation}: The table for Good Data created in {self.storage_backend.name} database"
             self.ccs_db_operation_logging.info(message)
 
-            session.execute(f"truncate table {self.table_name};")
+            self.storage_backend.ccs_truncate_table(self.table_name)
             message = f"{self.operation}: Any row if existing deleted"
             self.ccs_db_operation_logging.info(message)
 
         except Exception as e:
             message = f"{self.operation}: The table for Good Data was Not created: {str(e)}"
             self.ccs_db_operation_logging.info(message)
+            self.storage_backend.ccs_handle_error(e)
             raise e
 
-        finally:
-            try:
-                session.shutdown()
-                message = f"{self.operation}: Session terminated create table operation"
-                self.ccs_db_operation_logging.info(message)
-
-            except Exception as e:
-                pass
-
-    def ccs_insert_good_data(self):
+    def ccs_insert_good_data(self, upload_files=None):
         """
         :Method Name: ccs_insert_good_data
-        :Description: This method uploads all the files in the good Data folder
-                      to the good_data tables in cassandra database.
+        :Description: This method uploads all the good files of the validation manifest
+                      to the good_data tables of the database, in bulk, missing values as null. The rows are
+                      numbered across all the files, so the rows of a file do not replace those of another.
+        :param upload_files: dictionary of filename -> table already transformed for the upload. The good files
+                             of the validation manifest are parsed if None.
         :return: None
         :On Failure: Exception
         """
         try:
 
-            count = 0
-            col_names = "id,"
-            session = self.ccs_db_connection()
-
-            for filename in os.listdir(self.good_file_dir):
-                temp_df = pd.read_excel(os.path.join(self.good_file_dir, filename))
+            if upload_files is None:
+                manifest = CCSDataFormatValidator.ccs_load_manifest(self.manifest_path)
+                upload_files = {filename: pd.read_excel(verdict["path"])
+                                for filename, verdict in sorted(manifest.items()) if verdict["valid"]}
 
-                # count variable is used so the the column part of the query is created only once as it is same for all
-                # the insertion queries
-                if count == 0:
-                    for i in list(temp_df.columns):
-                        col_names += f"\"{str(i).rstrip()}\","
-                    # col_names[:-1] is used to not consider the ',' at the end
-                    col_names = col_names[:-1]
-                    count += 1
+            # The id of a row is its position in the files uploaded together.
+            first_id = 0
+            for filename, temp_df in upload_files.items():
 
-                    print(col_names)
-                # the for loop creates the values to be uploaded.
-                # it is complicated to ensure that any 'null' value in a string column is entered as null and not a
-                # simple string.
-                for i in range(len(temp_df)):
-                    # [i] is the value for id.
+                col_names = [str(i).rstrip() for i in temp_df.columns]
+                # Missing values are bound as null, the numerical columns stay float.
+                values = temp_df.astype(object).where(temp_df.notna(), None)
+                rows = ((i,) + row for i, row in enumerate(values.itertuples(index=False, name=None), first_id))
+                first_id += len(temp_df)
 
-                    temp_lis = [i] + list(temp_df.iloc[i])
-                    if 'null' in temp_lis:
-                        tup = "("
-                        for j in temp_lis:
-                            if type(j) == str:
-                                if j == 'null':
-                                    tup += f"{j},"
-                                else:
-                                    tup += f"'{j}',"
-                            else:
-                                tup += f"{j},"
-                        tup = tup[:-1] + ")"
-                    else:
-                        tup = tuple(temp_lis)
-                    insert_query = f"INSERT INTO {self.table_name}({col_names}) VALUES {tup};"
-                    print(insert_query)
-                    session.execute(insert_query)
+                start = time.perf_counter()
+                self.storage_backend.ccs_insert_rows(self.table_name, col_names, rows)
+                elapsed = time.perf_counter() - start
 
-                message = f"{self.operation}: Data in {filename} uploaded successfully to good_data table"
+                message = f"{self.operation}: Data in {filename} uploaded successfully to good_data table, " \
+                          f"{len(temp_df)} rows in {elapsed:.2f} s ({len(temp_df) / max(elapsed, 1e-9):.0f} rows/s)"
                 self.ccs_db_operation_logging.info(message)
 
         except Exception as e:
             message = f"{self.operation}: Error while uploading data to good_data table: {str(e)}"
             self.ccs_db_operation_logging.error(message)
+            self.storage_backend.ccs_handle_error(e)
             raise e
 
-        finally:
-            try:
-                session.shutdown()
-                message = f"{self.operation}: Session terminated insert data operation"
-                self.ccs_db_operation_logging.info(message)
-
-            except Exception as e:
-                pass
-
-    def ccs_data_from_db_to_csv(self):
+    def ccs_export_good_data(self, column_names=None):
         """
-        :Method Name: ccs_data_from_db_to_csv
-        :Description: This method downloads all the good data from the cassandra
-                      database to a csv file for preprocessing and training.
-        :return: None
+        :Method Name: ccs_export_good_data
+        :Description: This method downloads all the good data from the database for preprocessing
+                      and training. The table is read in pages of fetch_size rows and every page is written
+                      out before the next one is fetched, so the memory used does not depend on the size of
+                      the table. The data is written to the csv file data_file, or to the columnar dataset
+                      columnar_path, as set by export_format. Both are files of their own, apart from the ones
+                      written by CCSDataFormatValidator, as the export runs on the sync worker meanwhile.
+        :param column_names: The column names of the table as in the schema, exported in this order after the id.
+                             All the columns are exported, in the order of the database, if None.
+        :return: The number of rows exported
         :On Failure: Exception
         """
         try:
-            session = self.ccs_db_connection()
-            if self.operation == 'TRAINING':
-                data_file = 'validated_file.csv'
-                col_name_query = "select column_name from system_schema.columns where keyspace_name=" \
-                                 "'concrete_compressive_strength_internship' and table_name='good_training_data'; "
+            start = time.perf_counter()
+            headers, pages = self.storage_backend.ccs_read_pages(self.table_name, column_names, self.fetch_size)
+
+            num_rows = 0
+            num_pages = 0
+            if self.export_format == "columnar":
+                def chunks():
+                    nonlocal num_rows, num_pages
+                    for page in pages:
+                        num_rows += len(page)
+                        num_pages += 1
+                        yield pd.DataFrame.from_records(page, columns=headers)
+
+                column_types = dict(column_names or {})
+                column_types["id"] = "int"
+                CCSColumnarStore(self.columnar_path).ccs_write_chunks(chunks(), headers, column_types)
+                export_path = self.columnar_path
             else:
-                data_file = 'prediction_file.csv'
-                col_name_query = "select column_name from system_schema.columns where keyspace_name=" \
-                                 "'concrete_compressive_strength_internship' and table_name='good_prediction_data'; "
-
-            headers = []
-            result = session.execute(col_name_query)
-            for i in result:
-
-                headers.append(str(i['column_name']))
-                print(i['column_name'])
-
-            get_all_data_query = f"select * from {self.table_name};"
-            results = session.execute(get_all_data_query)
-            data = []
-
-            for result in results:
-                row = []
-                for header in headers:
-                    # lower() because cassandra database converts all column names to lower case.
-                    row.append(result[header])
-                data.append(row)
-
-            with open(data_file, 'w', newline='') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow(headers)
-                csv_writer.writerows(data)
-
-            message = f"{self.operation}: All data from good data table saved to {data_file}"
+                with open(self.data_file, 'w', newline='') as csv_file:
+                    csv_writer = csv.writer(csv_file)
+                    csv_writer.writerow(headers)
+                    for page in pages:
+                        csv_writer.writerows(page)
+                        num_rows += len(page)
+                        num_pages += 1
+                export_path = self.data_file
+            elapsed = time.perf_counter() - start
+
+            message = f"{self.operation}: All data from good data table saved to {export_path}, {num_rows} rows " \
+                      f"in {num_pages} pages of up to {self.fetch_size} in {elapsed:.2f} s " \
+                      f"({num_rows / max(elapsed, 1e-9):.0f} rows/s)"
             self.ccs_db_operation_logging.info(message)
 
+            return num_rows
+
         except Exception as e:
-            message = f"{self.operation}: Error while downloading good data into csv file: {str(e)}"
+            message = f"{self.operation}: Error while exporting the good data: {str(e)}"
             self.ccs_db_operation_logging.error(message)
+            self.storage_backend.ccs_handle_error(e)
             raise e
 
-        finally:
-            try:
-                session.shutdown()
-                message = f"Session terminated after downloading good data into csv file from table{self.table_name}"
-                self.ccs_db_operation_logging.info(message)
-
-            except Exception as e:
-                pass
-
-    def ccs_complete_db_pipeline(self, column_names, data_format_validator):
+    def ccs_complete_db_pipeline(self, column_names, data_format_validator, upload_files=None):
         """
         :Method Name: ccs_complete_db_pipeline
         :Description: This methods is written so that it can be run on a background thread to make ensure our web app
                       first makes the prediction to ensure less latency.
                       Only after the prediction is displayed on the web app does the database operations begin.
         :param column_names: The column names of the table in the cassandra database.
-        :param data_format_validator: An object of EEDataFormatPred class to perform deletion and transfer of files
-        :return: None
+        :param data_format_validator: An object of CCSDataFormatValidator to archive the bad files
+        :param upload_files: dictionary of filename -> table to upload, the good files of the manifest are parsed if None
+        :return: The number of rows exported from the database
         :On Failure: Exception
         """
         try:
             self.ccs_create_table(column_names=column_names)
-            self.ccs_insert_good_data()
-            data_format_validator.ccs_delete_existing_good_data_folder()
+            self.ccs_insert_good_data(upload_files)
             data_format_validator.ccs_move_bad_files_to_archive()
-            self.ccs_data_from_db_to_csv()
+            return self.ccs_export_good_data(column_names)
 
         except Exception as e:
             message = f"{self.operation}: Error in Database Pipeline: {str(e)}"
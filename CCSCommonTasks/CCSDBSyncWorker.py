@@ -0,0 +1,304 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is not available on Windows, syncs are then only serialized within a process.
+    fcntl = None
+
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSDBSyncWorker:
+    """
+    :Class Name: CCSDBSyncWorker
+    :Description: This class runs the database pipelines of the uploads (see CCSDBOperation.ccs_complete_db_pipeline)
+                  one at a time on a single background thread of the process, instead of one thread per upload.
+
+                  Every pipeline truncates and reloads the good data table of its upload, so only the latest
+                  upload of a table matters: the queue holds at most one pending sync per table, and a newer upload
+                  replaces the pending one (latest wins), which is counted as superseded. The queue is therefore
+                  bounded by the number of tables however many uploads arrive. A failed sync is retried with an
+                  exponential backoff, unless a newer upload of the same table arrives in the meantime.
+
+                  Each worker process of the server has its own queue and thread. The pipelines of a table are
+                  serialized across the processes with a file lock per table, and the time at which the loaded
+                  upload was submitted is recorded next to it: a sync of an upload older than the one already
+                  loaded by another process is skipped, so the latest upload also wins across processes.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # The queue, the worker thread and the metrics are shared by all instances in the process.
+    _condition = threading.Condition()
+    _pending = OrderedDict()
+    _running = None
+    _worker = None
+    _worker_pid = None
+    _metrics = {}
+
+    def __init__(self, max_retries=None, backoff_seconds=None, max_backoff_seconds=60, lock_dir="CCSJobs"):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the retry parameters.
+
+        :param max_retries: The number of times a failed sync is retried. Read from CCS_DB_SYNC_MAX_RETRIES if None.
+        :param backoff_seconds: The wait before the first retry, doubled at every retry. Read from
+                                CCS_DB_SYNC_BACKOFF_SECONDS if None.
+        :param max_backoff_seconds: The longest wait between two retries
+        :param lock_dir: The directory of the lock files serializing the syncs of a table across processes
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSDBSyncWorker.txt")
+
+        self.ccs_db_sync_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        if max_retries is None:
+            max_retries = int(os.getenv("CCS_DB_SYNC_MAX_RETRIES", 3))
+        if backoff_seconds is None:
+            backoff_seconds = float(os.getenv("CCS_DB_SYNC_BACKOFF_SECONDS", 1))
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self.lock_dir = lock_dir
+        if not os.path.isdir(self.lock_dir):
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    @staticmethod
+    def ccs_new_metrics():
+        """
+        :Method Name: ccs_new_metrics
+        :Description: This method returns the counters of a worker which has not synced anything yet.
+        :return: dictionary of metric -> value
+        """
+        return {"submitted": 0, "superseded": 0, "completed": 0, "failed": 0, "retries": 0,
+                "last_error": None, "last_sync_seconds": None}
+
+    def ccs_start_worker(self):
+        """
+        :Method Name: ccs_start_worker
+        :Description: This method starts the background thread running the syncs. It is started lazily, and
+                      again in a forked child process, as threads do not survive a fork. It must be called
+                      holding the condition.
+        :return: None
+        """
+        if CCSDBSyncWorker._worker is None or CCSDBSyncWorker._worker_pid != os.getpid():
+            CCSDBSyncWorker._pending = OrderedDict()
+            CCSDBSyncWorker._running = None
+            CCSDBSyncWorker._metrics = self.ccs_new_metrics()
+            CCSDBSyncWorker._worker = threading.Thread(target=self.ccs_sync_worker, daemon=True)
+            CCSDBSyncWorker._worker_pid = os.getpid()
+            CCSDBSyncWorker._worker.start()
+
+            message = f"Database sync worker started with max_retries={self.max_retries}, " \
+                      f"backoff={self.backoff_seconds}s"
+            self.ccs_db_sync_logging.info(message)
+
+    def ccs_submit(self, db_operator, column_names, data_format_validator, upload_files=None):
+        """
+        :Method Name: ccs_submit
+        :Description: This method queues the database pipeline of an upload and returns at once. A sync of the
+                      same table still waiting in the queue is dropped, as this one replaces its data.
+
+        :param db_operator: The CCSDBOperation of the upload
+        :param column_names: The column names of the table, see ccs_complete_db_pipeline
+        :param data_format_validator: The CCSDataFormatValidator of the upload, see ccs_complete_db_pipeline
+        :param upload_files: dictionary of filename -> table to upload, see ccs_complete_db_pipeline
+        :return: True if a pending sync of the same table was superseded
+        """
+        key = db_operator.table_name
+        with CCSDBSyncWorker._condition:
+            self.ccs_start_worker()
+
+            superseded = CCSDBSyncWorker._pending.pop(key, None) is not None
+            # The sync is retried as set on the instance it is submitted through.
+            CCSDBSyncWorker._pending[key] = (self, time.time(), (db_operator, column_names, data_format_validator,
+                                                                 upload_files))
+            CCSDBSyncWorker._metrics["submitted"] += 1
+            if superseded:
+                CCSDBSyncWorker._metrics["superseded"] += 1
+            CCSDBSyncWorker._condition.notify_all()
+            queue_depth = len(CCSDBSyncWorker._pending)
+
+        message = f"{db_operator.operation}: Sync of {key} queued, queue depth {queue_depth}" \
+                  f"{', the pending sync superseded' if superseded else ''}"
+        self.ccs_db_sync_logging.info(message)
+        return superseded
+
+    def ccs_run_latest(self, key, submitted_at, sync):
+        """
+        :Method Name: ccs_run_latest
+        :Description: This method runs the database pipeline of one upload holding the lock of its table, unless
+                      a newer upload of the table has already been loaded by another process.
+
+        :param key: The table of the sync
+        :param submitted_at: The time at which the upload was submitted
+        :param sync: tuple of the arguments given to ccs_submit
+        :return: True if the pipeline ran, False if it was skipped
+        :On Failure: Exception
+        """
+        db_operator, column_names, data_format_validator, upload_files = sync
+        synced_path = os.path.join(self.lock_dir, f"{key}.synced")
+
+        lock_file = open(os.path.join(self.lock_dir, f"{key}.sync.lock"), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                with open(synced_path) as f:
+                    synced_at = float(f.read().strip() or 0)
+            except (OSError, ValueError):
+                synced_at = 0.0
+            if synced_at >= submitted_at:
+                return False
+
+            db_operator.ccs_complete_db_pipeline(column_names, data_format_validator, upload_files)
+
+            temp_path = f"{synced_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(repr(submitted_at))
+            os.replace(temp_path, synced_path)
+            return True
+
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def ccs_run_sync(self, key, submitted_at, sync):
+        """
+        :Method Name: ccs_run_sync
+        :Description: This method runs the database pipeline of one upload, retrying it with an exponential
+                      backoff when it fails. The retries stop early when a newer upload of the same table is queued.
+
+        :param key: The table of the sync
+        :param submitted_at: The time at which the upload was submitted
+        :param sync: tuple of the arguments given to ccs_submit
+        :return: None
+        """
+        db_operator = sync[0]
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if not self.ccs_run_latest(key, submitted_at, sync):
+                    with CCSDBSyncWorker._condition:
+                        CCSDBSyncWorker._metrics["superseded"] += 1
+
+                    message = f"{db_operator.operation}: Sync of {key} skipped, a newer upload was loaded by " \
+                              f"another process"
+                    self.ccs_db_sync_logging.info(message)
+                    return
+                elapsed = time.perf_counter() - start
+                with CCSDBSyncWorker._condition:
+                    CCSDBSyncWorker._metrics["completed"] += 1
+                    CCSDBSyncWorker._metrics["last_sync_seconds"] = round(elapsed, 3)
+
+                message = f"{db_operator.operation}: Sync of {key} completed in {elapsed:.2f} s"
+                self.ccs_db_sync_logging.info(message)
+                return
+
+            except Exception as e:
+                attempt += 1
+                with CCSDBSyncWorker._condition:
+                    CCSDBSyncWorker._metrics["last_error"] = f"{key}: {str(e)}"
+                    if attempt > self.max_retries:
+                        CCSDBSyncWorker._metrics["failed"] += 1
+                if attempt > self.max_retries:
+                    message = f"{db_operator.operation}: Sync of {key} failed after {attempt} attempts: {str(e)}"
+                    self.ccs_db_sync_logging.error(message)
+                    return
+
+                delay = min(self.backoff_seconds * 2 ** (attempt - 1), self.max_backoff_seconds)
+                message = f"{db_operator.operation}: Sync of {key} failed, retry {attempt} of {self.max_retries} " \
+                          f"in {delay:.1f} s: {str(e)}"
+                self.ccs_db_sync_logging.error(message)
+
+                with CCSDBSyncWorker._condition:
+                    CCSDBSyncWorker._metrics["retries"] += 1
+                    superseded = CCSDBSyncWorker._condition.wait_for(lambda: key in CCSDBSyncWorker._pending,
+                                                                     timeout=delay)
+                if superseded:
+                    message = f"{db_operator.operation}: Retry of the sync of {key} dropped, a newer upload is queued"
+                    self.ccs_db_sync_logging.info(message)
+                    return
+
+    def ccs_sync_worker(self):
+        """
+        :Method Name: ccs_sync_worker
+        :Description: This method runs on the background thread. It takes the syncs off the queue, the oldest
+                      first, and runs them one after the other.
+        :return: None
+        """
+        while True:
+            with CCSDBSyncWorker._condition:
+                while not CCSDBSyncWorker._pending:
+                    CCSDBSyncWorker._condition.wait()
+                key, (submitter, submitted_at, sync) = CCSDBSyncWorker._pending.popitem(last=False)
+                CCSDBSyncWorker._running = key
+
+            try:
+                submitter.ccs_run_sync(key, submitted_at, sync)
+            finally:
+                with CCSDBSyncWorker._condition:
+                    CCSDBSyncWorker._running = None
+                    CCSDBSyncWorker._condition.notify_all()
+
+    @staticmethod
+    def ccs_reset_after_fork():
+        """
+        :Method Name: ccs_reset_after_fork
+        :Description: This method forgets the queue and worker of the parent in a forked child, whose condition
+                      may have been held by another thread at the time of the fork. The child starts its own
+                      worker on its first sync.
+        :return: None
+        """
+        CCSDBSyncWorker._condition = threading.Condition()
+        CCSDBSyncWorker._pending = OrderedDict()
+        CCSDBSyncWorker._running = None
+        CCSDBSyncWorker._worker = None
+        CCSDBSyncWorker._worker_pid = None
+
+    def ccs_wait_idle(self, timeout=None):
+        """
+        :Method Name: ccs_wait_idle
+        :Description: This method waits until every queued sync has been run.
+        :param timeout: The maximum time to wait in seconds, None to wait as long as needed
+        :return: True if the worker is idle
+        """
+        with CCSDBSyncWorker._condition:
+            return CCSDBSyncWorker._condition.wait_for(
+                lambda: not CCSDBSyncWorker._pending and CCSDBSyncWorker._running is None, timeout=timeout)
+
+    def ccs_metrics(self):
+        """
+        :Method Name: ccs_metrics
+        :Description: This method returns the state of the worker of this process only, every worker process
+                      of the server has its own queue and counters.
+        :return: dictionary with 'pid', the process reporting, 'queue_depth', the number of syncs waiting,
+                 'running', the table being synced if any, and the counters 'submitted', 'superseded',
+                 'completed', 'failed' and 'retries', with 'last_error' and 'last_sync_seconds'
+        """
+        with CCSDBSyncWorker._condition:
+            if CCSDBSyncWorker._worker_pid != os.getpid():
+                metrics = self.ccs_new_metrics()
+                running = None
+                queue_depth = 0
+            else:
+                metrics = dict(CCSDBSyncWorker._metrics)
+                running = CCSDBSyncWorker._running
+                queue_depth = len(CCSDBSyncWorker._pending)
+        metrics.update(pid=os.getpid(), queue_depth=queue_depth, running=running)
+        return metrics
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=CCSDBSyncWorker.ccs_reset_after_fork)
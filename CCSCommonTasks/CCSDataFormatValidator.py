@@ -2,9 +2,14 @@ import os
 import re
 import json
 import shutil
-import logging
+import threading
+import multiprocessing
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from CCSCommonTasks.CCSColumnarStore import CCSColumnarStore
+from CCSCommonTasks.CCSSchemaValidator import CCSSchemaValidator
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSDataFormatValidator:
@@ -18,7 +23,7 @@ class CCSDataFormatValidator:
     Version: 1.0
     """
 
-    def __init__(self, is_training, path):
+    def __init__(self, is_training, path, workspace=""):
         """
         :Method Name: __init__
         :Description: This method is Constructor for class CCSDataFormatValidator.
@@ -26,6 +31,7 @@ class CCSDataFormatValidator:
                       Sets up the path for storing Validated Data.
         :param is_training: Whether this class is instantiated for training.
         :param path: directory path where the files for training are present.
+        :param workspace: directory of the job under which the intermediate files are stored.
         """
 
         if is_training:
@@ -35,11 +41,12 @@ class CCSDataFormatValidator:
             self.operation = "TRAINING"
             self.dir_path = path
 
-            self.good_raw_path = "CCSDIV/ValidatedData/GoodRaw/"
-            self.bad_raw_path = "CCSDIV/ValidatedData/BadRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/ValidatedData/manifest.json")
 
             self.schema_path = "CCSSchemas/training_schema.json"
-            self.csv_filename = "validated_file.csv"
+            self.csv_filename = os.path.join(workspace, "validated_file.csv")
+            self.columnar_path = os.path.join(workspace, "validated_data")
+            self.quarantine_file = os.path.join(workspace, "quarantined_rows.csv")
 
         else:
             if not os.path.isdir("CCSLogFiles/prediction/"):
@@ -49,19 +56,19 @@ class CCSDataFormatValidator:
 
             self.dir_path = path
 
-            self.good_raw_path = "CCSDIV/PredictionData/GoodRaw/"
-            self.bad_raw_path = "CCSDIV/PredictionData/BadRaw/"
+            self.manifest_path = os.path.join(workspace, "CCSDIV/PredictionData/manifest.json")
 
             self.schema_path = "CCSSchemas/prediction_schema.json"
-            self.csv_filename = "prediction_file.csv"
+            self.csv_filename = os.path.join(workspace, "prediction_file.csv")
+            self.columnar_path = os.path.join(workspace, "prediction_data")
+            self.quarantine_file = os.path.join(workspace, "quarantined_rows.csv")
 
-        self.ccs_data_format_validator_logging = logging.getLogger("ccs_data_format_validator_log")
-        self.ccs_data_format_validator_logging.setLevel(logging.INFO)
-        ccs_data_format_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_data_format_handler.setFormatter(formatter)
-        self.ccs_data_format_validator_logging.addHandler(ccs_data_format_handler)
+        # Verdict of every uploaded file: filename -> {'path', 'valid', 'reason'} and 'archived' once archived.
+        # The files are validated where they were uploaded, they are not copied into Good and Bad folders.
+        self.manifest = {}
+        self.manifest_lock = threading.Lock()
+
+        self.ccs_data_format_validator_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_value_from_schema(self):
         """
@@ -82,7 +89,6 @@ class CCSDataFormatValidator:
             length_date_of_file = dic["LengthOfDate"]
             length_time_of_file = dic["LengthOfTime"]
             column_names = dic["ColumnNames"]
-            print(column_names)
             column_number = dic["NumberOfColumns"]
 
             message = f"{self.operation}: Length of year of file = {length_date_of_file}, Length of time of file " \
@@ -105,6 +111,64 @@ class CCSDataFormatValidator:
             self.ccs_data_format_validator_logging.error(f"{self.operation}: {str(e)}")
             raise e
 
+    def ccs_validate_records(self, records):
+        """
+        :Method Name: ccs_validate_records
+        :Description: This method validates rows received directly (e.g. as JSON) entirely in memory. No file is
+                      written or moved. The rows are checked with the same rules as the uploaded files, the
+                      datatypes, missing values and value ranges of the schema (see CCSSchemaValidator), but a
+                      single invalid row rejects all of them, with the reasons of every invalid row.
+
+        :param records: list of dictionaries, one per row, with the column names as keys
+        :return: pandas dataframe with the columns in the order given in the schema
+        :On Failure: ValueError, Exception
+        """
+        try:
+            length_date, length_time, column_names, column_number = self.ccs_value_from_schema()
+
+            if not isinstance(records, list) or len(records) == 0:
+                raise ValueError("Expected a non empty list of records")
+
+            expected_columns = set(column_names)
+            for row_no, record in enumerate(records):
+                if not isinstance(record, dict):
+                    raise ValueError(f"Record {row_no} is not a JSON object")
+
+                missing_columns = expected_columns - set(record)
+                extra_columns = set(record) - expected_columns
+                if missing_columns or extra_columns:
+                    raise ValueError(f"Record {row_no} has missing columns {sorted(missing_columns)} and "
+                                     f"unexpected columns {sorted(extra_columns)}")
+
+                for column in column_names:
+                    # JSON booleans would be read as 0 and 1, they are not acceptable numerical values.
+                    if isinstance(record[column], bool):
+                        raise ValueError(f"Record {row_no}: value {record[column]!r} of column '{column}' is "
+                                         f"not of type {column_names[column]}")
+
+            dataframe = pd.DataFrame.from_records(records, columns=list(column_names))
+            good_rows, bad_rows = CCSSchemaValidator(self.schema_path).ccs_validate_rows(dataframe)
+            if len(bad_rows):
+                reasons = "; ".join(f"Record {row_no}: {reason}" for row_no, reason in bad_rows["reason"].items())
+                raise ValueError(f"{len(bad_rows)} invalid records: {reasons}")
+
+            dataframe = good_rows.astype(float)
+
+            message = f"{self.operation}: {len(dataframe)} records validated in memory"
+            self.ccs_data_format_validator_logging.info(message)
+
+            return dataframe
+
+        except ValueError as e:
+            message = f"{self.operation}: Invalid records: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
+            raise e
+
+        except Exception as e:
+            message = f"{self.operation}: Error occurred while validating records: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
+            raise e
+
     def ccs_regex_file_name(self):
         """
         Method Name: ee_regex_file_name
@@ -116,88 +180,74 @@ class CCSDataFormatValidator:
         regex = re.compile(r'Concrete_Data_[0123]\d[01]\d[12]\d{3}_[012]\d[0-5]\d[0-5]\d.xls')
         return regex
 
-    def ccs_create_good_bad_raw_data_directory(self):
+    def ccs_record_verdict(self, filename, is_valid, reason=""):
         """
-        :Method Name: ccs_create_good_bad_raw_data_directory
-        :Description: This method creates directories to store the Good Data and Bad Data
-                      after validating the training data.
+        :Method Name: ccs_record_verdict
+        :Description: This method records in the manifest whether an uploaded file is valid and why not. The file
+                      itself stays where it was uploaded.
+        :param filename: The name of the uploaded file
+        :param is_valid: Whether the file is valid
+        :param reason: Why the file is not valid
         :return: None
-        On Failure: OSError, Exception
         """
-        try:
-
-            if not os.path.isdir(self.good_raw_path):
-                os.makedirs(self.good_raw_path)
-            if not os.path.isdir(self.bad_raw_path):
-                os.makedirs(self.bad_raw_path)
-
-            message = f"{self.operation}: Good and Bad file directory created"
-            self.ccs_data_format_validator_logging.info(message)
-
-        except OSError as e:
-            message = f"{self.operation}: Error while creating directory: {str(e)}"
-            self.ccs_data_format_validator_logging.error(message)
-            raise OSError
-
-        except Exception as e:
-            self.ccs_data_format_validator_logging.error(f"{self.operation}: {str(e)}")
-            raise e
+        self.manifest[filename] = {"path": os.path.join(self.dir_path, filename), "valid": is_valid,
+                                   "reason": reason}
+        if is_valid:
+            message = f"{self.operation}: {filename} is valid!!"
+        else:
+            message = f"{self.operation}: {filename} is not valid, {reason}!!"
+        self.ccs_data_format_validator_logging.info(message)
 
-    def ccs_delete_existing_good_data_folder(self):
+    def ccs_write_manifest(self):
         """
-        :Method Name: ccs_delete_existing_good_data_folder
-        :Description: This method deletes the directory made to store the Good Data
-                      after loading the data in the table. Once the good files are
-                      loaded in the DB,deleting the directory ensures space optimization.
+        :Method Name: ccs_write_manifest
+        :Description: This method saves the manifest of the verdicts next to the validated data.
         :return: None
         :On Failure: OSError, Exception
         """
-
         try:
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.manifest, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.manifest_path)
 
-            if os.path.isdir(self.good_raw_path):
-                shutil.rmtree(self.good_raw_path)
-                message = f"{self.operation}: GoodRaw directory deleted successfully!!!"
-                self.ccs_data_format_validator_logging.info(message)
-
-        except OSError as e:
-            message = f"{self.operation}: Error while creating directory: {str(e)}"
-            self.ccs_data_format_validator_logging.error(message)
-            raise e
         except Exception as e:
-            self.ccs_data_format_validator_logging.error(f"{self.operation}: {str(e)}")
+            message = f"{self.operation}: Error while writing the validation manifest: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
             raise e
 
-    def ccs_delete_existing_bad_data_folder(self):
+    @staticmethod
+    def ccs_load_manifest(manifest_path):
         """
-                :Method Name: ccs_delete_existing_bad_data_folder
-                :Description: This method deletes the directory made to store the Bad Data
-                              after moving the data in an archive folder. We archive the bad
-                              files to send them back to the client for invalid data issue.
-                :return: None
-                :On Failure: OSError
-                """
-        try:
-
-            if os.path.isdir(self.bad_raw_path):
-                shutil.rmtree(self.bad_raw_path)
-                message = f"{self.operation}BadRaw directory deleted successfully!!!"
-                self.ccs_data_format_validator_logging.info(message)
+        :Method Name: ccs_load_manifest
+        :Description: This method reads a manifest saved by ccs_write_manifest.
+        :param manifest_path: The path of the manifest
+        :return: dictionary of filename -> verdict, empty if no manifest has been saved
+        """
+        if not os.path.isfile(manifest_path):
+            return {}
+        with open(manifest_path) as f:
+            return json.load(f)
 
-        except OSError as e:
-            message = f"{self.operation}: Error while creating directory: {str(e)}"
-            self.ccs_data_format_validator_logging.error(message)
-            raise e
-        except Exception as e:
-            self.ccs_data_format_validator_logging.error(f"{self.operation}: {str(e)}")
-            raise e
+    def ccs_good_files(self):
+        """
+        :Method Name: ccs_good_files
+        :Description: This method lists the files which are valid as per the manifest.
+        :return: list of (filename, path of the uploaded file), sorted by filename
+        """
+        if not self.manifest:
+            self.manifest = self.ccs_load_manifest(self.manifest_path)
+        return [(filename, verdict["path"]) for filename, verdict in sorted(self.manifest.items())
+                if verdict["valid"]]
 
     def ccs_move_bad_files_to_archive(self):
         """
         :Method Name: ccs_move_bad_files_to_archive
-        Description: This method deletes the directory made to store the Bad Data
-                      after moving the data in an archive folder. We archive the bad
-                      files to send them back to the client for invalid data issue.
+        Description: This method archives the files which are not valid as per the manifest, to send them back to
+                     the client for invalid data issue. The archived file is a hard link to the uploaded file, so
+                     no data is copied; it is only copied when a link is not possible, e.g. to another file system.
+                     Every file is archived once, the archive path is recorded in the manifest.
         :return: None
         : On Failure: Exception
         """
@@ -206,21 +256,31 @@ class CCSDataFormatValidator:
         time = now.strftime("%H_%M_%S")
 
         try:
+            with self.manifest_lock:
+                if not self.manifest:
+                    self.manifest = self.ccs_load_manifest(self.manifest_path)
 
-            if os.path.isdir(self.bad_raw_path):
                 archive_dir = "CCSDIV/ArchivedData"
-                if not os.path.isdir(archive_dir):
-                    os.makedirs(archive_dir)
-                archive_path = os.path.join(archive_dir, f"BadData_{str(date)}_{time}.xls")
-                bad_files = os.listdir(self.bad_raw_path)
-                for file in bad_files:
-                    if file not in os.listdir(archive_dir):
-                        shutil.move(self.bad_raw_path+file, archive_dir)
-                        os.rename(os.path.join(archive_dir, file), archive_path)
-
-                message = f"{self.operation}: Bad files moved to archive: {archive_path}"
-                self.ccs_data_format_validator_logging.info(message)
-                self.ccs_delete_existing_bad_data_folder()
+                archived = 0
+                for filename, verdict in sorted(self.manifest.items()):
+                    if verdict["valid"] or verdict.get("archived"):
+                        continue
+                    if not os.path.isdir(archive_dir):
+                        os.makedirs(archive_dir)
+                    archive_path = os.path.join(archive_dir, f"BadData_{str(date)}_{time}_{filename}")
+                    try:
+                        os.link(verdict["path"], archive_path)
+                    except OSError:
+                        shutil.copy2(verdict["path"], archive_path)
+                    verdict["archived"] = archive_path
+                    archived += 1
+
+                    message = f"{self.operation}: Bad file {filename} archived: {archive_path}"
+                    self.ccs_data_format_validator_logging.info(message)
+
+                if archived:
+                    self.ccs_write_manifest()
+
         except Exception as e:
             message = f"{self.operation}: Error while Archiving Bad Files: {str(e)}"
             self.ccs_data_format_validator_logging.error(message)
@@ -230,47 +290,159 @@ class CCSDataFormatValidator:
         """
         :Method Name: ccs_validating_file_name
         :Description: This function validates the name of the training xlsx files as per given name in the EESchema!
-                      Regex pattern is used to do the validation.If name format do not match the file is moved
-                      to Bad Raw Data folder else in Good raw data.
+                      Regex pattern is used to do the validation. The verdict of every uploaded file is recorded in
+                      a new manifest, which the following checks update.
         :param regex: The regex compiler used to check validity of filenames
         :return: None
         :On Failure: Exception
         """
 
-        # delete the directories for good and bad data in case last run was unsuccessful and folders were not deleted.
-        self.ccs_delete_existing_bad_data_folder()
-        self.ccs_delete_existing_good_data_folder()
-        # create new directories
-        self.ccs_create_good_bad_raw_data_directory()
+        self.manifest = {}
+        raw_files = sorted(os.listdir(self.dir_path))
 
-        raw_files = [file for file in os.listdir(self.dir_path)]
-
-        print(raw_files)
         try:
             for filename in raw_files:
                 if re.match(regex, filename):
-                    shutil.copy(os.path.join(self.dir_path, filename), self.good_raw_path)
-                    message = f"{self.operation}: {filename} is valid!! moved to GoodRaw folder"
-                    self.ccs_data_format_validator_logging.info(message)
+                    self.ccs_record_verdict(filename, True)
                 else:
-                    shutil.copy(os.path.join(self.dir_path, filename), self.bad_raw_path)
-                    message = f"{self.operation}: {filename} is not valid!! moved to BadRaw folder"
-                    self.ccs_data_format_validator_logging.info(message)
+                    self.ccs_record_verdict(filename, False, "file name does not match the agreed pattern")
+            self.ccs_write_manifest()
 
         except Exception as e:
             message = f"{self.operation}: Error occurred while validating filename: {str(e)}"
             self.ccs_data_format_validator_logging.error(message)
             raise e
 
-    def ccs_validate_column_length(self, number_of_columns):
+    def ccs_parse_good_files(self):
+        """
+        :Method Name: ccs_parse_good_files
+        :Description: This method parses every file which is valid as per the manifest once. The returned tables are
+                      shared by all the following validation and transformation stages, so that no stage has to
+                      parse the excel files again. Files which cannot be parsed are marked as not valid.
+        :return: dictionary of filename -> pandas dataframe
+        :On Failure: Exception
+        """
+        try:
+            parsed_files = {}
+            for filename, file_path in self.ccs_good_files():
+                try:
+                    parsed_files[filename] = pd.read_excel(file_path)
+                except Exception as e:
+                    self.ccs_record_verdict(filename, False, f"file could not be parsed: {str(e)}")
+            self.ccs_write_manifest()
+
+            message = f"{self.operation}: {len(parsed_files)} good files parsed"
+            self.ccs_data_format_validator_logging.info(message)
+
+            return parsed_files
+
+        except Exception as e:
+            message = f"{self.operation}: Error occurred while parsing the good files: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
+            raise e
+
+    @staticmethod
+    def ccs_validate_file(file_path, regex, number_of_columns, schema_path):
+        """
+        :Method Name: ccs_validate_file
+        :Description: This method runs the whole check chain on a single file: file name, number of columns and
+                      the row level checks of the schema (see CCSSchemaValidator). It does not move any file, so
+                      that it can run in a worker process.
+
+        :param file_path: The path of the uploaded file
+        :param regex: The regex compiler used to check validity of filenames
+        :param number_of_columns: The number of columns that is expected based on DSA
+        :param schema_path: The path of the schema the rows are validated against
+        :return: filename, whether the file is valid, the reason why it is not, the valid rows (None if the file
+                 is invalid), the rejected rows with their reason (None if the file is invalid)
+        """
+        filename = os.path.basename(file_path)
+        if not re.match(regex, filename):
+            return filename, False, "file name does not match the agreed pattern", None, None
+
+        try:
+            pd_df = pd.read_excel(file_path)
+        except Exception as e:
+            return filename, False, f"file could not be parsed: {str(e)}", None, None
+
+        if not pd_df.shape[1] == number_of_columns:
+            return filename, False, f"invalid column length {pd_df.shape[1]}, expected {number_of_columns}", None, None
+
+        good_rows, bad_rows = CCSSchemaValidator(schema_path).ccs_validate_rows(pd_df)
+        if len(good_rows) == 0:
+            return filename, False, f"no valid rows, {len(bad_rows)} rows rejected", None, None
+
+        return filename, True, "", good_rows, bad_rows
+
+    def ccs_validate_files_parallel(self, regex, number_of_columns, column_names, max_workers):
+        """
+        :Method Name: ccs_validate_files_parallel
+        :Description: This method validates the uploaded files in worker processes, each running the whole check
+                      chain of ccs_validate_file on one file, so that validation of many files uses all the cores.
+                      The verdicts are merged in the order of the file names, so the outcome does not depend on
+                      which worker finishes first. The verdicts are recorded in the manifest and the rejected
+                      rows of the valid files are written to the quarantine file.
+
+        :param regex: The regex compiler used to check validity of filenames
+        :param number_of_columns: The number of columns that is expected based on DSA
+        :param column_names: The column names and their datatypes from the schema
+        :param max_workers: The maximum number of worker processes
+        :return: dictionary of filename -> valid rows of every valid file, as after ccs_validate_rows
+        :On Failure: Exception
+        """
+        try:
+            message = f"{self.operation}: Parallel Validation Started with {max_workers} workers!!"
+            self.ccs_data_format_validator_logging.info(message)
+
+            file_paths = [os.path.join(self.dir_path, filename) for filename in sorted(os.listdir(self.dir_path))]
+            num_files = len(file_paths)
+            arguments = [file_paths, [regex] * num_files, [number_of_columns] * num_files,
+                         [self.schema_path] * num_files]
+
+            if max_workers > 1 and num_files > 1:
+                # The server process runs logging, batching, job and sync threads whose locks a forked worker
+                # could inherit held, so the workers are started from a clean forkserver (spawn on Windows).
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                with ProcessPoolExecutor(max_workers=min(max_workers, num_files),
+                                         mp_context=multiprocessing.get_context(start_method)) as executor:
+                    verdicts = list(executor.map(CCSDataFormatValidator.ccs_validate_file, *arguments))
+            else:
+                verdicts = list(map(CCSDataFormatValidator.ccs_validate_file, *arguments))
+
+            self.manifest = {}
+            parsed_files = {}
+            quarantined = []
+            for filename, is_valid, reason, good_rows, bad_rows in verdicts:
+                self.ccs_record_verdict(filename, is_valid, reason)
+                if is_valid:
+                    parsed_files[filename] = good_rows
+                    quarantined.append(self.ccs_quarantine_rows(filename, bad_rows, column_names))
+            self.ccs_write_manifest()
+
+            self.ccs_write_quarantine(quarantined)
+
+            message = f"{self.operation}: Parallel Validation Completed, {len(parsed_files)} of {num_files} " \
+                      f"files valid!!"
+            self.ccs_data_format_validator_logging.info(message)
+
+            return parsed_files
+
+        except Exception as e:
+            message = f"{self.operation}: Error occurred during parallel validation: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
+            raise e
+
+    def ccs_validate_column_length(self, number_of_columns, parsed_files=None):
         """
         :Method Name: ccs_validate_column_length
         :Description: This function validates the number of columns in the csv files.
                        It is should be same as given in the EESchema file.
-                       If not same file is not suitable for processing and thus is moved to Bad Raw Data folder.
-                       If the column number matches, file is kept in Good Raw Data for processing.
+                       If not same file is not suitable for processing and thus is marked as not valid in the
+                       manifest. If the column number matches, file is kept for processing.
 
         :param number_of_columns: The number of columns that is expected based on DSA
+        :param parsed_files: the tables from ccs_parse_good_files, the files found not valid are removed from it.
+                             The good files of the manifest are parsed if None.
         :return: None
         :On Failure: OSERROR, EXCEPTION
         """
@@ -279,23 +451,27 @@ class CCSDataFormatValidator:
             message = f"{self.operation}: Column Length Validation Started!!"
             self.ccs_data_format_validator_logging.info(message)
 
-            for filename in os.listdir(self.good_raw_path):
-                pd_df = pd.read_excel(os.path.join(self.good_raw_path, filename))
+            if parsed_files is None:
+                parsed_files = self.ccs_parse_good_files()
+
+            for filename in list(parsed_files):
+                pd_df = parsed_files[filename]
 
                 # Accessing the number of columns in the relevant files by checking shape of the dataframe.
                 if not pd_df.shape[1] == number_of_columns:
-                    shutil.move(os.path.join(self.good_raw_path, filename), self.bad_raw_path)
-                    message = f"{self.operation}: invalid Column length for the file {filename}.File moved to Bad Folder"
-                    self.ccs_data_format_validator_logging.info(message)
+                    self.ccs_record_verdict(filename, False, f"invalid column length {pd_df.shape[1]}, "
+                                                             f"expected {number_of_columns}")
+                    del parsed_files[filename]
                 else:
-                    message = f"{self.operation}: {filename} validated. File remains in Good Folder"
+                    message = f"{self.operation}: {filename} validated. File remains valid"
                     self.ccs_data_format_validator_logging.info(message)
+            self.ccs_write_manifest()
 
             message = f"{self.operation}: Column Length Validation Completed!!"
             self.ccs_data_format_validator_logging.info(message)
 
         except OSError:
-            message = f"{self.operation}: Error occurred when moving the file: {str(OSError)}"
+            message = f"{self.operation}: Error occurred when writing the manifest: {str(OSError)}"
             self.ccs_data_format_validator_logging.error(message)
             raise OSError
         except Exception as e:
@@ -303,52 +479,145 @@ class CCSDataFormatValidator:
             self.ccs_data_format_validator_logging.error(message)
             raise e
 
-    def ccs_validate_whole_columns_as_empty(self):
+    def ccs_validate_rows(self, column_names, parsed_files=None):
         """
-        :Method Name: ccs_validate_whole_columns_as_empty
-        :Description: This method validates that there are no columns in the given file
-                      that has no values.
-        :return: None
+        :Method Name: ccs_validate_rows
+        :Description: This method validates every row of the files against the schema (datatypes, required
+                      values and value ranges, see CCSSchemaValidator). Only the invalid rows are removed from
+                      the tables and written to the quarantine file with the reason, the file stays valid unless
+                      none of its rows are valid.
+
+        :param column_names: The column names and their datatypes from the schema
+        :param parsed_files: the tables from ccs_parse_good_files, replaced by their valid rows. The files found not
+                             valid are removed from it. The good files of the manifest are parsed if None.
+        :return: the number of quarantined rows
         :On Failure: OSError, Exception
         """
         try:
+            message = f"{self.operation}: Row Validation Started!!"
+            self.ccs_data_format_validator_logging.info(message)
 
-            message = f"{self.operation}: Check for Whole Columns as Empty Validation Started!!"
+            if parsed_files is None:
+                parsed_files = self.ccs_parse_good_files()
+
+            schema_validator = CCSSchemaValidator(self.schema_path)
+            quarantined = []
+            for filename in list(parsed_files):
+                good_rows, bad_rows = schema_validator.ccs_validate_rows(parsed_files[filename])
+                if len(good_rows) == 0:
+                    self.ccs_record_verdict(filename, False, f"no valid rows, {len(bad_rows)} rows rejected")
+                    del parsed_files[filename]
+                    continue
+
+                parsed_files[filename] = good_rows
+                quarantined.append(self.ccs_quarantine_rows(filename, bad_rows, column_names))
+
+            self.ccs_write_manifest()
+            num_quarantined = self.ccs_write_quarantine(quarantined)
+
+            message = f"{self.operation}: Row Validation Completed!!"
             self.ccs_data_format_validator_logging.info(message)
-            for filename in os.listdir(self.good_raw_path):
-                pd_df = pd.read_excel(os.path.join(self.good_raw_path, filename))
-                for column in pd_df:
-                    if (len(pd_df[column]) - pd_df[column].count()) == len(pd_df[column]):
-                        shutil.move(os.path.join(self.good_raw_path, filename), self.bad_raw_path)
-                        message = f"{self.operation}: invalid column {column}. Moving to Bad Folder"
-                        self.ccs_data_format_validator_logging.info(message)
-                        break
-        except OSError:
-            message = f"{self.operation}: Error occurred when moving the file: {str(OSError)}"
+
+            return num_quarantined
+
+        except OSError as e:
+            message = f"{self.operation}: Error occurred when writing the manifest: {str(e)}"
             self.ccs_data_format_validator_logging.error(message)
-            raise OSError
+            raise e
         except Exception as e:
             message = f"{self.operation}: Error occurred : {str(e)}"
             self.ccs_data_format_validator_logging.error(message)
             raise e
 
-    def ccs_convert_direct_excel_to_csv(self):
+    @staticmethod
+    def ccs_quarantine_rows(filename, bad_rows, column_names):
+        """
+        :Method Name: ccs_quarantine_rows
+        :Description: This method prepares the rejected rows of a file for the quarantine file.
+
+        :param filename: The file the rows come from
+        :param bad_rows: The rejected rows with their 'reason', as from CCSSchemaValidator.ccs_validate_rows
+        :param column_names: The column names and their datatypes from the schema
+        :return: pandas dataframe with the columns file, row (the row number in the excel sheet), reason and the
+                 columns of the schema
+        """
+        values = bad_rows.drop(columns="reason").set_axis(list(column_names), axis=1)
+        quarantine = pd.DataFrame({"file": filename,
+                                   # The header is the first row of the sheet.
+                                   "row": bad_rows.index + 2,
+                                   "reason": bad_rows["reason"]}, index=bad_rows.index)
+        return pd.concat([quarantine, values], axis=1)
+
+    def ccs_write_quarantine(self, quarantined):
+        """
+        :Method Name: ccs_write_quarantine
+        :Description: This method writes the rejected rows of all the files to the quarantine file, which
+                      replaces the one of an earlier run. No file is written if no row was rejected.
+
+        :param quarantined: list of dataframes from ccs_quarantine_rows
+        :return: the number of quarantined rows
+        """
+        quarantined = [rows for rows in quarantined if len(rows)]
+        if os.path.isfile(self.quarantine_file):
+            os.remove(self.quarantine_file)
+        if not quarantined:
+            return 0
+
+        quarantine = pd.concat(quarantined)
+        quarantine.to_csv(self.quarantine_file, index=False)
+
+        message = f"{self.operation}: {len(quarantine)} invalid rows quarantined to {self.quarantine_file}"
+        self.ccs_data_format_validator_logging.info(message)
+
+        return len(quarantine)
+
+    def ccs_convert_direct_excel_to_columnar(self, column_names, parsed_files=None):
+        """
+        :Method Name: ccs_convert_direct_excel_to_columnar
+        :Description: This function combines all the excel files which have been validated as being in the correct
+                      format into a single columnar dataset (see CCSColumnarStore) with the datatypes of the schema,
+                      which is then used in preprocessing for training or for prediction. Loading it back does
+                      not require any text parsing.
+        :param column_names: The column names and their datatypes from the schema
+        :param parsed_files: the validated tables from ccs_parse_good_files. The good files of the manifest are
+                             parsed if None.
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+
+            if parsed_files is None:
+                parsed_files = self.ccs_parse_good_files()
+
+            df = pd.concat(list(parsed_files.values()))
+            CCSColumnarStore(self.columnar_path).ccs_write(df, list(column_names.values()), index_label="id")
+
+            message = f"{self.operation}: Excel file Converted directly to columnar dataset for future preprocessing"
+            self.ccs_data_format_validator_logging.info(message)
+
+        except Exception as e:
+            message = f"{self.operation}: Error occurred while direct conversion from excel to columnar: {str(e)}"
+            self.ccs_data_format_validator_logging.error(message)
+            raise e
+
+    def ccs_convert_direct_excel_to_csv(self, parsed_files=None):
         """
         :Method Name: ccs_convert_direct_excel_to_csv
         :Description: This function converts all the excel files which have been validated as being in the correct
                       format into a single csv file which is then used in preprocessing for training ML EEModels.
                       This function is used to improve the speed or latency of the web application as the app does not
                       have to wait for database operations before starting the training.
+        :param parsed_files: the validated tables from ccs_parse_good_files. The good files of the manifest are
+                             parsed if None.
         :return: None
         :On Failure: Exception
         """
         try:
 
-            list_pd = []
-            for filename in os.listdir(self.good_raw_path):
-                list_pd.append(pd.read_excel(os.path.join(self.good_raw_path, filename)))
+            if parsed_files is None:
+                parsed_files = self.ccs_parse_good_files()
 
-            df = pd.concat(list_pd)
+            df = pd.concat(list(parsed_files.values()))
             df.to_csv(self.csv_filename, header=True, index=True, index_label="id")
 
             message = f"{self.operation}: Excel file Converted directly to required csv file for future preprocessing"
@@ -1,10 +1,13 @@
 import os
-import logging
-import threading
+import shutil
 
 from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
 from CCSCommonTasks.CCSDBOperation import CCSDBOperation
+from CCSCommonTasks.CCSDBSyncWorker import CCSDBSyncWorker
 from CCSCommonTasks.CCSBeforeUpload import CCSBeforeUpload
+from CCSCommonTasks.CCSColumnarStore import CCSColumnarStore
+from CCSCommonTasks.CCSUploadCache import CCSUploadCache
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSDataInjestionComplete:
@@ -24,17 +27,34 @@ class CCSDataInjestionComplete:
         Version: 1.0
         """
 
-    def __init__(self, is_training, data_dir="CCSUploadedFiles"):
+    def __init__(self, is_training, data_dir="CCSUploadedFiles", workspace="", validation_workers=None,
+                 upload_cache=None, db_sync_worker=None):
         """
         :Method Name: __init__
         :Description: This method initializes the variables that will be used in methods of this class.
 
         :param is_training: Whether this class is instantiated for training.
         :param data_dir: Data directory where files are present.
+        :param workspace: directory of the job under which the intermediate files are stored.
+        :param validation_workers: number of processes validating the files in parallel, 1 to validate them in
+                                   this process one check at a time. Read from CCS_VALIDATION_WORKERS if None.
+        :param upload_cache: CCSUploadCache in which the outcome of an upload is looked up and stored. A new one
+                             is used if None.
+        :param db_sync_worker: CCSDBSyncWorker on which the database pipeline is queued. A new one, sharing the
+                               worker thread of the process, is used if None.
         """
-        self.data_format_validator = CCSDataFormatValidator(is_training=is_training, path=data_dir)
-        self.db_operator = CCSDBOperation(is_training=is_training)
-        self.data_transformer = CCSBeforeUpload(is_training=is_training)
+        self.data_format_validator = CCSDataFormatValidator(is_training=is_training, path=data_dir,
+                                                            workspace=workspace)
+        self.db_operator = CCSDBOperation(is_training=is_training, workspace=workspace)
+        self.data_transformer = CCSBeforeUpload(is_training=is_training, workspace=workspace)
+        self.upload_cache = upload_cache if upload_cache is not None else CCSUploadCache()
+        self.db_sync_worker = db_sync_worker if db_sync_worker is not None else CCSDBSyncWorker()
+        self.is_training = is_training
+        if validation_workers is None:
+            validation_workers = int(os.getenv("CCS_VALIDATION_WORKERS", 1))
+        self.validation_workers = validation_workers
+        # The pipelines read the columnar dataset, the csv is only written on request for use outside of them.
+        self.export_csv = os.getenv("CCS_EXPORT_CSV", "0") == "1"
 
         if is_training:
             self.operation = 'TRAINING'
@@ -47,56 +67,145 @@ class CCSDataInjestionComplete:
                 os.mkdir("CCSLogFiles/prediction")
             self.log_path = os.path.join("CCSLogFiles/prediction/", "CCSDataInjestionComplete.txt")
 
-        self.ccs_data_injestion_logging = logging.getLogger("ccs_data_injestion_log")
-        self.ccs_data_injestion_logging.setLevel(logging.INFO)
-        ccs_data_injestion_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_data_injestion_handler.setFormatter(formatter)
-        self.ccs_data_injestion_logging.addHandler(ccs_data_injestion_handler)
+        self.ccs_data_injestion_logging = CCSLogger().ccs_get_logger(self.log_path)
 
-    def ccs_data_injestion_complete(self):
+    def ccs_cached_artifacts(self):
+        """
+        :Method Name: ccs_cached_artifacts
+        :Description: This method lists the files of the workspace which are stored in the upload cache.
+        :return: dictionary of name in the cache entry -> path in the workspace
+        """
+        return {"data": self.data_format_validator.columnar_path,
+                "quarantined_rows.csv": self.data_format_validator.quarantine_file}
+
+    def ccs_restore_from_cache(self, cache_key, schema_digest):
+        """
+        :Method Name: ccs_restore_from_cache
+        :Description: This method reuses the outcome of an earlier ingestion of the same upload: the validated
+                      dataset and quarantined rows are linked into the workspace, nothing is validated or parsed.
+
+        :param cache_key: The digest of the upload, see CCSUploadCache
+        :param schema_digest: The digest of the schema the upload is validated against
+        :return: True if the upload was found in the cache, False if not or if it could not be restored, e.g.
+                 because the entry was removed as stale meanwhile. The upload is then ingested as usual.
+        :On Failure: ValueError if the upload was found not valid before
+        """
+        verdict = self.upload_cache.ccs_get_verdict(cache_key, self.is_training, schema_digest)
+        if verdict is None:
+            return False
+        if not verdict["valid"]:
+            raise ValueError(f"No valid files: {verdict['reason']}")
+
+        try:
+            self.upload_cache.ccs_restore_entry(cache_key, self.is_training, self.ccs_cached_artifacts())
+            if not CCSColumnarStore(self.data_format_validator.columnar_path).ccs_exists():
+                raise FileNotFoundError(f"No dataset in the cache entry of {cache_key}")
+        except OSError as e:
+            # Nothing half restored is left for the ingestion to trip over.
+            for destination in self.ccs_cached_artifacts().values():
+                if os.path.isdir(destination):
+                    shutil.rmtree(destination, ignore_errors=True)
+                elif os.path.exists(destination):
+                    os.remove(destination)
+
+            message = f"{self.operation}: Upload {cache_key} could not be restored from the cache, validating " \
+                      f"it again: {str(e)}"
+            self.ccs_data_injestion_logging.info(message)
+            return False
+
+        if self.export_csv:
+            CCSColumnarStore(self.data_format_validator.columnar_path).ccs_export_csv(
+                self.data_format_validator.csv_filename)
+
+        message = f"{self.operation}: Upload {cache_key} validated before, cached dataset reused"
+        self.ccs_data_injestion_logging.info(message)
+        return True
+
+    def ccs_queue_db_sync(self, column_names, upload_files):
+        """
+        :Method Name: ccs_queue_db_sync
+        :Description: This method queues the upload of the good data to the database on the sync worker.
+
+        :param column_names: The column names and their datatypes from the schema
+        :param upload_files: dictionary of filename -> table to upload
+        :return: None
+        """
+        # The time consuming database tasks run on the sync worker to improve web application latency.
+        # Only the latest upload of a burst is loaded, the table holds the data of one upload at a time.
+        self.db_sync_worker.ccs_submit(self.db_operator, column_names, self.data_format_validator, upload_files)
+
+        message = f"{self.operation}: Upload of the Good Data to the Database queued"
+        self.ccs_data_injestion_logging.info(message)
+
+    def ccs_data_injestion_complete(self, cache_key=None):
         """
         :Method Name: ccs_data_injestion_complete
         :Description: This method is used to complete the entire data validation,
                       data injestion process to store the data in a database and
                       convert it for further usage in our project work
 
+        :param cache_key: The digest of the uploaded files (see CCSUploadCache). If given, the outcome of an
+                          earlier ingestion of the same files is reused and the outcome of this one is cached.
         :return: None
-        :On Failure: Exception
+        :On Failure: ValueError if no file is valid, Exception
         """
         try:
             message = f"{self.operation}: Start of Injestion and Validation"
             self.ccs_data_injestion_logging.info(message)
 
             length_date, length_time, dataset_col_names, dataset_col_num = self.data_format_validator.ccs_value_from_schema()
+
+            if cache_key is not None:
+                schema_digest = self.upload_cache.ccs_hash_file(self.data_format_validator.schema_path)
+                if self.ccs_restore_from_cache(cache_key, schema_digest):
+                    # The table holds the latest upload only, so a cached upload is loaded into it again from
+                    # the restored dataset.
+                    cached_data = CCSColumnarStore(self.data_format_validator.columnar_path).ccs_read()
+                    self.ccs_queue_db_sync(dataset_col_names, {"cached upload": cached_data.drop(columns="id")})
+                    return
+
             regex = self.data_format_validator.ccs_regex_file_name()
-            self.data_format_validator.ccs_validating_file_name(regex)
-            self.data_format_validator.ccs_validate_column_length(dataset_col_num)
-            self.data_format_validator.ccs_validate_whole_columns_as_empty()
+            if self.validation_workers > 1:
+                parsed_files = self.data_format_validator.ccs_validate_files_parallel(
+                    regex, dataset_col_num, dataset_col_names, self.validation_workers)
+            else:
+                self.data_format_validator.ccs_validating_file_name(regex)
+                # Every good file is parsed exactly once, all the following stages share the parsed tables.
+                parsed_files = self.data_format_validator.ccs_parse_good_files()
+                self.data_format_validator.ccs_validate_column_length(dataset_col_num, parsed_files)
+                # Invalid rows are quarantined one by one, a file is only rejected when none of its rows is valid.
+                self.data_format_validator.ccs_validate_rows(dataset_col_names, parsed_files)
             self.data_format_validator.ccs_move_bad_files_to_archive()
 
+            if not parsed_files:
+                reason = "; ".join(f"{filename}: {verdict['reason']}"
+                                   for filename, verdict in sorted(self.data_format_validator.manifest.items()))
+                if cache_key is not None:
+                    self.upload_cache.ccs_put_entry(cache_key, self.is_training,
+                                                    {"valid": False, "reason": reason, "schema": schema_digest}, {})
+                raise ValueError(f"No valid files: {reason}")
+
             message = f"{self.operation}: Raw Data Validation complete"
             self.ccs_data_injestion_logging.info(message)
 
             message = f"{self.operation}: Start of Data Transformation"
             self.ccs_data_injestion_logging.info(message)
 
-            self.data_transformer.ee_replace_missing_with_null()
+            upload_files = self.data_transformer.ee_replace_missing_with_null(parsed_files)
 
             message = f"{self.operation}: Data Transformation Complete"
             self.ccs_data_injestion_logging.info(message)
 
-            message = f"{self.operation}: Start of upload of the Good Data to Cassandra Database"
-            self.ccs_data_injestion_logging.info(message)
+            self.ccs_queue_db_sync(dataset_col_names, upload_files)
 
-            # Threading used to bypass time consuming database tasks to improve web application latency.
-            t1 = threading.Thread(target=self.db_operator.ccs_complete_db_pipeline,
-                                  args=[dataset_col_names, self.data_format_validator])
-            t1.start()
-            # t1 not joined so that it runs only after training has occurred.
+            self.data_format_validator.ccs_convert_direct_excel_to_columnar(dataset_col_names, parsed_files)
+            if self.export_csv:
+                self.data_format_validator.ccs_convert_direct_excel_to_csv(parsed_files)
 
-            self.data_format_validator.ccs_convert_direct_excel_to_csv()
+            if cache_key is not None:
+                self.upload_cache.ccs_put_entry(cache_key, self.is_training,
+                                                {"valid": True, "reason": "", "schema": schema_digest},
+                                                self.ccs_cached_artifacts())
 
             message = f"{self.operation}: End of Injestion and Validation"
             self.ccs_data_injestion_logging.info(message)
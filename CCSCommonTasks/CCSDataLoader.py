@@ -1,6 +1,7 @@
 import os
 import pandas as pd
-import logging
+from CCSCommonTasks.CCSColumnarStore import CCSColumnarStore
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSDataLoader:
@@ -14,38 +15,44 @@ class CCSDataLoader:
     Version: 1.0
     """
 
-    def __init__(self, is_training):
+    def __init__(self, is_training, workspace=""):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the path of the data file and the logging feature.
+        :param is_training: Whether this class is instantiated for training.
+        :param workspace: directory of the job in which the data file is present.
+        """
         if is_training:
             self.operation = 'TRAINING'
-            self.data_file = 'validated_file.csv'
+            self.data_file = os.path.join(workspace, 'validated_file.csv')
+            self.data_store = CCSColumnarStore(os.path.join(workspace, 'validated_data'))
             if not os.path.isdir("CCSLogFiles/training/"):
                 os.mkdir("CCSLogFiles/training/")
             self.log_path = "CCSLogFiles/training/CCSDataLoader.txt"
         else:
             self.operation = 'PREDICTION'
-            self.data_file = 'prediction_file.csv'
+            self.data_file = os.path.join(workspace, 'prediction_file.csv')
+            self.data_store = CCSColumnarStore(os.path.join(workspace, 'prediction_data'))
             if not os.path.isdir("CCSLogFiles/prediction/"):
                 os.mkdir("CCSLogFiles/prediction/")
             self.log_path = "CCSLogFiles/prediction/CCSDataLoader.txt"
 
-        self.ccs_dataloader_logging = logging.getLogger("ccs_dataloader_log")
-        self.ccs_dataloader_logging.setLevel(logging.INFO)
-        ccs_dataloader_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_dataloader_handler.setFormatter(formatter)
-        self.ccs_dataloader_logging.addHandler(ccs_dataloader_handler)
+        self.ccs_dataloader_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_get_data(self):
         """
         Method Name: ccs_get_data
-        Description: This method reads the data from source.
+        Description: This method reads the data from source, the columnar dataset written by ingestion if
+                     there is one and the csv data file otherwise.
         Output: A pandas DataFrame.
         On Failure: Raise Exception
         """
         try:
 
-            self.data = pd.read_csv(self.data_file)
+            if self.data_store.ccs_exists():
+                self.data = self.data_store.ccs_read()
+            else:
+                self.data = pd.read_csv(self.data_file)
             # To round all the values to two decimal digits as it is usually in the data files.
             self.data = self.data.round(2)
             message = f"{self.operation}: The data is loaded successfully as a pandas dataframe"
@@ -56,3 +63,32 @@ class CCSDataLoader:
             message = f"{self.operation}: Error while trying to load the data for prediction to pandas dataframe: {str(e)}"
             self.ccs_dataloader_logging.error(message)
             raise e
+
+    def ccs_get_data_in_chunks(self, chunk_size):
+        """
+        :Method Name: ccs_get_data_in_chunks
+        :Description: This method reads the data from source in blocks of a fixed number of rows, so that files
+                      of any size can be processed with a bounded amount of memory.
+        :param chunk_size: The number of rows in each block
+        :return: generator of pandas DataFrames
+        :On Failure: Exception
+        """
+        try:
+            num_rows = 0
+            if self.data_store.ccs_exists():
+                chunks = self.data_store.ccs_read_chunks(chunk_size)
+            else:
+                chunks = pd.read_csv(self.data_file, chunksize=chunk_size)
+
+            for chunk in chunks:
+                num_rows += len(chunk)
+                # To round all the values to two decimal digits as it is usually in the data files.
+                yield chunk.round(2)
+
+            message = f"{self.operation}: The data is loaded successfully, {num_rows} rows in blocks of {chunk_size}"
+            self.ccs_dataloader_logging.info(message)
+
+        except Exception as e:
+            message = f"{self.operation}: Error while trying to load the data in blocks: {str(e)}"
+            self.ccs_dataloader_logging.error(message)
+            raise e
@@ -1,8 +1,7 @@
 import os
 import json
-import logging
 import numpy as np
-from scipy.stats import normaltest, boxcox
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSEda:
@@ -40,13 +39,7 @@ class CCSEda:
         self.boxcox_transformed_feature = 'CCSRelInfo/BoxCox_Features.txt'
         self.log_transformed_feature = 'CCSRelInfo/Log_Features.txt'
 
-        self.ccs_eda_logging = logging.getLogger("ccs_eda_log")
-        self.ccs_eda_logging.setLevel(logging.INFO)
-        ccs_eda_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_eda_handler.setFormatter(formatter)
-        self.ccs_eda_logging.addHandler(ccs_eda_handler)
+        self.ccs_eda_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_feature_label_split(self, dataframe, label_col_names):
         """
@@ -164,6 +157,7 @@ class CCSEda:
                  not_normal_features - list of features which are not normal
         """
         try:
+            from scipy.stats import normaltest
 
             normal_features = []
             not_normal_features = []
@@ -195,6 +189,8 @@ class CCSEda:
         :return:
         """
         try:
+            from scipy.stats import normaltest, boxcox
+
             if self.operation == 'TRAINING':
 
                 normal_features, not_normal_features = self.ccs_normal_not_normal_distributed_features(dataframe, cont_columns)
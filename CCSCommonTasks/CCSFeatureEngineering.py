@@ -1,10 +1,8 @@
-import logging
 import os
 import numpy as np
 import pandas as pd
-from sklearn.impute import KNNImputer
 from CCSCommonTasks.CCSFileOperations import CCSFileOperations
-from sklearn.preprocessing import StandardScaler
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSFeatureEngineering:
@@ -18,12 +16,13 @@ class CCSFeatureEngineering:
     Version: 1.0
     """
 
-    def __init__(self, is_training):
+    def __init__(self, is_training, models_dir="CCSModels/"):
         """
         :Method Name: __init__
         :Description: it initializes the logging and various variables used in the class.
 
         :param is_training: Whether this class has been instantiated
+        :param models_dir: The directory in which the scalar and imputer are saved and loaded from
         """
 
         if is_training:
@@ -36,23 +35,18 @@ class CCSFeatureEngineering:
                 os.mkdir("CCSLogFiles/prediction")
             self.log_path = os.path.join("CCSLogFiles/prediction/", "CCSFeatureEngineering.txt")
             self.operation = "PREDICTION"
-        self.scalar_path = "CCSModels/"
-        self.imputer_path = "CCSModels/"
+        self.scalar_path = models_dir
+        self.imputer_path = models_dir
         self.file_operator = CCSFileOperations()
 
-        self.ccs_feature_engineering_logging = logging.getLogger("ccs_feature_engineering_log")
-        self.ccs_feature_engineering_logging.setLevel(logging.INFO)
-        ccs_feature_engineering_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_feature_engineering_handler.setFormatter(formatter)
-        self.ccs_feature_engineering_logging.addHandler(ccs_feature_engineering_handler)
+        self.ccs_feature_engineering_logging = CCSLogger().ccs_get_logger(self.log_path)
 
-    def ccs_standard_scaling_features(self, dataframe):
+    def ccs_standard_scaling_features(self, dataframe, scalar=None):
         """
         :Method Name: ccs_standard_scaling_features
         :Description: This method takes in a dataframe and scales it using standard scalar
         :param dataframe: this is the dataframe that needs to be scaled
+        :param scalar: (prediction only) an already loaded scalar, if None it is loaded from disk
         :return: The Scaled dataset.
 
         :On Failure: Exception
@@ -60,6 +54,9 @@ class CCSFeatureEngineering:
         try:
 
             if self.operation == 'TRAINING':
+                # The estimators are only imported for training, prediction uses the already fitted ones.
+                from sklearn.preprocessing import StandardScaler
+
                 scalar = StandardScaler()
                 scaled_df = pd.DataFrame(scalar.fit_transform(dataframe), columns=dataframe.columns)
                 message = "The dataset has been scaled using Standard Scalar"
@@ -67,7 +64,8 @@ class CCSFeatureEngineering:
                 self.file_operator.ccs_save_model(scalar, self.scalar_path, 'scalar.pickle')
                 return scaled_df
             else:
-                scalar = self.file_operator.ccs_load_model(os.path.join(self.scalar_path, "scalar.pickle"))
+                if scalar is None:
+                    scalar = self.file_operator.ccs_load_model(os.path.join(self.scalar_path, "scalar.pickle"))
                 scaled_df = pd.DataFrame(scalar.transform(dataframe), columns=dataframe.columns)
                 message = "The dataset has been scaled using Standard Scalar"
                 self.ccs_feature_engineering_logging.info(message)
@@ -78,17 +76,20 @@ class CCSFeatureEngineering:
             self.ccs_feature_engineering_logging.info(message)
             raise e
 
-    def ccs_handling_missing_data_mcar(self, dataframe, feature_with_missing):
+    def ccs_handling_missing_data_mcar(self, dataframe, feature_with_missing, imputer=None):
         """
         :Method Name: ccs_handling_missing_data_mcar
         :Description: This method replaces the missing values if there are not greater than 75% missing using KNNImputer
         :param dataframe: The dataframe where null values have to be replaced
         :param feature_with_missing: The features where
+        :param imputer: (prediction only) an already loaded imputer, if None it is loaded from disk
         :return: dataframe - features with imputed values
                  dropped_features - features with more than 75% null
         """
         try:
             if self.operation == 'TRAINING':
+                from sklearn.impute import KNNImputer
+
                 dropped_features = []
                 imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
 
@@ -112,8 +113,9 @@ class CCSFeatureEngineering:
                 return dataframe, dropped_features
 
             else:
-                if os.path.isfile(os.path.join(self.imputer_path, "imputer.pickle")):
+                if imputer is None and os.path.isfile(os.path.join(self.imputer_path, "imputer.pickle")):
                     imputer = self.file_operator.ccs_load_model(os.path.join(self.imputer_path, "imputer.pickle"))
+                if imputer is not None:
                     data = imputer.transform(dataframe)
                     dataframe = pd.DataFrame(data=data, columns=dataframe.columns)
                     message = f" missing values imputed using KNNImputer " \
@@ -1,7 +1,6 @@
 import os
 import pandas as pd
-import logging
-from sklearn.feature_selection import mutual_info_regression
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSFeatureSelection:
@@ -29,13 +28,7 @@ class CCSFeatureSelection:
             os.mkdir("CCSLogFiles/")
         self.log_path = os.path.join("CCSLogFiles/", "CCSFeatureSelection.txt")
 
-        self.ccs_feature_selection_logging = logging.getLogger("ccs_feature_selection_log")
-        self.ccs_feature_selection_logging.setLevel(logging.INFO)
-        ccs_feature_selection_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_feature_selection_handler.setFormatter(formatter)
-        self.ccs_feature_selection_logging.addHandler(ccs_feature_selection_handler)
+        self.ccs_feature_selection_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_remove_columns(self, dataframe, columns):
         """
@@ -100,6 +93,8 @@ class CCSFeatureSelection:
         :On Failure: Exception
         """
         try:
+            from sklearn.feature_selection import mutual_info_regression
+
             mutual_info = mutual_info_regression(features, label)
             feature_imp = pd.Series(mutual_info, index=features.columns)
             not_imp = list(feature_imp[feature_imp < threshold].index)
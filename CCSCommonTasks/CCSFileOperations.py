@@ -1,6 +1,6 @@
 import pickle
 import os
-import logging
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSFileOperations:
@@ -24,13 +24,7 @@ class CCSFileOperations:
             os.mkdir("CCSLogFiles/")
         self.log_path = os.path.join("CCSLogFiles/", "CCSFileOperation.txt")
 
-        self.ccs_file_operations_logging = logging.getLogger("ccs_file_operations_log")
-        self.ccs_file_operations_logging.setLevel(logging.INFO)
-        ccs_file_operation_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_file_operation_handler.setFormatter(formatter)
-        self.ccs_file_operations_logging.addHandler(ccs_file_operation_handler)
+        self.ccs_file_operations_logging = CCSLogger().ccs_get_logger(self.log_path)
 
     def ccs_save_model(self, model, model_dir, model_name):
         """
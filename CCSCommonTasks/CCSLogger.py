@@ -0,0 +1,240 @@
+import os
+import glob
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+try:
+    import fcntl
+except ImportError:
+    # No fork, and so no forked children, on this platform.
+    fcntl = None
+
+
+class CCSLogDispatcher(logging.Handler):
+    """
+    :Class Name: CCSLogDispatcher
+    :Description: This handler runs on the background writer thread and hands every record to the file
+                  handler of the log file it belongs to, so each record costs a single dictionary lookup
+                  whatever the number of log files.
+    """
+
+    def emit(self, record):
+        file_handler = CCSLogger._file_handlers.get(record.name)
+        if file_handler is not None:
+            file_handler.handle(record)
+
+
+class CCSLogger:
+    """
+    :Class Name: CCSLogger
+    :Description: This class configures the logging of the whole application once per process. Every log file
+                  under CCSLogFiles has a single logger with a single file handler, however many times the
+                  classes writing to it are instantiated. Log calls only put the record on a queue; the file
+                  writes are done by one background thread, off the request threads.
+
+                  A size rotated file may only be written by one process, or the processes rotate it under
+                  each other and lose records. CCS_LOG_ROTATION chooses how the files are rotated:
+                    "size" - each file is rotated by size (CCS_LOG_MAX_BYTES, CCS_LOG_BACKUP_COUNT). A forked
+                             child process, e.g. a worker of the pre-fork server, writes to files of its own
+                             named with its worker slot (CCSDataLoader.worker<slot>.txt), rotated by size as
+                             well. A worker started in place of one which ended takes over its slot and files,
+                             so their number is bounded by the number of processes running at once.
+                    "external" - all the processes append to the same files, which are rotated by an external
+                                 tool such as logrotate; every process reopens a file once it has been moved.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # The logging setup is shared by every instance in the process.
+    _queue = None
+    _queue_handler = None
+    _listener = None
+    _file_handlers = {}
+    # The log path of every logger, to reopen the files in a forked child.
+    _log_paths = {}
+    _in_forked_child = False
+    # The worker slot of a forked child, held by a lock on a file of CCS_LOG_SLOT_DIR.
+    _worker_slot = None
+    _worker_slot_file = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the rotation settings of the log files.
+        :return: None
+        :On Failure: ValueError if CCS_LOG_ROTATION is not 'size' nor 'external'
+        """
+        self.rotation = os.getenv("CCS_LOG_ROTATION", "size")
+        if self.rotation not in ("size", "external"):
+            raise ValueError(f"Unknown log rotation {self.rotation}, expected size or external")
+        self.max_bytes = int(os.getenv("CCS_LOG_MAX_BYTES", 10 * 1024 * 1024))
+        self.backup_count = int(os.getenv("CCS_LOG_BACKUP_COUNT", 5))
+        self.formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
+                                           datefmt='%m/%d/%Y %I:%M:%S %p')
+
+    def ccs_start_listener(self):
+        """
+        :Method Name: ccs_start_listener
+        :Description: This method creates the queue and starts the background thread writing the log records.
+                      It is called with the lock held on first use in the process.
+        :return: None
+        """
+        CCSLogger._queue = queue.Queue(-1)
+        if CCSLogger._queue_handler is None:
+            CCSLogger._queue_handler = QueueHandler(CCSLogger._queue)
+        else:
+            CCSLogger._queue_handler.queue = CCSLogger._queue
+        CCSLogger._listener = QueueListener(CCSLogger._queue, CCSLogDispatcher())
+        CCSLogger._listener.start()
+
+    def ccs_get_logger(self, log_path):
+        """
+        :Method Name: ccs_get_logger
+        :Description: This method returns the logger writing to the given log file. The logger and its file
+                      handler are created on the first call for a file, later calls return the same logger.
+
+        :param log_path: The path of the log file, e.g. CCSLogFiles/prediction/CCSDataLoader.txt
+        :return: logging.Logger
+        """
+        name = "ccs." + os.path.normpath(log_path)
+        logger = logging.getLogger(name)
+        if name in CCSLogger._file_handlers and CCSLogger._listener is not None:
+            return logger
+
+        with CCSLogger._lock:
+            if CCSLogger._listener is None:
+                self.ccs_start_listener()
+
+            if name not in CCSLogger._file_handlers:
+                log_dir = os.path.dirname(log_path)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                CCSLogger._file_handlers[name] = self.ccs_open_file_handler(log_path)
+                CCSLogger._log_paths[name] = log_path
+
+                logger.setLevel(logging.INFO)
+                # The records go only to this log file, not to the handlers of the root logger.
+                logger.propagate = False
+                logger.addHandler(CCSLogger._queue_handler)
+
+        return logger
+
+    def ccs_open_file_handler(self, log_path):
+        """
+        :Method Name: ccs_open_file_handler
+        :Description: This method creates the handler writing to the given log file, as set by CCS_LOG_ROTATION.
+                      The file is only opened when the first record is written to it.
+
+        :param log_path: The path of the log file
+        :return: logging.FileHandler
+        """
+        if self.rotation == "external":
+            file_handler = WatchedFileHandler(log_path, delay=True)
+        else:
+            if CCSLogger._in_forked_child:
+                if CCSLogger._worker_slot is None:
+                    CCSLogger._worker_slot = CCSLogger.ccs_acquire_worker_slot()
+                root, extension = os.path.splitext(log_path)
+                log_path = f"{root}.worker{CCSLogger._worker_slot}{extension}"
+            file_handler = RotatingFileHandler(log_path, maxBytes=self.max_bytes, backupCount=self.backup_count,
+                                               delay=True)
+        file_handler.setFormatter(self.formatter)
+        return file_handler
+
+    @staticmethod
+    def ccs_acquire_worker_slot():
+        """
+        :Method Name: ccs_acquire_worker_slot
+        :Description: This method gives a forked child process the lowest worker slot no other running process
+                      holds. A slot is held with a lock on its file under CCS_LOG_SLOT_DIR, which the system
+                      releases when the process ends, whichever way it ends.
+        :return: The worker slot
+        """
+        if fcntl is None:
+            return os.getpid()
+
+        slot_dir = os.getenv("CCS_LOG_SLOT_DIR", os.path.join("CCSLogFiles", ".slots"))
+        os.makedirs(slot_dir, exist_ok=True)
+        slot = 0
+        while True:
+            slot_file = open(os.path.join(slot_dir, f"{slot}.lock"), 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                slot_file.close()
+                slot += 1
+                continue
+            CCSLogger._worker_slot_file = slot_file
+            return slot
+
+    @staticmethod
+    def ccs_log_files(log_path):
+        """
+        :Method Name: ccs_log_files
+        :Description: This method lists the existing files a log is written to: the file of the main process and
+                      those of its forked children (see CCS_LOG_ROTATION), in the order of their worker slots.
+
+        :param log_path: The path of the log file, e.g. CCSLogFiles/prediction/CCSDataLoader.txt
+        :return: list of paths
+        """
+        root, extension = os.path.splitext(log_path)
+        prefix = f"{root}.worker"
+        worker_files = {}
+        for path in glob.glob(f"{glob.escape(prefix)}*{glob.escape(extension)}"):
+            slot = path[len(prefix):len(path) - len(extension)]
+            if slot.isdigit():
+                worker_files[int(slot)] = path
+        log_files = [log_path] + [worker_files[slot] for slot in sorted(worker_files)]
+        return [path for path in log_files if os.path.isfile(path)]
+
+    @staticmethod
+    def ccs_stop_listener():
+        """
+        :Method Name: ccs_stop_listener
+        :Description: This method writes out the records still in the queue and stops the background thread.
+                      It is called at interpreter exit.
+        :return: None
+        """
+        with CCSLogger._lock:
+            if CCSLogger._listener is not None:
+                CCSLogger._listener.stop()
+                CCSLogger._listener = None
+            for file_handler in CCSLogger._file_handlers.values():
+                file_handler.close()
+
+    @staticmethod
+    def ccs_reset_after_fork():
+        """
+        :Method Name: ccs_reset_after_fork
+        :Description: This method runs in a forked child process. The writer thread of the parent does not
+                      exist in the child, so a fresh queue and writer thread are started for the child. The
+                      files inherited from the parent are reopened, under the worker slot of the child if they
+                      are rotated by size, since the parent keeps rotating its own.
+        :return: None
+        """
+        CCSLogger._lock = threading.Lock()
+        CCSLogger._listener = None
+        CCSLogger._in_forked_child = True
+        # The slot of the parent stays held by the parent, the child takes one of its own on first use.
+        if CCSLogger._worker_slot_file is not None:
+            CCSLogger._worker_slot_file.close()
+        CCSLogger._worker_slot = None
+        CCSLogger._worker_slot_file = None
+        for name, file_handler in list(CCSLogger._file_handlers.items()):
+            # The child runs a single thread, the handler of the parent is dropped without taking its lock.
+            if file_handler.stream is not None:
+                file_handler.stream.close()
+            CCSLogger._file_handlers[name] = CCSLogger().ccs_open_file_handler(CCSLogger._log_paths[name])
+        if CCSLogger._queue_handler is not None:
+            # Records still queued in the parent are written by the parent, the child gets a queue of its own.
+            CCSLogger().ccs_start_listener()
+
+
+atexit.register(CCSLogger.ccs_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=CCSLogger.ccs_reset_after_fork)
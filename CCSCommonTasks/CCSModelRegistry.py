@@ -0,0 +1,211 @@
+import os
+import time
+import uuid
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is not available on Windows, the models are then read without waiting for a replacement to finish.
+    fcntl = None
+
+from CCSCommonTasks.CCSFileOperations import CCSFileOperations
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSModelRegistry:
+    """
+    :Class Name: CCSModelRegistry
+    :Description: This class keeps the complete set of artifacts required for prediction (scalar, imputer,
+                  cluster model, one ML model per cluster and the columns to drop) resident in memory for the
+                  whole process. The artifacts are loaded once and swapped atomically when a new training run
+                  finishes, so that predictions never unpickle models on the request path.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # The artifact set is shared by every instance in the process. It is only ever replaced as a whole so
+    # readers always see a complete and consistent set of models.
+    _artifacts = None
+    _lock = threading.Lock()
+    _last_version_check = 0.0
+
+    def __init__(self):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and paths where the models and
+                      relevant information are stored
+        :return: None
+        """
+
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSModelRegistry.txt")
+
+        self.ccs_model_registry_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.models_dir = "CCSModels/"
+        self.ml_model_dir = "CCSModels/CCSMLModels/"
+        self.rel_info_dir = "CCSRelInfo/"
+        # Held shared while the artifacts are read and exclusively while training replaces them, see
+        # CCSTrainingJobManager.ccs_replace_models.
+        self.models_lock_path = "CCSModels.lock"
+
+        # The version file is rewritten whenever training publishes a new set of models. Every process serving
+        # predictions (e.g. each pre-forked worker) polls it to pick up models trained in another process.
+        self.version_path = os.path.join(self.models_dir, "CCSModelVersion.txt")
+        self.version_check_interval = float(os.getenv("CCS_MODEL_VERSION_CHECK_SECONDS", 2))
+
+    def ccs_read_version(self):
+        """
+        :Method Name: ccs_read_version
+        :Description: This method reads the version of the models currently published on disk.
+        :return: The version string, or an empty string if no version has been published (yet)
+        """
+        try:
+            with open(self.version_path) as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def ccs_read_artifacts(self):
+        """
+        :Method Name: ccs_read_artifacts
+        :Description: This method reads the complete set of prediction artifacts from disk. The ML model
+                      directory is listed only once and every per cluster model is unpickled a single time.
+                      The models lock is held meanwhile, so the models and the columns to drop are never read
+                      in the middle of their replacement by a training job.
+
+        :return: A dictionary with the keys 'scalar', 'imputer', 'cluster', 'ml_models' (cluster no -> model),
+                 'columns_to_drop', 'version' and 'loaded_at'
+        :On Failure: Exception
+        """
+        try:
+            with open(self.models_lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_SH)
+
+                file_operator = CCSFileOperations()
+                version = self.ccs_read_version()
+
+                scalar = file_operator.ccs_load_model(os.path.join(self.models_dir, "scalar.pickle"))
+                cluster = file_operator.ccs_load_model(os.path.join(self.models_dir, "cluster.pickle"))
+
+                imputer = None
+                if os.path.isfile(os.path.join(self.models_dir, "imputer.pickle")):
+                    imputer = file_operator.ccs_load_model(os.path.join(self.models_dir, "imputer.pickle"))
+
+                ml_models = {}
+                for filename in os.listdir(self.ml_model_dir):
+                    if filename.endswith(".pickle") and "_cluster_" in filename:
+                        cluster_no = int(filename[:-len(".pickle")].rsplit("_cluster_", 1)[1])
+                        ml_models[cluster_no] = file_operator.ccs_load_model(os.path.join(self.ml_model_dir,
+                                                                                          filename))
+
+                with open(os.path.join(self.rel_info_dir, "columns_to_drop.txt")) as f:
+                    val = f.read()
+
+                columns_to_drop = val.split(",")
+                if columns_to_drop[0] == '':
+                    columns_to_drop = []
+
+            message = f"Artifacts read from disk: {len(ml_models)} cluster models, " \
+                      f"imputer present: {imputer is not None}"
+            self.ccs_model_registry_logging.info(message)
+
+            return {
+                "scalar": scalar,
+                "imputer": imputer,
+                "cluster": cluster,
+                "ml_models": ml_models,
+                "columns_to_drop": columns_to_drop,
+                "version": version,
+                "loaded_at": datetime.now()
+            }
+
+        except Exception as e:
+            message = f"Error while reading the prediction artifacts: {str(e)}"
+            self.ccs_model_registry_logging.error(message)
+            raise e
+
+    def ccs_load_artifacts(self):
+        """
+        :Method Name: ccs_load_artifacts
+        :Description: This method reads a fresh set of artifacts from disk and atomically replaces the set
+                      being served. Predictions already running keep using the set they started with.
+
+        :return: The newly loaded artifact dictionary
+        :On Failure: Exception
+        """
+        try:
+            artifacts = self.ccs_read_artifacts()
+
+            with CCSModelRegistry._lock:
+                CCSModelRegistry._artifacts = artifacts
+
+            message = f"New artifact set loaded at {artifacts['loaded_at']} is now being served"
+            self.ccs_model_registry_logging.info(message)
+
+            return artifacts
+
+        except Exception as e:
+            message = f"Error while loading the prediction artifacts into the registry: {str(e)}"
+            self.ccs_model_registry_logging.error(message)
+            raise e
+
+    def ccs_publish_artifacts(self):
+        """
+        :Method Name: ccs_publish_artifacts
+        :Description: This method is called once training has saved all the new artifacts. It records a new
+                      version on disk, so that other processes reload as well, and loads the artifacts into
+                      the registry of the current process.
+
+        :return: The newly loaded artifact dictionary
+        :On Failure: Exception
+        """
+        try:
+            temp_path = f"{self.version_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(uuid.uuid4().hex)
+            # os.replace is atomic, a reader sees either the old or the new version.
+            os.replace(temp_path, self.version_path)
+
+            return self.ccs_load_artifacts()
+
+        except Exception as e:
+            message = f"Error while publishing the new prediction artifacts: {str(e)}"
+            self.ccs_model_registry_logging.error(message)
+            raise e
+
+    def ccs_get_artifacts(self):
+        """
+        :Method Name: ccs_get_artifacts
+        :Description: This method returns the artifact set currently being served. The artifacts are loaded
+                      from disk if this is the first use in the process, and reloaded if a newer version has
+                      been published by another process.
+
+        :return: The artifact dictionary described in ccs_read_artifacts
+        :On Failure: Exception
+        """
+        artifacts = CCSModelRegistry._artifacts
+        if artifacts is not None:
+            now = time.monotonic()
+            if now - CCSModelRegistry._last_version_check >= self.version_check_interval:
+                CCSModelRegistry._last_version_check = now
+                version = self.ccs_read_version()
+                # An empty version means the models are being replaced by a training run right now.
+                if version and version != artifacts["version"]:
+                    try:
+                        artifacts = self.ccs_load_artifacts()
+                    except Exception:
+                        # The error is already logged, the previous set of models is kept in service.
+                        pass
+            return artifacts
+
+        with CCSModelRegistry._lock:
+            if CCSModelRegistry._artifacts is None:
+                CCSModelRegistry._artifacts = self.ccs_read_artifacts()
+            return CCSModelRegistry._artifacts
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+from contextlib import closing
+from CCSCommonTasks.CCSStorageBackend import CCSStorageBackend
+
+
+class CCSSQLiteBackend(CCSStorageBackend):
+    """
+    :Class Name: CCSSQLiteBackend
+    :Description: This class stores the good data in an embedded sqlite database file. It needs neither network
+                  nor credentials, so the database stage can be run and profiled on any machine. Rows are loaded
+                  with executemany, in one transaction per call.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    name = "sqlite"
+
+    # Datatypes of the schema and the sqlite datatype they are stored with.
+    schema_types = {"float": "REAL", "int": "INTEGER"}
+
+    def __init__(self, path=None):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets the database file, creating its directory if needed.
+
+        :param path: The path of the database file. Read from CCS_SQLITE_PATH if None.
+        """
+        if path is None:
+            path = os.getenv("CCS_SQLITE_PATH", "CCSDatabase/ccs_good_data.sqlite3")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+
+    def ccs_connect(self):
+        """
+        :Method Name: ccs_connect
+        :Description: This method opens a connection to the database file. A connection is opened per
+                      operation, as the operations run on different threads.
+        :return: sqlite3.Connection
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        # The write ahead log lets the tables be read while another pipeline is loading.
+        connection.execute("PRAGMA journal_mode=WAL;")
+        connection.execute("PRAGMA synchronous=NORMAL;")
+        return connection
+
+    def ccs_create_table(self, table_name, column_types):
+        """
+        :Method Name: ccs_create_table
+        :Description: This method creates the table, the float datatype of the schema is stored as REAL.
+                      See CCSStorageBackend for the parameters.
+        """
+        columns = "".join(f",\"{col_name}\" {self.schema_types.get(col_type, col_type)}"
+                          for col_name, col_type in column_types.items())
+        with closing(self.ccs_connect()) as connection, connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table_name}(id INTEGER PRIMARY KEY{columns});")
+
+    def ccs_truncate_table(self, table_name):
+        """
+        :Method Name: ccs_truncate_table
+        :Description: This method deletes all the rows of the table.
+                      See CCSStorageBackend for the parameters.
+        """
+        with closing(self.ccs_connect()) as connection, connection:
+            connection.execute(f"DELETE FROM {table_name};")
+
+    def ccs_insert_rows(self, table_name, column_names, rows):
+        """
+        :Method Name: ccs_insert_rows
+        :Description: This method loads the rows with executemany in one transaction.
+                      See CCSStorageBackend for the parameters.
+        """
+        col_names = ",".join(["id"] + [f"\"{col_name}\"" for col_name in column_names])
+        placeholders = ",".join("?" * (len(column_names) + 1))
+        # As in cassandra, a row with an existing id replaces it.
+        with closing(self.ccs_connect()) as connection, connection:
+            connection.executemany(f"INSERT OR REPLACE INTO {table_name}({col_names}) VALUES ({placeholders});",
+                                   rows)
+
+    def ccs_read_pages(self, table_name, column_names=None, fetch_size=5000):
+        """
+        :Method Name: ccs_read_pages
+        :Description: This method reads the table with a cursor, fetch_size rows at a time. The connection is
+                      closed once the last page has been read.
+                      See CCSStorageBackend for the parameters.
+        """
+        if column_names:
+            selected_columns = ",".join(["id"] + [f"\"{col_name}\"" for col_name in column_names])
+        else:
+            selected_columns = "*"
+
+        connection = self.ccs_connect()
+        try:
+            cursor = connection.execute(f"select {selected_columns} from {table_name};")
+            headers = [description[0] for description in cursor.description]
+        except Exception:
+            connection.close()
+            raise
+
+        def pages():
+            try:
+                while True:
+                    page = cursor.fetchmany(fetch_size)
+                    yield page
+                    if len(page) < fetch_size:
+                        break
+            finally:
+                connection.close()
+
+        return headers, pages()
@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSSchemaValidator:
+    """
+    :Class Name: CCSSchemaValidator
+    :Description: This class validates the rows of a dataset against a schema in CCSSchemas. The schema is
+                  compiled once per process into arrays of expected datatypes, required columns and value
+                  ranges, and every check then runs over all the rows and columns at once. Only the rows which
+                  fail a check are rejected, with the reason, instead of the whole file.
+
+                  Besides ColumnNames, a schema may contain
+                    "ColumnRanges": {"<column>": [minimum, maximum]}, null for no bound
+                    "RequiredColumns": ["<column>", ...], the columns which may not have missing values
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Compiled schemas shared by all instances: schema path -> (modification time, compiled schema).
+    _compiled = {}
+    _lock = threading.Lock()
+
+    def __init__(self, schema_path):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and compiles the schema if it has not been
+                      compiled yet or has changed since.
+
+        :param schema_path: The path of the schema json file
+        :On Failure: Exception
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSSchemaValidator.txt")
+
+        self.ccs_schema_validator_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.schema_path = schema_path
+        self.schema = self.ccs_compile_schema()
+
+    def ccs_compile_schema(self):
+        """
+        :Method Name: ccs_compile_schema
+        :Description: This method turns the schema into the arrays used by the vectorized checks.
+        :return: dictionary with 'column_names', 'numeric', 'integer', 'required', 'minimum' and 'maximum',
+                 the last five being numpy arrays with one entry per column
+        :On Failure: Exception
+        """
+        try:
+            modified_at = os.path.getmtime(self.schema_path)
+            with CCSSchemaValidator._lock:
+                cached = CCSSchemaValidator._compiled.get(self.schema_path)
+                if cached is not None and cached[0] == modified_at:
+                    return cached[1]
+
+                with open(self.schema_path, 'r') as f:
+                    dic = json.load(f)
+
+                column_names = list(dic["ColumnNames"])
+                column_types = list(dic["ColumnNames"].values())
+                column_ranges = dic.get("ColumnRanges", {})
+                required_columns = set(dic.get("RequiredColumns", []))
+
+                def bound(column, position, default):
+                    value = column_ranges.get(column, [None, None])[position]
+                    return default if value is None else float(value)
+
+                schema = {
+                    "column_names": column_names,
+                    "numeric": np.array([column_type in ("float", "int") for column_type in column_types]),
+                    "integer": np.array([column_type == "int" for column_type in column_types]),
+                    "required": np.array([column in required_columns for column in column_names]),
+                    "minimum": np.array([bound(column, 0, -np.inf) for column in column_names]),
+                    "maximum": np.array([bound(column, 1, np.inf) for column in column_names]),
+                }
+                CCSSchemaValidator._compiled[self.schema_path] = (modified_at, schema)
+
+            message = f"Schema {self.schema_path} compiled: {len(column_names)} columns, " \
+                      f"{len(required_columns)} required, {len(column_ranges)} with ranges"
+            self.ccs_schema_validator_logging.info(message)
+
+            return schema
+
+        except Exception as e:
+            message = f"Error while compiling the schema {self.schema_path}: {str(e)}"
+            self.ccs_schema_validator_logging.error(message)
+            raise e
+
+    def ccs_validate_rows(self, dataframe):
+        """
+        :Method Name: ccs_validate_rows
+        :Description: This method checks the datatype, missing values and range of every value of the table.
+                      The columns are matched with the schema by position. Rows with every value missing are
+                      rejected as well.
+
+        :param dataframe: The table to validate, with as many columns as the schema
+        :return: good_rows - the valid rows, with the numerical columns converted to numbers
+                 bad_rows - the rejected rows as they were given, with a 'reason' column
+        :On Failure: ValueError, Exception
+        """
+        schema = self.schema
+        if dataframe.shape[1] != len(schema["column_names"]):
+            raise ValueError(f"{dataframe.shape[1]} columns given, the schema has {len(schema['column_names'])}")
+
+        is_missing = dataframe.isna().to_numpy()
+        values = dataframe.apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+
+        with np.errstate(invalid="ignore"):
+            # A value which is present but did not convert to a number has the wrong datatype.
+            type_error = schema["numeric"] & np.isnan(values) & ~is_missing
+            type_error |= schema["integer"] & ~np.isnan(values) & (np.mod(values, 1) != 0)
+            missing_error = schema["required"] & is_missing
+            range_error = (values < schema["minimum"]) | (values > schema["maximum"])
+        empty_row = is_missing.all(axis=1)
+
+        is_bad = type_error.any(axis=1) | missing_error.any(axis=1) | range_error.any(axis=1) | empty_row
+
+        good_rows = dataframe[~is_bad].copy()
+        numeric_columns = [column for column, numeric in zip(dataframe.columns, schema["numeric"]) if numeric]
+        numeric_positions = np.flatnonzero(schema["numeric"])
+        if len(numeric_columns):
+            good_rows[numeric_columns] = values[~is_bad][:, numeric_positions]
+
+        bad_rows = dataframe[is_bad].copy()
+        reasons = pd.Series("", index=bad_rows.index, dtype=object)
+        if len(bad_rows):
+            reasons[empty_row[is_bad]] = "all values missing; "
+            # One vectorized pass per column and check, only over the rejected rows.
+            for position, column in enumerate(dataframe.columns):
+                for errors, text in ((type_error, "wrong datatype"), (missing_error, "missing value"),
+                                     (range_error, "out of range")):
+                    column_errors = errors[is_bad, position]
+                    if column_errors.any():
+                        reasons[column_errors] += f"{column}: {text}; "
+        bad_rows["reason"] = reasons.str.rstrip("; ")
+
+        return good_rows, bad_rows
@@ -0,0 +1,180 @@
+import os
+import atexit
+import threading
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSSessionManager:
+    """
+    :Class Name: CCSSessionManager
+    :Description: This class holds the one cassandra session of the process. The cluster is connected on first
+                  use only, and the session, which pools its connections and is safe to share between threads,
+                  is then reused by every pipeline and thread instead of connecting for each operation. A session
+                  which lost its connection is replaced on the next use, and the cluster is shut down when the
+                  process exits.
+
+                  The cluster is built by a factory, the secure connect bundle by default. Another factory, e.g.
+                  a local stand-in for the tests, is set with ccs_set_cluster_factory.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    keyspace = "concrete_compressive_strength_internship"
+
+    # State shared by all instances in the process.
+    _cluster_factory = None
+    _cluster = None
+    _session = None
+    _lock = threading.Lock()
+    _exit_handler_registered = False
+
+    def __init__(self):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature.
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSSessionManager.txt")
+
+        self.ccs_session_manager_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+    @staticmethod
+    def ccs_default_cluster():
+        """
+        :Method Name: ccs_default_cluster
+        :Description: This method builds the cluster of the datastax database from the secure connect bundle and
+                      the credentials in CASSANDRA_CLIENT_ID and CASSANDRA_CLIENT_SECRET.
+        :return: cassandra.cluster.Cluster, not connected yet
+        :On Failure: ImportError if the cassandra driver is not installed, logged by ccs_get_session
+        """
+        # The cassandra driver is only imported when the database is used, to keep it off the serving startup.
+        import cassandra.cluster
+        from cassandra.auth import PlainTextAuthProvider
+
+        cloud_config = {
+            'secure_connect_bundle': 'secure-connect-ineuron.zip'
+        }
+        auth_provider = PlainTextAuthProvider(os.getenv('CASSANDRA_CLIENT_ID'),
+                                              os.getenv('CASSANDRA_CLIENT_SECRET'))
+        return cassandra.cluster.Cluster(cloud=cloud_config, auth_provider=auth_provider)
+
+    @staticmethod
+    def ccs_set_cluster_factory(cluster_factory):
+        """
+        :Method Name: ccs_set_cluster_factory
+        :Description: This method replaces the factory building the cluster. The current session is closed, the
+                      next use connects with the new factory.
+        :param cluster_factory: function without arguments returning an object with connect() and shutdown(),
+                                None for the default cluster
+        :return: None
+        """
+        CCSSessionManager.ccs_shutdown()
+        CCSSessionManager._cluster_factory = cluster_factory
+
+    def ccs_get_session(self):
+        """
+        :Method Name: ccs_get_session
+        :Description: This method returns the session of the process, connecting the cluster if there is no
+                      session yet or the last one has been invalidated.
+        :return: session using the keyspace of the project, rows are returned as dictionaries
+        :On Failure: cassandra.cluster.NoHostAvailable, Exception
+        """
+        session = CCSSessionManager._session
+        if session is not None and not getattr(session, "is_shutdown", False):
+            return session
+
+        with CCSSessionManager._lock:
+            session = CCSSessionManager._session
+            if session is not None and not getattr(session, "is_shutdown", False):
+                return session
+
+            cluster = None
+            try:
+                cluster_factory = CCSSessionManager._cluster_factory or self.ccs_default_cluster
+                cluster = cluster_factory()
+                session = cluster.connect()
+
+                from cassandra.query import dict_factory
+                session.row_factory = dict_factory
+                session.execute(f"USE {self.keyspace};")
+
+                message = f"Connected to cassandra database, using the {self.keyspace} keyspace"
+                self.ccs_session_manager_logging.info(message)
+
+            except Exception as e:
+                message = f"Connection Unsuccessful with cassandra database: {str(e)}"
+                self.ccs_session_manager_logging.error(message)
+                # The threads of a cluster which could not be used are stopped, not left behind.
+                if cluster is not None:
+                    try:
+                        cluster.shutdown()
+                    except Exception:
+                        pass
+                raise e
+
+            CCSSessionManager._cluster = cluster
+            CCSSessionManager._session = session
+            if not CCSSessionManager._exit_handler_registered:
+                atexit.register(CCSSessionManager.ccs_shutdown)
+                CCSSessionManager._exit_handler_registered = True
+
+            return session
+
+    def ccs_invalidate(self, error):
+        """
+        :Method Name: ccs_invalidate
+        :Description: This method closes the session after an error which means the connection to the database
+                      is lost, so that the next use connects again. Other errors, such as the timeout of a single
+                      query, leave the session as it is, as other threads are still using it.
+        :param error: The exception raised by a database operation
+        :return: True if the session was closed
+        """
+        try:
+            from cassandra.cluster import NoHostAvailable
+            from cassandra.connection import ConnectionException
+        except ImportError:
+            return False
+
+        if not isinstance(error, (NoHostAvailable, ConnectionException)):
+            return False
+
+        message = f"Connection to cassandra database lost, reconnecting on next use: {str(error)}"
+        self.ccs_session_manager_logging.error(message)
+        CCSSessionManager.ccs_shutdown()
+        return True
+
+    @staticmethod
+    def ccs_shutdown():
+        """
+        :Method Name: ccs_shutdown
+        :Description: This method shuts the cluster of the process down. It is run when the process exits.
+        :return: None
+        """
+        with CCSSessionManager._lock:
+            cluster = CCSSessionManager._cluster
+            CCSSessionManager._cluster = None
+            CCSSessionManager._session = None
+        if cluster is not None:
+            try:
+                cluster.shutdown()
+            except Exception:
+                pass
+
+    @staticmethod
+    def ccs_reset_after_fork():
+        """
+        :Method Name: ccs_reset_after_fork
+        :Description: This method forgets the session of the parent in a forked child. The connections of the
+                      driver cannot be shared between processes, the child connects on its own on first use.
+        :return: None
+        """
+        CCSSessionManager._lock = threading.Lock()
+        CCSSessionManager._cluster = None
+        CCSSessionManager._session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=CCSSessionManager.ccs_reset_after_fork)
@@ -0,0 +1,96 @@
+import os
+
+
+class CCSStorageBackend:
+    """
+    :Class Name: CCSStorageBackend
+    :Description: This class is the interface of the database in which the good data is stored. CCSDBOperation
+                  only goes through these methods, so the database can be swapped:
+                    1. CCSCassandraBackend - the cassandra database of DataStax Astra
+                    2. CCSSQLiteBackend - an embedded sqlite file, needing no network nor credentials
+                  The backend is chosen with CCS_STORAGE_BACKEND, see ccs_create.
+
+                  Tables have an integer id as primary key and one column per column of the schema, whose
+                  datatype is the one in the schema ('float' or 'int'). Rows are tuples of the id followed by
+                  the values in the order of the columns, None for a missing value.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    name = None
+
+    @staticmethod
+    def ccs_create(name=None, insert_concurrency=None):
+        """
+        :Method Name: ccs_create
+        :Description: This method builds the storage backend of the given name.
+        :param name: 'cassandra' or 'sqlite'. Read from CCS_STORAGE_BACKEND if None, cassandra by default.
+        :param insert_concurrency: maximum number of insertions in flight at a time, for the backends sending
+                                   them concurrently
+        :return: CCSStorageBackend
+        :On Failure: ValueError if there is no backend of that name
+        """
+        if name is None:
+            name = os.getenv("CCS_STORAGE_BACKEND", "cassandra")
+
+        if name == "cassandra":
+            from CCSCommonTasks.CCSCassandraBackend import CCSCassandraBackend
+            return CCSCassandraBackend(insert_concurrency=insert_concurrency)
+        if name == "sqlite":
+            from CCSCommonTasks.CCSSQLiteBackend import CCSSQLiteBackend
+            return CCSSQLiteBackend()
+        raise ValueError(f"Unknown storage backend {name}, expected cassandra or sqlite")
+
+    def ccs_create_table(self, table_name, column_types):
+        """
+        :Method Name: ccs_create_table
+        :Description: This method creates the table if it does not exist yet.
+        :param table_name: The name of the table
+        :param column_types: dictionary of column name -> datatype as in the schema, the id column excluded
+        :return: None
+        """
+        raise NotImplementedError
+
+    def ccs_truncate_table(self, table_name):
+        """
+        :Method Name: ccs_truncate_table
+        :Description: This method deletes all the rows of the table.
+        :param table_name: The name of the table
+        :return: None
+        """
+        raise NotImplementedError
+
+    def ccs_insert_rows(self, table_name, column_names, rows):
+        """
+        :Method Name: ccs_insert_rows
+        :Description: This method inserts rows in bulk. A row with the id of an existing row replaces it.
+        :param table_name: The name of the table
+        :param column_names: The names of the columns of the rows, the id column excluded
+        :param rows: iterable of tuples (id, value, ...)
+        :return: None
+        """
+        raise NotImplementedError
+
+    def ccs_read_pages(self, table_name, column_names=None, fetch_size=5000):
+        """
+        :Method Name: ccs_read_pages
+        :Description: This method reads the whole table in pages, a page being only read once the previous one
+                      has been handed over.
+        :param table_name: The name of the table
+        :param column_names: The columns to read after the id, in order. All the columns if None.
+        :param fetch_size: The number of rows in each page
+        :return: list of the names of the columns read, generator of lists of row tuples
+        """
+        raise NotImplementedError
+
+    def ccs_handle_error(self, error):
+        """
+        :Method Name: ccs_handle_error
+        :Description: This method is told of an error raised by an operation, e.g. to reconnect after a lost
+                      connection.
+        :param error: The exception raised
+        :return: None
+        """
+        pass
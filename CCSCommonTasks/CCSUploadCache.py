@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import shutil
+import uuid
+import hashlib
+import threading
+from CCSCommonTasks.CCSLogger import CCSLogger
+from CCSCommonTasks.CCSUploadStream import CCSUploadStream
+
+
+class CCSUploadCache:
+    """
+    :Class Name: CCSUploadCache
+    :Description: This class is a content addressed store of what was computed for an upload. Uploads are hashed
+                  (sha256) while they are received and written to disk (see CCSUploadStream), and the hash is the
+                  key under which the validation verdict, the validated columnar dataset, the quarantined rows
+                  and, for prediction, the results of every model version are kept. A workbook submitted again is
+                  then neither validated, parsed nor predicted again.
+
+                  Layout: <root_dir>/<training|prediction>/<sha256>/verdict.json, data/, quarantined_rows.csv,
+                  predictions/<model version>.csv, and <root_dir>/incoming/ for the uploads being received
+
+                  Files are hard linked in and out of the cache, so a hit does not copy any data. The files
+                  stored are never modified in place, they are only ever replaced by new files.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Digests of directories already hashed: path -> (names, sizes and modification times, digest).
+    _directory_digests = {}
+    _lock = threading.Lock()
+
+    def __init__(self, root_dir=None):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the directory of the cache.
+
+        :param root_dir: The directory of the cache. Read from CCS_UPLOAD_CACHE_DIR if None.
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSUploadCache.txt")
+
+        self.ccs_upload_cache_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        if root_dir is None:
+            root_dir = os.getenv("CCS_UPLOAD_CACHE_DIR", "CCSUploadCache")
+        self.root_dir = root_dir
+
+    def ccs_open_upload(self, max_bytes=None, signatures=None):
+        """
+        :Method Name: ccs_open_upload
+        :Description: This method creates the file an upload is written to as it arrives, in the incoming
+                      directory of the cache, next to the workspaces, from which ccs_save_upload moves it.
+
+        :param max_bytes: The maximum size of the file, no limit if None
+        :param signatures: The leading bytes (magic numbers) of the accepted formats, any format if None
+        :return: CCSUploadStream
+        """
+        incoming_dir = os.path.join(self.root_dir, "incoming")
+        os.makedirs(incoming_dir, exist_ok=True)
+        return CCSUploadStream(os.path.join(incoming_dir, f"{os.getpid()}.{uuid.uuid4().hex}.part"),
+                               max_bytes=max_bytes, signatures=signatures)
+
+    def ccs_save_upload(self, stream, file_path, max_bytes=None, signatures=None, chunk_size=1 << 20):
+        """
+        :Method Name: ccs_save_upload
+        :Description: This method saves an uploaded file to disk and returns its hash. An upload already
+                      received into a CCSUploadStream (see ccs_open_upload and CCSUploadRequest) has been hashed
+                      and checked as it arrived, and is only moved to file_path. Any other stream is written to
+                      file_path chunk by chunk through a CCSUploadStream, with the same checks. Either way the
+                      file is neither held in memory nor read a second time to be hashed.
+
+        :param stream: CCSUploadStream, or the file like object of the upload
+        :param file_path: The path to save the file to
+        :param max_bytes: The maximum size of the file, no limit if None
+        :param signatures: The leading bytes (magic numbers) of the accepted formats, any format if None
+        :param chunk_size: The number of bytes read at a time
+        :return: The sha256 hex digest of the file
+        :On Failure: RequestEntityTooLarge, UnsupportedMediaType if the file is rejected, Exception
+        """
+        try:
+            if isinstance(stream, CCSUploadStream):
+                upload = stream
+            else:
+                upload = CCSUploadStream(file_path, max_bytes=max_bytes, signatures=signatures)
+                for chunk in iter(lambda: stream.read(chunk_size), b""):
+                    upload.write(chunk)
+            digest = upload.ccs_save(file_path)
+
+            message = f"Upload {file_path} saved, {upload.num_bytes} bytes"
+            self.ccs_upload_cache_logging.info(message)
+
+            return digest
+
+        except Exception as e:
+            message = f"Error while saving the upload {file_path}: {str(e)}"
+            self.ccs_upload_cache_logging.error(message)
+            raise e
+
+    @staticmethod
+    def ccs_hash_file(file_path, chunk_size=1 << 20):
+        """
+        :Method Name: ccs_hash_file
+        :Description: This method hashes a file chunk by chunk.
+        :param file_path: The path of the file
+        :param chunk_size: The number of bytes read at a time
+        :return: The sha256 hex digest of the file
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def ccs_hash_directory(self, dir_path):
+        """
+        :Method Name: ccs_hash_directory
+        :Description: This method hashes the names and contents of all the files of a directory, e.g. the
+                      default prediction dataset. The digest is reused as long as no file of the directory has
+                      been added, removed or modified.
+
+        :param dir_path: The directory to hash
+        :return: The sha256 hex digest of the directory
+        """
+        filenames = sorted(os.listdir(dir_path))
+        stats = [os.stat(os.path.join(dir_path, filename)) for filename in filenames]
+        signature = [(filename, stat.st_size, stat.st_mtime_ns) for filename, stat in zip(filenames, stats)]
+
+        with CCSUploadCache._lock:
+            cached = CCSUploadCache._directory_digests.get(dir_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        for filename in filenames:
+            digest.update(filename.encode() + b"\0" + self.ccs_hash_file(os.path.join(dir_path, filename)).encode())
+        digest = digest.hexdigest()
+
+        with CCSUploadCache._lock:
+            CCSUploadCache._directory_digests[dir_path] = (signature, digest)
+        return digest
+
+    def ccs_entry_path(self, key, is_training):
+        """
+        :Method Name: ccs_entry_path
+        :Description: This method gives the directory of the entry of an upload.
+        :param key: The digest of the upload
+        :param is_training: Whether the upload is for training or for prediction
+        :return: The path of the entry
+        """
+        return os.path.join(self.root_dir, "training" if is_training else "prediction", key)
+
+    @staticmethod
+    def ccs_link(source, destination):
+        """
+        :Method Name: ccs_link
+        :Description: This method hard links a file or every file of a directory to a new path. Files are only
+                      copied when a link is not possible, e.g. to another file system.
+        :param source: The file or directory to link
+        :param destination: The new path, which must not exist
+        :return: None
+        """
+        if os.path.isdir(source):
+            os.makedirs(destination)
+            for name in os.listdir(source):
+                CCSUploadCache.ccs_link(os.path.join(source, name), os.path.join(destination, name))
+            return
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    def ccs_get_verdict(self, key, is_training, schema_digest):
+        """
+        :Method Name: ccs_get_verdict
+        :Description: This method looks up the validation verdict of an upload. Verdicts reached with another
+                      version of the schema are not used.
+
+        :param key: The digest of the upload
+        :param is_training: Whether the upload is for training or for prediction
+        :param schema_digest: The digest of the schema the upload is validated against
+        :return: dictionary with 'valid' and 'reason', None if the upload is not in the cache
+        """
+        verdict_path = os.path.join(self.ccs_entry_path(key, is_training), "verdict.json")
+        try:
+            with open(verdict_path) as f:
+                verdict = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if verdict.get("schema") != schema_digest:
+            return None
+
+        # The modification time of the entry is its last use, see ccs_remove_stale_entries.
+        os.utime(self.ccs_entry_path(key, is_training))
+        message = f"Cache hit for {'training' if is_training else 'prediction'} upload {key}"
+        self.ccs_upload_cache_logging.info(message)
+        return verdict
+
+    def ccs_put_entry(self, key, is_training, verdict, artifacts):
+        """
+        :Method Name: ccs_put_entry
+        :Description: This method stores the verdict and the artifacts computed for an upload. The entry is
+                      built next to its final path and renamed into place, so a reader never sees a partial one.
+
+        :param key: The digest of the upload
+        :param is_training: Whether the upload is for training or for prediction
+        :param verdict: dictionary with 'valid', 'reason' and 'schema', the digest of the schema
+        :param artifacts: dictionary of name in the entry -> file or directory to store, missing ones are skipped
+        :return: None
+        """
+        entry_path = self.ccs_entry_path(key, is_training)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+            for name, source in artifacts.items():
+                if os.path.exists(source):
+                    self.ccs_link(source, os.path.join(temp_path, name))
+            with open(os.path.join(temp_path, "verdict.json"), 'w') as f:
+                json.dump(verdict, f)
+
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.replace(temp_path, entry_path)
+
+            message = f"Upload {key} cached, valid: {verdict['valid']}"
+            self.ccs_upload_cache_logging.info(message)
+
+        except OSError as e:
+            # The same upload may be cached by another request at the same time. The cache is an optimization,
+            # the upload has been ingested anyway.
+            shutil.rmtree(temp_path, ignore_errors=True)
+            message = f"Error while caching the upload {key}: {str(e)}"
+            self.ccs_upload_cache_logging.error(message)
+
+    def ccs_restore_entry(self, key, is_training, artifacts):
+        """
+        :Method Name: ccs_restore_entry
+        :Description: This method links the stored artifacts of an upload into a workspace.
+
+        :param key: The digest of the upload
+        :param is_training: Whether the upload is for training or for prediction
+        :param artifacts: dictionary of name in the entry -> path to restore it to, as given to ccs_put_entry
+        :return: None
+        """
+        entry_path = self.ccs_entry_path(key, is_training)
+        for name, destination in artifacts.items():
+            source = os.path.join(entry_path, name)
+            if os.path.exists(source):
+                shutil.rmtree(destination, ignore_errors=True)
+                self.ccs_link(source, destination)
+
+    def ccs_get_predictions(self, key, model_version):
+        """
+        :Method Name: ccs_get_predictions
+        :Description: This method looks up the results of a prediction upload for a version of the models.
+        :param key: The digest of the upload
+        :param model_version: The version of the models, see CCSModelRegistry
+        :return: The path of the stored result file, None if there is none
+        """
+        if not model_version:
+            return None
+        result_path = os.path.join(self.ccs_entry_path(key, False), "predictions", f"{model_version}.csv")
+        return result_path if os.path.isfile(result_path) else None
+
+    def ccs_put_predictions(self, key, model_version, result_file):
+        """
+        :Method Name: ccs_put_predictions
+        :Description: This method stores the results of a prediction upload for a version of the models. They
+                      are only stored if the upload itself is in the cache.
+
+        :param key: The digest of the upload
+        :param model_version: The version of the models the results were predicted with
+        :param result_file: The result file to store
+        :return: None
+        """
+        predictions_dir = os.path.join(self.ccs_entry_path(key, False), "predictions")
+        if not model_version or not os.path.isdir(os.path.dirname(predictions_dir)):
+            return
+        try:
+            os.makedirs(predictions_dir, exist_ok=True)
+            temp_path = os.path.join(predictions_dir, f"{model_version}.{os.getpid()}.{threading.get_ident()}.tmp")
+            self.ccs_link(result_file, temp_path)
+            os.replace(temp_path, os.path.join(predictions_dir, f"{model_version}.csv"))
+
+            message = f"Predictions of upload {key} cached for model version {model_version}"
+            self.ccs_upload_cache_logging.info(message)
+
+        except OSError as e:
+            # As in ccs_put_entry, the predictions have been served anyway.
+            message = f"Error while caching the predictions of upload {key}: {str(e)}"
+            self.ccs_upload_cache_logging.error(message)
+
+    def ccs_remove_stale_entries(self, max_age_hours):
+        """
+        :Method Name: ccs_remove_stale_entries
+        :Description: This method deletes the entries which have not been used for the given time.
+        :param max_age_hours: The age in hours after which an entry is considered stale
+        :return: None
+        """
+        cutoff = time.time() - max_age_hours * 3600
+        for kind in ("training", "prediction"):
+            kind_dir = os.path.join(self.root_dir, kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            for key in os.listdir(kind_dir):
+                path = os.path.join(kind_dir, key)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        shutil.rmtree(path, ignore_errors=True)
+
+                        message = f"Stale cache entry {kind}/{key} removed"
+                        self.ccs_upload_cache_logging.info(message)
+
+                except OSError:
+                    # Another process may have removed the same entry in the meantime.
+                    pass
+
+        # Uploads left behind by a process which stopped while receiving them.
+        incoming_dir = os.path.join(self.root_dir, "incoming")
+        if os.path.isdir(incoming_dir):
+            for filename in os.listdir(incoming_dir):
+                try:
+                    if os.path.getmtime(os.path.join(incoming_dir, filename)) < cutoff:
+                        os.remove(os.path.join(incoming_dir, filename))
+                except OSError:
+                    pass
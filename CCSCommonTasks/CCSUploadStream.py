@@ -0,0 +1,134 @@
+import os
+import shutil
+import hashlib
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSUploadStream:
+    """
+    :Class Name: CCSUploadStream
+    :Description: This class is the file an upload is written to as its bytes arrive, e.g. from the multipart
+                  parser of the request (see CCSUploadRequest). Every chunk is hashed (sha256), counted and
+                  written straight to disk, and the leading bytes are checked against the accepted formats as
+                  soon as they are in, so a file which is too large or not of the expected format is rejected
+                  before the rest of it is received. The file is then moved, not copied, to its destination.
+
+                  A rejected file, or one which is closed without having been saved, is deleted.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, path, max_bytes=None, signatures=None):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and opens the file the upload is written to.
+
+        :param path: The path of the file the upload is written to until it is saved
+        :param max_bytes: The maximum size of the file, no limit if None
+        :param signatures: The leading bytes (magic numbers) of the accepted formats, any format if None
+        """
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSUploadStream.txt")
+
+        self.ccs_upload_stream_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.signatures = signatures
+        self.header_size = max((len(signature) for signature in signatures), default=0) if signatures else 0
+        self.header = b""
+        self.num_bytes = 0
+        self.digest = hashlib.sha256()
+        self.saved = False
+        self.file = open(path, 'w+b')
+
+    def __getattr__(self, name):
+        # read, readline, seek, ... of the underlying file, as expected from the stream of an uploaded file.
+        if name == "file":
+            raise AttributeError(name)
+        return getattr(self.file, name)
+
+    def write(self, data):
+        """
+        :Method Name: write
+        :Description: This method checks, hashes and writes the next chunk of the upload.
+
+        :param data: The bytes received
+        :return: The number of bytes written
+        :On Failure: RequestEntityTooLarge, UnsupportedMediaType, Exception. The file is deleted.
+        """
+        try:
+            self.num_bytes += len(data)
+            if self.max_bytes is not None and self.num_bytes > self.max_bytes:
+                raise RequestEntityTooLarge(f"The upload is larger than {self.max_bytes // (1024 * 1024)} MB")
+            if len(self.header) < self.header_size:
+                self.header += data[:self.header_size - len(self.header)]
+                if len(self.header) == self.header_size:
+                    self.ccs_check_signature()
+            self.digest.update(data)
+            return self.file.write(data)
+
+        except Exception as e:
+            message = f"Upload {self.path} rejected after {self.num_bytes} bytes: {str(e)}"
+            self.ccs_upload_stream_logging.error(message)
+            self.ccs_discard()
+            raise e
+
+    def ccs_check_signature(self):
+        """
+        :Method Name: ccs_check_signature
+        :Description: This method checks that the file starts with one of the accepted magic numbers.
+        :return: None
+        :On Failure: UnsupportedMediaType
+        """
+        if self.signatures and not any(self.header.startswith(signature) for signature in self.signatures):
+            raise UnsupportedMediaType("The upload is not a file of an accepted format")
+
+    def ccs_save(self, file_path):
+        """
+        :Method Name: ccs_save
+        :Description: This method completes the upload and moves the file to its destination, a rename if it
+                      is on the same file system.
+
+        :param file_path: The path to save the file to
+        :return: The sha256 hex digest of the file
+        :On Failure: UnsupportedMediaType if the file is shorter than the signatures, Exception. The file is
+                     deleted.
+        """
+        try:
+            if len(self.header) < self.header_size:
+                self.ccs_check_signature()
+            self.file.close()
+            if os.path.abspath(file_path) != os.path.abspath(self.path):
+                shutil.move(self.path, file_path)
+            self.saved = True
+
+            return self.digest.hexdigest()
+
+        except Exception as e:
+            message = f"Upload {self.path} could not be saved to {file_path}: {str(e)}"
+            self.ccs_upload_stream_logging.error(message)
+            self.ccs_discard()
+            raise e
+
+    def ccs_discard(self):
+        """
+        :Method Name: ccs_discard
+        :Description: This method closes the file and deletes it unless it has been saved.
+        :return: None
+        """
+        self.file.close()
+        if not self.saved and os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        """
+        :Method Name: close
+        :Description: This method is called once the request is over. An upload which was not saved is deleted.
+        :return: None
+        """
+        self.ccs_discard()
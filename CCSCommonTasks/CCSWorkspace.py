@@ -0,0 +1,95 @@
+import os
+import re
+import time
+import uuid
+import shutil
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSWorkspace:
+    """
+    :Class Name: CCSWorkspace
+    :Description: This class provides an isolated working directory for a single upload (job). Every intermediate
+                  file of the job (uploaded files, validation manifest, validated/prediction csv and prediction result)
+                  is kept inside it, so that several uploads can be processed at the same time by different threads
+                  or worker processes without overwriting each other.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, workspace_id=None, root_dir="CCSWorkspaces"):
+        """
+        :Method Name: __init__
+        :Description: This constructor creates a new workspace, or opens an existing one if its id is given.
+
+        :param workspace_id: The id of an existing workspace. A new workspace is created if None.
+        :param root_dir: The directory under which all the workspaces are created.
+        :On Failure: ValueError, Exception
+        """
+
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSWorkspace.txt")
+
+        self.ccs_workspace_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.root_dir = root_dir
+
+        try:
+            if workspace_id is None:
+                workspace_id = uuid.uuid4().hex
+                os.makedirs(os.path.join(self.root_dir, workspace_id, "CCSUploadedFiles"))
+
+                message = f"Workspace {workspace_id} created"
+                self.ccs_workspace_logging.info(message)
+
+            # The id is used to build a path, so only ids generated by this class are accepted.
+            elif not re.fullmatch(r"[0-9a-f]{32}", workspace_id) or \
+                    not os.path.isdir(os.path.join(self.root_dir, workspace_id)):
+                raise ValueError(f"No workspace with id {workspace_id}")
+
+            self.workspace_id = workspace_id
+            self.path = os.path.join(self.root_dir, workspace_id)
+            self.upload_dir = os.path.join(self.path, "CCSUploadedFiles")
+
+        except Exception as e:
+            message = f"Error while opening workspace {workspace_id}: {str(e)}"
+            self.ccs_workspace_logging.error(message)
+            raise e
+
+    def ccs_remove_workspace(self):
+        """
+        :Method Name: ccs_remove_workspace
+        :Description: This method deletes the workspace along with all the files in it.
+        :return: None
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+        message = f"Workspace {self.workspace_id} removed"
+        self.ccs_workspace_logging.info(message)
+
+    def ccs_remove_stale_workspaces(self, max_age_hours):
+        """
+        :Method Name: ccs_remove_stale_workspaces
+        :Description: This method deletes the workspaces which have not been modified for the given time. The
+                      workspace of the current job is never removed.
+
+        :param max_age_hours: The age in hours after which a workspace is considered stale
+        :return: None
+        """
+        cutoff = time.time() - max_age_hours * 3600
+
+        for workspace_id in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, workspace_id)
+            try:
+                if workspace_id != self.workspace_id and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+
+                    message = f"Stale workspace {workspace_id} removed"
+                    self.ccs_workspace_logging.info(message)
+
+            except OSError:
+                # Another process may have removed the same workspace in the meantime.
+                pass
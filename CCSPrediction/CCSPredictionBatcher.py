@@ -0,0 +1,142 @@
+import os
+import time
+import queue
+import threading
+import pandas as pd
+from concurrent.futures import Future
+
+from CCSPrediction.CCSPredictionPipeline import CCSPredictionPipeline
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSPredictionBatcher:
+    """
+    :Class Name: CCSPredictionBatcher
+    :Description: This class coalesces small prediction requests arriving concurrently into a single batch.
+                  The rows are held for at most a small time window (or until the batch is full), stacked into
+                  one dataframe and passed through the prediction pipeline once, so that scaling, cluster
+                  routing and each per cluster model run once per batch instead of once per request.
+                  The results are then handed back to each waiting request.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, max_batch_size=64, max_wait_ms=5):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the batching parameters.
+
+        :param max_batch_size: The number of rows after which a batch is run without waiting any longer
+        :param max_wait_ms: The maximum time in milliseconds the first request of a batch waits for others
+        :return: None
+        """
+
+        self.operation = 'PREDICTION'
+        if not os.path.isdir("CCSLogFiles/prediction/"):
+            os.mkdir("CCSLogFiles/prediction")
+        self.log_path = os.path.join("CCSLogFiles/prediction/", "CCSPredictionBatcher.txt")
+
+        self.ccs_prediction_batcher_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self.pending = None
+        self.worker = None
+        self.worker_pid = None
+        self.worker_lock = threading.Lock()
+
+    def ccs_start_worker(self):
+        """
+        :Method Name: ccs_start_worker
+        :Description: This method starts the background thread which forms and runs the batches. It is started
+                      lazily, and again in a forked child process, as threads do not survive a fork.
+        :return: None
+        """
+        with self.worker_lock:
+            if self.worker is None or self.worker_pid != os.getpid():
+                self.pending = queue.Queue()
+                self.worker = threading.Thread(target=self.ccs_batch_worker, args=[self.pending], daemon=True)
+                self.worker_pid = os.getpid()
+                self.worker.start()
+
+                message = f"{self.operation}: Batch worker started with max_batch_size={self.max_batch_size}, " \
+                          f"max_wait={self.max_wait}s"
+                self.ccs_prediction_batcher_logging.info(message)
+
+    def ccs_predict(self, dataframe):
+        """
+        :Method Name: ccs_predict
+        :Description: This method predicts on the given rows as part of the next batch and blocks until the
+                      result is available. Requests that alone fill a batch are predicted directly.
+
+        :param dataframe: pandas dataframe with the feature columns as per the prediction schema
+        :return: the features and their predicted labels as a dataframe, in the same order as the input
+        :On Failure: Exception
+        """
+        if len(dataframe) >= self.max_batch_size:
+            return CCSPredictionPipeline().ccs_predict_dataframe(dataframe)
+
+        if self.worker is None or self.worker_pid != os.getpid():
+            self.ccs_start_worker()
+
+        future = Future()
+        self.pending.put((dataframe, future))
+        return future.result()
+
+    def ccs_batch_worker(self, pending):
+        """
+        :Method Name: ccs_batch_worker
+        :Description: This method runs on the background thread. It waits for a first request, then collects
+                      further requests until the batch is full or the time window is over, and runs the batch.
+
+        :param pending: The queue on which the requests arrive
+        :return: None
+        """
+        while True:
+            batch = [pending.get()]
+            num_rows = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+
+            while num_rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                num_rows += len(item[0])
+
+            self.ccs_run_batch(batch)
+
+    def ccs_run_batch(self, batch):
+        """
+        :Method Name: ccs_run_batch
+        :Description: This method stacks the rows of all requests in the batch, predicts on them with a single
+                      pass through the prediction pipeline and fans the results back out to the requests.
+
+        :param batch: list of (dataframe, future) tuples
+        :return: None
+        """
+        try:
+            stacked = pd.concat([dataframe for dataframe, future in batch], ignore_index=True)
+            result = CCSPredictionPipeline().ccs_predict_dataframe(stacked)
+
+            offset = 0
+            for dataframe, future in batch:
+                future.set_result(result.iloc[offset:offset + len(dataframe)].reset_index(drop=True))
+                offset += len(dataframe)
+
+            message = f"{self.operation}: Batch of {len(batch)} requests with {len(stacked)} rows predicted"
+            self.ccs_prediction_batcher_logging.info(message)
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while predicting on a batch: {str(e)}"
+            self.ccs_prediction_batcher_logging.error(message)
+            for dataframe, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -1,13 +1,16 @@
 import os
 import json
-import logging
+import threading
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
-from CCSCommonTasks.CCSFileOperations import CCSFileOperations
+from CCSCommonTasks.CCSModelRegistry import CCSModelRegistry
 from CCSCommonTasks.CCSDataLoader import CCSDataLoader
 from CCSCommonTasks.CCSEda import CCSEda
 from CCSCommonTasks.CCSFeatureEngineering import CCSFeatureEngineering
 from CCSCommonTasks.CCSFeatureSelection import CCSFeatureSelection
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSPredictionPipeline:
@@ -21,26 +24,35 @@ class CCSPredictionPipeline:
     Version: 1.0
     """
 
-    def __init__(self):
+    # The thread pool running the per cluster predictions is shared by all instances of the process.
+    _cluster_pool = None
+    _cluster_pool_key = None
+    _cluster_pool_lock = threading.Lock()
+
+    def __init__(self, workspace="", cluster_threads=None):
         """
         :Method Name: __init__
         :Description: This constructor sets up the logging feature and paths where the models and
                       relevant information are stored
+        :param workspace: directory of the job in which the data to predict on and the result are stored.
+        :param cluster_threads: number of threads predicting the clusters concurrently, 1 to predict them one
+                                after another. Read from CCS_CLUSTER_THREADS if None.
         :return: None
         """
 
         self.operation = 'PREDICTION'
+        self.workspace = workspace
+        self.result_file = os.path.join(workspace, "prediction_result.csv")
+        if cluster_threads is None:
+            cluster_threads = int(os.getenv("CCS_CLUSTER_THREADS", 1))
+        self.cluster_threads = cluster_threads
+        # Below this number of rows the cost of handing the clusters to the pool outweighs the gain.
+        self.parallel_min_rows = int(os.getenv("CCS_CLUSTER_PARALLEL_MIN_ROWS", 1000))
         if not os.path.isdir("CCSLogFiles/prediction/"):
             os.mkdir("CCSLogFiles/prediction")
         self.log_path = os.path.join("CCSLogFiles/prediction/", "CCSPredictionPipeline.txt")
 
-        self.ccs_prediction_pipeline_logging = logging.getLogger("ccs_prediction_pipeline_log")
-        self.ccs_prediction_pipeline_logging.setLevel(logging.INFO)
-        ccs_prediction_pipeline_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_prediction_pipeline_handler.setFormatter(formatter)
-        self.ccs_prediction_pipeline_logging.addHandler(ccs_prediction_pipeline_handler)
+        self.ccs_prediction_pipeline_logging = CCSLogger().ccs_get_logger(self.log_path)
 
         if not os.path.isdir("CCSModels/CCSMLModels/"):
             os.mkdir("CCSModels/CCSMLModels/")
@@ -65,65 +77,330 @@ class CCSPredictionPipeline:
             message = f"{self.operation}: Start of Prediction Pipeline"
             self.ccs_prediction_pipeline_logging.info(message)
 
-            data_loader = CCSDataLoader(is_training=False)
+            data_loader = CCSDataLoader(is_training=False, workspace=self.workspace)
             prediction_data = data_loader.ccs_get_data()
 
             message = f"{self.operation}: Data to predict on obtained"
             self.ccs_prediction_pipeline_logging.info(message)
 
+            prediction_data = self.ccs_predict_dataframe(prediction_data)
+            prediction_data.to_csv(self.result_file, header=True, index=False)
+
+            message = f"{self.operation}: End of EEPrediction Pipeline"
+            self.ccs_prediction_pipeline_logging.info(message)
+
+            return json.loads(prediction_data.to_json(orient="records"))
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while performing prediction on given data: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            raise e
+
+    def ccs_predict_in_blocks(self, block_size):
+        """
+        :Method Name: ccs_predict_in_blocks
+        :Description: This method reads and predicts on the client data one block of rows at a time. Only one
+                      block is held in memory at any time, so the memory used does not grow with the size of
+                      the file, and the result can be streamed to the client while the following blocks are
+                      still being predicted.
+
+        :param block_size: The number of rows predicted together
+        :return: generator of dataframes with the features and their predicted labels
+        :On Failure: Exception
+        """
+        try:
+            message = f"{self.operation}: Start of Prediction Pipeline in blocks of {block_size} rows"
+            self.ccs_prediction_pipeline_logging.info(message)
+
+            data_loader = CCSDataLoader(is_training=False, workspace=self.workspace)
+
+            for prediction_data in data_loader.ccs_get_data_in_chunks(block_size):
+                yield self.ccs_predict_dataframe(prediction_data)
+
+            message = f"{self.operation}: End of Prediction Pipeline in blocks"
+            self.ccs_prediction_pipeline_logging.info(message)
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while performing prediction in blocks: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            raise e
+
+    def ccs_predict_to_file(self, block_size, preview_rows):
+        """
+        :Method Name: ccs_predict_to_file
+        :Description: This method predicts on the client data block by block and appends every block to the
+                      result file. Only the first rows are kept in memory to be shown as a preview.
+
+        :param block_size: The number of rows predicted together
+        :param preview_rows: The number of rows to return for the preview
+        :return: preview - the first rows of the result as a list of records
+                 num_rows - the total number of rows predicted
+        :On Failure: Exception
+        """
+        try:
+            preview = []
+            num_rows = 0
+            with open(self.result_file, 'w', newline='') as f:
+                for block in self.ccs_predict_in_blocks(block_size):
+                    block.to_csv(f, header=num_rows == 0, index=False)
+                    if len(preview) < preview_rows:
+                        preview.extend(json.loads(block.head(preview_rows - len(preview)).to_json(orient="records")))
+                    num_rows += len(block)
+
+            message = f"{self.operation}: {num_rows} predictions saved to {self.result_file}"
+            self.ccs_prediction_pipeline_logging.info(message)
+
+            return preview, num_rows
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while saving predictions to file: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            raise e
+
+    def ccs_format_block(self, block, output_format, include_header):
+        """
+        :Method Name: ccs_format_block
+        :Description: This method serializes a block of predictions for a streamed response.
+
+        :param block: dataframe with the features and their predicted labels
+        :param output_format: 'csv' or 'ndjson'
+        :param include_header: Whether the csv header is written (only for the first block)
+        :return: The serialized block as a string
+        """
+        if output_format == "csv":
+            return block.to_csv(header=include_header, index=False)
+
+        text = block.to_json(orient="records", lines=True)
+        return text if text.endswith("\n") else text + "\n"
+
+    def ccs_format_error(self, error, output_format):
+        """
+        :Method Name: ccs_format_error
+        :Description: This method serializes the line ending a streamed response that failed, so the client can
+                      tell the download is incomplete.
+
+        :param error: The exception raised while streaming
+        :param output_format: 'csv' or 'ndjson'
+        :return: The serialized error line as a string
+        """
+        if output_format == "csv":
+            return f"# Error: the prediction failed and the results are incomplete: {str(error)}\n"
+
+        return json.dumps({"error": f"the prediction failed and the results are incomplete: {str(error)}"}) + "\n"
+
+    def ccs_stream_predictions(self, block_size, output_format, on_complete=None):
+        """
+        :Method Name: ccs_stream_predictions
+        :Description: This method predicts on the client data block by block and yields every block serialized
+                      as csv or ndjson as soon as it is predicted. The blocks are also saved, and the result file
+                      is only put in place once every block has been predicted and sent.
+                      The stream runs after the route has returned, so an error is logged here and the stream
+                      ends with an error line (see ccs_format_error).
+
+        :param block_size: The number of rows predicted together
+        :param output_format: 'csv' or 'ndjson'
+        :param on_complete: optional function without arguments called once the result file is saved
+        :return: generator of strings
+        """
+        temp_path = f"{self.result_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            num_rows = 0
+            with open(temp_path, 'w', newline='') as f:
+                for block in self.ccs_predict_in_blocks(block_size):
+                    block.to_csv(f, header=num_rows == 0, index=False)
+                    yield self.ccs_format_block(block, output_format, num_rows == 0)
+                    num_rows += len(block)
+            os.replace(temp_path, self.result_file)
+
+            message = f"{self.operation}: {num_rows} predictions streamed and saved to {self.result_file}"
+            self.ccs_prediction_pipeline_logging.info(message)
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while streaming the predictions: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            yield self.ccs_format_error(e, output_format)
+            return
+
+        finally:
+            # A stream cut short, e.g. by the client going away, leaves no partial result file behind.
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        # Every block has been sent, a failure from here on does not make the download incomplete.
+        if on_complete is not None:
+            try:
+                on_complete()
+            except Exception as e:
+                message = f"{self.operation}: The streamed predictions were saved, but the step after the stream " \
+                          f"failed: {str(e)}"
+                self.ccs_prediction_pipeline_logging.error(message)
+
+    def ccs_stream_result_file(self, block_size, output_format):
+        """
+        :Method Name: ccs_stream_result_file
+        :Description: This method yields the saved result file block by block, serialized as csv or ndjson.
+                      An error is logged and ends the stream with an error line (see ccs_format_error).
+
+        :param block_size: The number of rows read at a time
+        :param output_format: 'csv' or 'ndjson'
+        :return: generator of strings
+        """
+        try:
+            include_header = True
+            for block in pd.read_csv(self.result_file, chunksize=block_size):
+                yield self.ccs_format_block(block, output_format, include_header)
+                include_header = False
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while streaming the saved predictions: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            yield self.ccs_format_error(e, output_format)
+
+    def ccs_read_result_page(self, page, page_size):
+        """
+        :Method Name: ccs_read_result_page
+        :Description: This method reads one page of the saved result file for the paginated preview.
+
+        :param page: The page number, starting from 1. A page past the last one reads the last one.
+        :param page_size: The number of rows per page
+        :return: records - the rows of the page as a list of records
+                 num_rows - the total number of rows in the result file
+                 page - the page read
+        :On Failure: Exception
+        """
+        try:
+            with open(self.result_file, 'rb') as f:
+                num_rows = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1
+            page = min(max(page, 1), max(1, -(-num_rows // page_size)))
+
+            page_data = pd.read_csv(self.result_file, skiprows=range(1, (page - 1) * page_size + 1),
+                                    nrows=page_size)
+            return json.loads(page_data.to_json(orient="records")), num_rows, page
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while reading page {page} of the result: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            raise e
+
+    def ccs_predict_dataframe(self, prediction_data):
+        """
+        :Method Name: ccs_predict_dataframe
+        :Description: This method applies the fitted feature transforms and the cluster routed models to an
+                      in-memory dataframe. It neither reads nor writes any data file, which allows it to be used
+                      directly on rows received through the API.
+
+        :param prediction_data: pandas dataframe with the feature columns as per the prediction schema and
+                                optionally an 'id' column, which is not used as a feature
+        :return: the input features (without 'id') and their corresponding predicted labels as a dataframe
+        :On Failure: Exception
+        """
+        try:
+            prediction_data = prediction_data.reset_index(drop=True)
+            if 'id' in prediction_data.columns:
+                prediction_data = prediction_data.drop(columns=['id'])
+
+            # A single snapshot of the resident artifacts is used for the whole request so that a model reload
+            # finishing mid-prediction cannot mix models from two different training runs.
+            artifacts = CCSModelRegistry().ccs_get_artifacts()
+
             eda = CCSEda(is_training=False)
             feature_engineer = CCSFeatureEngineering(is_training=False)
             feature_selector = CCSFeatureSelection(is_training=False)
-            file_operator = CCSFileOperations()
 
-            features = feature_selector.ccs_remove_columns(prediction_data, 'id')
-            print(features.shape)
+            features = prediction_data
 
             is_null_present, columns_with_null = eda.ccs_features_with_missing_values(features)
 
             if is_null_present:
-                features = feature_engineer.ccs_handling_missing_data_mcar(features, columns_with_null)
-
-            with open(os.path.join(self.rel_info_dir, "columns_to_drop.txt")) as f:
-                val = f.read()
+                features = feature_engineer.ccs_handling_missing_data_mcar(features, columns_with_null,
+                                                                           imputer=artifacts["imputer"])
 
-            col_to_drop = val.split(",")
-            if col_to_drop[0] == '':
-                col_to_drop = []
-            print(len(col_to_drop), type(col_to_drop))
+            col_to_drop = artifacts["columns_to_drop"]
             features = feature_selector.ccs_remove_columns(features, col_to_drop)
-            # print(features.shape)
-            features = feature_engineer.ccs_standard_scaling_features(features)
-
-            cluster = file_operator.ccs_load_model(os.path.join(self.models_dir, "cluster.pickle"))
-
-            features['clusters'] = cluster.predict(features)
-            features['id'] = prediction_data['id']
-
-            result = []
+            features = feature_engineer.ccs_standard_scaling_features(features, scalar=artifacts["scalar"])
 
-            for i in features["clusters"].unique():
-                cluster_data = features[features["clusters"] == i]
-                id1 = cluster_data['id']
-                cluster_data = cluster_data.drop(columns=["clusters", 'id'])
-                model = file_operator.ccs_load_ml_model(i)
-                pred_result = list(model.predict(cluster_data))
-                result.extend(list(zip(id1, pred_result)))
+            cluster_labels = artifacts["cluster"].predict(features)
 
-            res_dataframe = pd.DataFrame(data=result, columns=["id", 'Concrete compressive strength(MPa, megapascals)'])
-            prediction_data = prediction_data.merge(right=res_dataframe, on='id', how='outer')
+            prediction_data['Concrete compressive strength(MPa, megapascals)'] = self.ccs_dispatch_clusters(
+                features, cluster_labels, artifacts["ml_models"])
 
             prediction_data = prediction_data.round(2)
-            prediction_data = prediction_data.drop(columns=["id"])
-            prediction_data.to_csv("prediction_result.csv", header=True, index=False)
 
-            message = f"{self.operation}: End of EEPrediction Pipeline"
+            message = f"{self.operation}: Prediction done on {len(prediction_data)} rows"
             self.ccs_prediction_pipeline_logging.info(message)
 
-            return json.loads(prediction_data.to_json(orient="records"))
+            return prediction_data
 
         except Exception as e:
             message = f"{self.operation}: There was an ERROR while performing prediction on given data: {str(e)}"
             self.ccs_prediction_pipeline_logging.error(message)
             raise e
 
+    def ccs_get_cluster_pool(self):
+        """
+        :Method Name: ccs_get_cluster_pool
+        :Description: This method returns the thread pool for the per cluster predictions. It is created on
+                      first use, and again in a forked worker process as threads do not survive a fork.
+        :return: ThreadPoolExecutor with cluster_threads threads
+        """
+        key = (os.getpid(), self.cluster_threads)
+        with CCSPredictionPipeline._cluster_pool_lock:
+            if CCSPredictionPipeline._cluster_pool_key != key:
+                if CCSPredictionPipeline._cluster_pool is not None and \
+                        CCSPredictionPipeline._cluster_pool_key[0] == os.getpid():
+                    CCSPredictionPipeline._cluster_pool.shutdown(wait=False)
+                CCSPredictionPipeline._cluster_pool = ThreadPoolExecutor(max_workers=self.cluster_threads,
+                                                                         thread_name_prefix="ccs_cluster")
+                CCSPredictionPipeline._cluster_pool_key = key
+            return CCSPredictionPipeline._cluster_pool
+
+    def ccs_dispatch_clusters(self, features, cluster_labels, ml_models):
+        """
+        :Method Name: ccs_dispatch_clusters
+        :Description: This method predicts every row with the model of the cluster it was assigned to. The rows
+                      are grouped by cluster with a single stable argsort, each group is predicted as one
+                      contiguous block and its predictions are written straight to the rows' positions in the
+                      output array, so the result is in the same order as the input without any merge. With
+                      more than one cluster thread the groups of large enough inputs are predicted concurrently.
+
+        :param features: The scaled features as a pandas dataframe
+        :param cluster_labels: The cluster assigned to each row of features
+        :param ml_models: dictionary of cluster number -> fitted model
+        :return: numpy array with the prediction of every row of features
+        :On Failure: Exception
+        """
+        try:
+            cluster_labels = np.asarray(cluster_labels)
+            values = features.to_numpy()
+
+            order = np.argsort(cluster_labels, kind="stable")
+            sorted_labels = cluster_labels[order]
+            # Positions in the sorted order where the cluster changes, i.e. the bounds of each group.
+            bounds = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(order)]))
+
+            groups = [(order[start:end], sorted_labels[start]) for start, end in zip(starts, ends) if start < end]
+
+            def predict_group(group):
+                rows, cluster_no = group
+                # The models were fitted on dataframes, so the feature names are kept for the block.
+                block = pd.DataFrame(values[rows], columns=features.columns)
+                return ml_models[cluster_no].predict(block)
+
+            if self.cluster_threads > 1 and len(groups) > 1 and len(order) >= self.parallel_min_rows:
+                # XGBoost and scikit-learn release the GIL while predicting, so the clusters run in parallel.
+                group_predictions = self.ccs_get_cluster_pool().map(predict_group, groups)
+            else:
+                group_predictions = map(predict_group, groups)
+
+            predictions = np.empty(len(order), dtype=np.float64)
+            for (rows, _), group_prediction in zip(groups, group_predictions):
+                predictions[rows] = group_prediction
+
+            return predictions
+
+        except Exception as e:
+            message = f"{self.operation}: There was an ERROR while dispatching the rows to the cluster models: {str(e)}"
+            self.ccs_prediction_pipeline_logging.error(message)
+            raise e
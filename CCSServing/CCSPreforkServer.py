@@ -0,0 +1,90 @@
+import gc
+import os
+from gunicorn.app.base import BaseApplication
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSPreforkServer(BaseApplication):
+    """
+    :Class Name: CCSPreforkServer
+    :Description: This class serves the flask application with gunicorn's pre-fork multi-worker server.
+                  The application (and with it the prediction models in the model registry) is loaded once in
+                  the master process before the workers are forked, so all the workers share those memory pages
+                  copy-on-write instead of each loading their own copy.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, app, host, port, workers, threads):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the gunicorn settings.
+
+        :param app: The already imported flask application
+        :param host: The interface to bind to
+        :param port: The port to bind to
+        :param workers: The number of worker processes
+        :param threads: The number of request handling threads per worker process
+        """
+
+        if not os.path.isdir("CCSLogFiles/"):
+            os.mkdir("CCSLogFiles/")
+        self.log_path = os.path.join("CCSLogFiles/", "CCSPreforkServer.txt")
+
+        self.ccs_prefork_server_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.application = app
+        self.options = {
+            "bind": f"{host}:{port}",
+            "workers": workers,
+            "threads": threads,
+            # gthread workers handle several requests concurrently in each process.
+            "worker_class": "gthread" if threads > 1 else "sync",
+            "preload_app": True,
+            # Training requests run ingestion synchronously before answering.
+            "timeout": int(os.getenv("CCS_WORKER_TIMEOUT", 300)),
+        }
+        super().__init__()
+
+    def load_config(self):
+        """
+        :Method Name: load_config
+        :Description: This method is called by gunicorn to obtain the server settings.
+        :return: None
+        """
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        """
+        :Method Name: load
+        :Description: This method is called by gunicorn to obtain the WSGI application.
+        :return: The flask application
+        """
+        return self.application
+
+    def ccs_serve(self):
+        """
+        :Method Name: ccs_serve
+        :Description: This method starts the master process which forks the workers and serves until stopped.
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            message = f"Starting pre-fork server with options {self.options}"
+            self.ccs_prefork_server_logging.info(message)
+
+            # Objects created so far (models included) are moved out of the garbage collector's reach, so the
+            # collector running in the workers does not touch, and thereby copy, the shared pages.
+            gc.collect()
+            if hasattr(gc, "freeze"):
+                gc.freeze()
+
+            self.run()
+
+        except Exception as e:
+            message = f"Error while running the pre-fork server: {str(e)}"
+            self.ccs_prefork_server_logging.error(message)
+            raise e
@@ -0,0 +1,46 @@
+from flask import Request
+
+
+class CCSUploadRequest(Request):
+    """
+    :Class Name: CCSUploadRequest
+    :Description: This class is the request of the flask application. The files of a multipart request are
+                  received straight into a CCSUploadStream of the upload cache instead of a temporary file, so
+                  they are hashed, their size capped and their format checked as the bytes arrive, and a rejected
+                  upload stops being received at once. The route then moves the file into its workspace with
+                  CCSUploadCache.ccs_save_upload, without copying it.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Settings shared by every request, see ccs_configure.
+    upload_cache = None
+    max_bytes = None
+    signatures = None
+
+    @staticmethod
+    def ccs_configure(upload_cache, max_bytes=None, signatures=None):
+        """
+        :Method Name: ccs_configure
+        :Description: This method sets the cache receiving the uploads and the checks applied to them.
+        :param upload_cache: CCSUploadCache, None to receive the uploads as flask does by default
+        :param max_bytes: The maximum size of an uploaded file, no limit if None
+        :param signatures: The leading bytes (magic numbers) of the accepted formats, any format if None
+        :return: None
+        """
+        CCSUploadRequest.upload_cache = upload_cache
+        CCSUploadRequest.max_bytes = max_bytes
+        CCSUploadRequest.signatures = signatures
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        """
+        :Method Name: _get_file_stream
+        :Description: This method is called by the form parser for every file of the request.
+        :return: CCSUploadStream the file is written to
+        """
+        if CCSUploadRequest.upload_cache is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return CCSUploadRequest.upload_cache.ccs_open_upload(max_bytes=CCSUploadRequest.max_bytes,
+                                                             signatures=CCSUploadRequest.signatures)
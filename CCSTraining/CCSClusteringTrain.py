@@ -1,8 +1,8 @@
 import os
-import logging
 from kneed import KneeLocator
 from sklearn.cluster import KMeans
 from CCSCommonTasks.CCSFileOperations import CCSFileOperations
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSClusteringTrain:
@@ -16,11 +16,12 @@ class CCSClusteringTrain:
     Version: 1.0
     """
 
-    def __init__(self):
+    def __init__(self, models_dir="CCSModels/"):
         """
         :Method Name: __init__
         :Description: This method is Constructor for class EEFeatureSelectionTrain.
                       Initializes variables for logging
+        :param models_dir: The directory in which the cluster model is saved
         """
 
         self.operation = 'TRAINING'
@@ -31,15 +32,9 @@ class CCSClusteringTrain:
             os.mkdir("CCSLogFiles/training/")
         self.log_path = "CCSLogFiles/training/CCSClusteringTrain.txt"
 
-        self.ccs_clustering_logging = logging.getLogger("ccs_clustering_log")
-        self.ccs_clustering_logging.setLevel(logging.INFO)
-        ccs_clustering_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_clustering_handler.setFormatter(formatter)
-        self.ccs_clustering_logging.addHandler(ccs_clustering_handler)
+        self.ccs_clustering_logging = CCSLogger().ccs_get_logger(self.log_path)
 
-        self.cluster_model_path = "CCSModels/"
+        self.cluster_model_path = models_dir
 
     def ccs_obtain_optimum_cluster(self, dataframe):
         """
@@ -1,12 +1,12 @@
 import os
 import numpy as np
-import logging
 from sklearn.linear_model import Ridge, Lasso
 from sklearn.svm import SVR
 from sklearn.ensemble import RandomForestRegressor
 from xgboost import XGBRegressor
 from sklearn.model_selection import GridSearchCV, KFold, RandomizedSearchCV
 from sklearn.metrics import r2_score
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSModelFinderTrain:
@@ -20,20 +20,19 @@ class CCSModelFinderTrain:
     Version: 1.0
     """
 
-    def __init__(self):
+    def __init__(self, progress_callback=None):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the estimators to search.
+        :param progress_callback: optional function(detail, fraction) called before the search of each model family
+        """
 
         if not os.path.isdir("CCSLogFiles/training/"):
             os.mkdir("CCSLogFiles/training/")
 
         self.log_path = "CCSLogFiles/training/CCSModelFinderTrain.txt"
 
-        self.ccs_model_finder_logging = logging.getLogger("ccs_model_finder_log")
-        self.ccs_model_finder_logging.setLevel(logging.INFO)
-        ccs_model_finder_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_model_finder_handler.setFormatter(formatter)
-        self.ccs_model_finder_logging.addHandler(ccs_model_finder_handler)
+        self.ccs_model_finder_logging = CCSLogger().ccs_get_logger(self.log_path)
 
         self.operation = 'TRAINING'
 
@@ -43,6 +42,18 @@ class CCSModelFinderTrain:
         self.lasso = Lasso()
         self.svr = SVR()
         self.kfold = KFold(shuffle=True, random_state=42)
+        self.progress_callback = progress_callback
+
+    def ccs_report_progress(self, detail, fraction):
+        """
+        :Method Name: ccs_report_progress
+        :Description: This method reports the progress of the model search to the progress callback, if any.
+        :param detail: The step of the search which is starting
+        :param fraction: The fraction of the search completed
+        :return: None
+        """
+        if self.progress_callback is not None:
+            self.progress_callback(detail, fraction)
 
     def ccs_adj_r2(self, estimator, x, y_true):
         """
@@ -407,6 +418,7 @@ class CCSModelFinderTrain:
 
             message = f"{self.operation}: Search for best ridge model started"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("ridge search", 0 / 5)
 
             self.ridge = self.ccs_best_ridge_regressor(train_x, train_y)
             r2_adj["ridge"] = self.ccs_adj_r2(self.ridge, test_x, test_y)
@@ -416,6 +428,7 @@ class CCSModelFinderTrain:
 
             message = f"{self.operation}: Search for best lasso model started"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("lasso search", 1 / 5)
 
             self.lasso = self.ccs_best_lasso_regressor(train_x, train_y)
             r2_adj["lasso"] = self.ccs_adj_r2(self.lasso, test_x, test_y)
@@ -425,6 +438,7 @@ class CCSModelFinderTrain:
 
             message = f"{self.operation}: Search for best svr model started"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("svr search", 2 / 5)
 
             self.svr = self.ccs_best_svr(train_x, train_y)
             r2_adj["svr"] = self.ccs_adj_r2(self.svr, test_x, test_y)
@@ -434,6 +448,7 @@ class CCSModelFinderTrain:
 
             message = f"{self.operation}: Search for best random forest regressor model started"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("rfr search", 3 / 5)
 
             self.rfr = self.ccs_best_random_forest(train_x, train_y)
             r2_adj["rfr"] = self.ccs_adj_r2(self.rfr, test_x, test_y)
@@ -443,12 +458,14 @@ class CCSModelFinderTrain:
 
             message = f"{self.operation}: Search for best xgb regressor model started"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("xgb search", 4 / 5)
 
             self.xgb = self.ccs_best_xgb_regressor(train_x, train_y)
             r2_adj["xgb"] = self.ccs_adj_r2(self.xgb, test_x, test_y)
 
             message = f"{self.operation}: Search for best xgb regressor model ended"
             self.ccs_model_finder_logging.info(message)
+            self.ccs_report_progress("best model selection", 1.0)
 
             return self.ccs_best_model_from_adj_r2(r2_adj)
 
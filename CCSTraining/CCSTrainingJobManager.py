@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is not available on Windows, training is then only serialized within a process.
+    fcntl = None
+
+from CCSCommonTasks.CCSModelRegistry import CCSModelRegistry
+from CCSCommonTasks.CCSLogger import CCSLogger
+
+
+class CCSTrainingCancelled(Exception):
+    """
+    Raised from the progress callback inside the training pipeline when its job has been cancelled.
+    """
+
+
+class CCSTrainingJobManager:
+    """
+    :Class Name: CCSTrainingJobManager
+    :Description: This class runs each training upload as a queued job on a bounded executor. Only one training
+                  runs at a time, also across worker processes, as every training replaces the shared models in
+                  CCSModels. The status of each job, with its per stage progress, is kept in CCSJobs/<job id>.json
+                  so that it can be polled from any worker process, and a job can be cancelled while queued or
+                  running.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # The executor and the futures of the jobs submitted by this process are shared by all instances.
+    _executor = None
+    _executor_pid = None
+    _futures = {}
+    _lock = threading.Lock()
+
+    def __init__(self, max_queued_jobs=4, jobs_dir="CCSJobs", models_dir="CCSModels/", rel_info_dir="CCSRelInfo/"):
+        """
+        :Method Name: __init__
+        :Description: This constructor sets up the logging feature and the paths used by the jobs.
+
+        :param max_queued_jobs: The maximum number of jobs of this process which can be queued or running
+        :param jobs_dir: The directory in which the status of the jobs is stored
+        :param models_dir: The directory of the models being served, replaced when a job completes
+        :param rel_info_dir: The directory of the columns to drop being served, updated when a job completes
+        """
+
+        if not os.path.isdir("CCSLogFiles/training/"):
+            os.mkdir("CCSLogFiles/training")
+        self.log_path = os.path.join("CCSLogFiles/training/", "CCSTrainingJobManager.txt")
+
+        self.ccs_training_job_logging = CCSLogger().ccs_get_logger(self.log_path)
+
+        self.max_queued_jobs = max_queued_jobs
+        self.jobs_dir = jobs_dir
+        if not os.path.isdir(self.jobs_dir):
+            os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self.models_dir = models_dir
+        self.rel_info_dir = rel_info_dir
+        self.lock_path = os.path.join(self.jobs_dir, "training.lock")
+        # The lock of the models read by CCSModelRegistry, held while they are replaced.
+        self.models_lock_path = f"{self.models_dir.rstrip('/')}.lock"
+
+    def ccs_job_path(self, job_id, extension="json"):
+        """
+        :Method Name: ccs_job_path
+        :Description: This method returns the path of a file of the given job.
+        :param job_id: The id of the job
+        :param extension: 'json' for the status file, 'cancel' for the cancellation flag
+        :return: The path of the file
+        :On Failure: ValueError
+        """
+        # The id is used to build a path, so only ids generated by this class are accepted.
+        if len(job_id) != 32 or any(char not in "0123456789abcdef" for char in job_id):
+            raise ValueError(f"Invalid job id {job_id}")
+        return os.path.join(self.jobs_dir, f"{job_id}.{extension}")
+
+    def ccs_write_status(self, job_id, **changes):
+        """
+        :Method Name: ccs_write_status
+        :Description: This method updates the status file of a job. The file is replaced atomically so that
+                      readers in other processes never see a partially written status.
+        :param job_id: The id of the job
+        :param changes: The fields of the status to update
+        :return: The updated status
+        """
+        status = self.ccs_get_job(job_id) or {"job_id": job_id, "history": []}
+        status.update(changes)
+        status["updated_at"] = time.time()
+        if "stage" in changes:
+            status["history"].append([status["updated_at"], changes["stage"], changes.get("detail", "")])
+
+        temp_path = f"{self.ccs_job_path(job_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(temp_path, self.ccs_job_path(job_id))
+        return status
+
+    def ccs_get_job(self, job_id):
+        """
+        :Method Name: ccs_get_job
+        :Description: This method returns the status of a job.
+        :param job_id: The id of the job
+        :return: The status dictionary, or None if there is no such job
+        :On Failure: ValueError
+        """
+        try:
+            with open(self.ccs_job_path(job_id)) as f:
+                return json.load(f)
+        except OSError:
+            return None
+
+    def ccs_submit_job(self, workspace):
+        """
+        :Method Name: ccs_submit_job
+        :Description: This method queues a training job on the data validated in the given workspace.
+
+        :param workspace: The directory of the upload holding the validated data
+        :return: The id of the job
+        :On Failure: RuntimeError if too many jobs are already waiting, Exception
+        """
+        try:
+            with CCSTrainingJobManager._lock:
+                if CCSTrainingJobManager._executor is None or CCSTrainingJobManager._executor_pid != os.getpid():
+                    CCSTrainingJobManager._executor = ThreadPoolExecutor(max_workers=1)
+                    CCSTrainingJobManager._executor_pid = os.getpid()
+                    CCSTrainingJobManager._futures = {}
+
+                # Only the futures of the jobs still queued or running are kept.
+                CCSTrainingJobManager._futures = {queued_job_id: future for queued_job_id, future
+                                                  in CCSTrainingJobManager._futures.items() if not future.done()}
+                pending = list(CCSTrainingJobManager._futures.values())
+                if len(pending) >= self.max_queued_jobs:
+                    raise RuntimeError(f"{len(pending)} training jobs are already waiting, try again later")
+
+                job_id = uuid.uuid4().hex
+                self.ccs_write_status(job_id, state="queued", stage="queued", detail="", progress=0.0,
+                                      submitted_at=time.time(), error=None)
+                CCSTrainingJobManager._futures[job_id] = CCSTrainingJobManager._executor.submit(
+                    self.ccs_run_job, job_id, workspace)
+
+            message = f"Training job {job_id} queued for workspace {workspace}"
+            self.ccs_training_job_logging.info(message)
+
+            return job_id
+
+        except Exception as e:
+            message = f"Error while queueing a training job: {str(e)}"
+            self.ccs_training_job_logging.error(message)
+            raise e
+
+    def ccs_cancel_job(self, job_id):
+        """
+        :Method Name: ccs_cancel_job
+        :Description: This method cancels a queued or running job. A running job stops at its next progress
+                      report; the flag file makes this work whichever worker process runs the job.
+
+        :param job_id: The id of the job
+        :return: The status of the job, or None if there is no such job
+        """
+        status = self.ccs_get_job(job_id)
+        if status is None or status["state"] in ("completed", "failed", "cancelled"):
+            return status
+
+        cancel_path = self.ccs_job_path(job_id, "cancel")
+        with open(cancel_path, 'w'):
+            pass
+
+        future = CCSTrainingJobManager._futures.get(job_id)
+        if future is not None and future.cancel():
+            status = self.ccs_write_status(job_id, state="cancelled", stage="cancelled", detail="cancelled while queued")
+        else:
+            status = self.ccs_get_job(job_id)
+        # The flag is only needed by a job which has yet to end, e.g. not by one which ended meanwhile.
+        if status["state"] in ("completed", "failed", "cancelled") and os.path.exists(cancel_path):
+            os.remove(cancel_path)
+
+        message = f"Cancellation of training job {job_id} requested"
+        self.ccs_training_job_logging.info(message)
+
+        return status
+
+    def ccs_progress_callback(self, job_id):
+        """
+        :Method Name: ccs_progress_callback
+        :Description: This method returns the callback through which the training pipeline reports its progress.
+                      The callback raises CCSTrainingCancelled if the job has been cancelled in the meantime.
+
+        :param job_id: The id of the job
+        :return: function(stage, detail, progress)
+        """
+        cancel_path = self.ccs_job_path(job_id, "cancel")
+
+        def progress_callback(stage, detail, progress):
+            if os.path.exists(cancel_path):
+                raise CCSTrainingCancelled(f"Training job {job_id} was cancelled")
+            self.ccs_write_status(job_id, stage=stage, detail=detail, progress=round(progress, 4))
+
+        return progress_callback
+
+    def ccs_staging_dirs(self, job_id):
+        """
+        :Method Name: ccs_staging_dirs
+        :Description: This method returns the directories in which a job saves its models before they are moved
+                      into place. They are next to the served ones, so that they are moved by a rename.
+        :param job_id: The id of the job
+        :return: staging directory of the models, staging directory of the columns to drop
+        """
+        return (f"{self.models_dir.rstrip('/')}.{job_id}.tmp/", f"{self.rel_info_dir.rstrip('/')}.{job_id}.tmp/")
+
+    def ccs_replace_models(self, staged_models_dir, staged_rel_info_dir):
+        """
+        :Method Name: ccs_replace_models
+        :Description: This method moves the models of a completed job in place of the served ones. The served
+                      directory is renamed aside, the staged one renamed in its place and the old one deleted,
+                      then the columns to drop are replaced one file at a time. On disk there is thus a moment
+                      without any models, and one with the new models and the previous columns to drop, so the
+                      models lock is held exclusively throughout: CCSModelRegistry reads the models under the
+                      shared lock and sees either all the previous or all the new ones.
+        :param staged_models_dir: The directory in which the job saved its models
+        :param staged_rel_info_dir: The directory in which the job saved the columns to drop
+        :return: None
+        """
+        models_dir = self.models_dir.rstrip('/')
+        previous_models_dir = f"{models_dir}.{os.getpid()}.old"
+        with open(self.models_lock_path, 'a') as models_lock:
+            if fcntl is not None:
+                fcntl.flock(models_lock, fcntl.LOCK_EX)
+
+            shutil.rmtree(previous_models_dir, ignore_errors=True)
+            if os.path.isdir(models_dir):
+                os.replace(models_dir, previous_models_dir)
+            os.replace(staged_models_dir.rstrip('/'), models_dir)
+
+            if not os.path.isdir(self.rel_info_dir):
+                os.makedirs(self.rel_info_dir)
+            for filename in os.listdir(staged_rel_info_dir):
+                os.replace(os.path.join(staged_rel_info_dir, filename), os.path.join(self.rel_info_dir, filename))
+
+        shutil.rmtree(previous_models_dir, ignore_errors=True)
+
+    def ccs_run_job(self, job_id, workspace):
+        """
+        :Method Name: ccs_run_job
+        :Description: This method runs on the executor. It waits for any training in another process to finish
+                      and runs the training pipeline while recording its progress. The models are saved to a
+                      staging directory and only replace the served ones once the training completed, a cancelled
+                      or failed job leaves the previous models untouched.
+
+        :param job_id: The id of the job
+        :param workspace: The directory of the upload holding the validated data
+        :return: None
+        """
+        staged_models_dir, staged_rel_info_dir = self.ccs_staging_dirs(job_id)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            progress_callback = self.ccs_progress_callback(job_id)
+            progress_callback("waiting", "waiting for other training jobs to finish", 0.0)
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            self.ccs_write_status(job_id, state="running", started_at=time.time())
+            progress_callback("preparing", "preparing the staging directory of the models", 0.0)
+
+            # The models being served stay on disk and in the model registry while the new ones are trained.
+            shutil.rmtree(staged_models_dir, ignore_errors=True)
+            shutil.rmtree(staged_rel_info_dir, ignore_errors=True)
+
+            # The training stack (xgboost, the search estimators, kneed, ...) is only imported by the process
+            # actually running a training, prediction only workers never load it.
+            from CCSTraining.CCSTrainingPipeline import CCSTrainingPipeline
+
+            training_pipeline = CCSTrainingPipeline(workspace=workspace, models_dir=staged_models_dir,
+                                                    rel_info_dir=staged_rel_info_dir)
+            training_pipeline.ccs_model_train(progress_callback=progress_callback, publish=False)
+
+            # A cancellation is no longer possible once the models start being replaced.
+            progress_callback("publishing", "replacing the served models", 1.0)
+            self.ccs_replace_models(staged_models_dir, staged_rel_info_dir)
+            CCSModelRegistry().ccs_publish_artifacts()
+
+            self.ccs_write_status(job_id, state="completed", stage="completed", detail="", progress=1.0,
+                                  finished_at=time.time())
+            message = f"Training job {job_id} completed"
+            self.ccs_training_job_logging.info(message)
+
+        except CCSTrainingCancelled as e:
+            self.ccs_write_status(job_id, state="cancelled", stage="cancelled", detail=str(e),
+                                  finished_at=time.time())
+            message = f"Training job {job_id} cancelled"
+            self.ccs_training_job_logging.info(message)
+
+        except Exception as e:
+            self.ccs_write_status(job_id, state="failed", stage="failed", detail="", error=str(e),
+                                  finished_at=time.time())
+            message = f"Training job {job_id} failed: {str(e)}"
+            self.ccs_training_job_logging.error(message)
+
+        finally:
+            shutil.rmtree(staged_models_dir, ignore_errors=True)
+            shutil.rmtree(staged_rel_info_dir, ignore_errors=True)
+            # The cancellation flag of a job which has ended is not needed anymore.
+            cancel_path = self.ccs_job_path(job_id, "cancel")
+            if os.path.exists(cancel_path):
+                os.remove(cancel_path)
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
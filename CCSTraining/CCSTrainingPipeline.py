@@ -1,5 +1,4 @@
 import os
-import logging
 
 from sklearn.model_selection import train_test_split
 
@@ -8,8 +7,10 @@ from CCSCommonTasks.CCSDataLoader import CCSDataLoader
 from CCSCommonTasks.CCSEda import CCSEda
 from CCSCommonTasks.CCSFeatureEngineering import CCSFeatureEngineering
 from CCSCommonTasks.CCSFeatureSelection import CCSFeatureSelection
+from CCSCommonTasks.CCSModelRegistry import CCSModelRegistry
 from CCSTraining.CCSClusteringTrain import CCSClusteringTrain
 from CCSTraining.CCSModelFinderTrain import CCSModelFinderTrain
+from CCSCommonTasks.CCSLogger import CCSLogger
 
 
 class CCSTrainingPipeline:
@@ -23,48 +24,77 @@ class CCSTrainingPipeline:
     Version: 1.0
     """
 
-    def __init__(self):
+    def __init__(self, workspace="", models_dir="CCSModels/", rel_info_dir="CCSRelInfo/"):
         """
         :Method Name: __init__
         :Description: This constructor sets up the path variables where logs and models will be stored.
                       Sets up logging.
+        :param workspace: directory of the job in which the validated data is present.
+        :param models_dir: directory in which the scalar, imputer, cluster and ML models are saved.
+        :param rel_info_dir: directory in which the columns to drop are saved.
         """
         self.operation = 'TRAINING'
+        self.workspace = workspace
 
         if not os.path.isdir("CCSLogFiles/training/"):
             os.mkdir("CCSLogFiles/training")
         self.log_path = os.path.join("CCSLogFiles/training/", "CCSTrainingPipeline.txt")
 
-        self.ccs_training_pipeline_logging = logging.getLogger("ccs_training_pipeline_log")
-        self.ccs_training_pipeline_logging.setLevel(logging.INFO)
-        ccs_training_pipeline_handler = logging.FileHandler(self.log_path)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
-        ccs_training_pipeline_handler.setFormatter(formatter)
-        self.ccs_training_pipeline_logging.addHandler(ccs_training_pipeline_handler)
+        self.ccs_training_pipeline_logging = CCSLogger().ccs_get_logger(self.log_path)
 
-        if not os.path.isdir("CCSModels/CCSMLModels/"):
-            os.mkdir("CCSModels/CCSMLModels/")
-        self.ml_model_dir = "CCSModels/CCSMLModels/"
+        self.models_dir = models_dir
+        self.ml_model_dir = os.path.join(models_dir, "CCSMLModels/")
+        if not os.path.isdir(self.ml_model_dir):
+            os.makedirs(self.ml_model_dir)
+        self.cluster_dir = models_dir
 
-        if not os.path.isdir("CCSModels/"):
-            os.mkdir("CCSModels/")
-        self.cluster_dir = "CCSModels/"
+        if not os.path.isdir(rel_info_dir):
+            os.makedirs(rel_info_dir)
+        self.rel_info_dir = rel_info_dir
 
-        if not os.path.isdir("CCSRelInfo/"):
-            os.mkdir("CCSRelInfo/")
-        self.rel_info_dir = "CCSRelInfo/"
+    def ccs_ignore_progress(self, stage, detail, progress):
+        """
+        :Method Name: ccs_ignore_progress
+        :Description: This method is the progress callback used when the caller does not track the progress.
+        :return: None
+        """
+        pass
 
-    def ccs_model_train(self):
+    def ccs_cluster_progress(self, progress_callback, cluster_no, cluster_index, num_clusters):
+        """
+        :Method Name: ccs_cluster_progress
+        :Description: This method adapts the progress callback for the model search of one cluster. The first
+                      20% of the progress is preprocessing and clustering, the rest is shared equally among the
+                      clusters.
+        :param progress_callback: The progress callback of the whole training
+        :param cluster_no: The cluster whose models are searched
+        :param cluster_index: The position of this cluster in the order of training
+        :param num_clusters: The total number of clusters
+        :return: function(detail, fraction of the search of this cluster completed)
+        """
+        def cluster_progress(detail, fraction):
+            progress_callback("model search", f"cluster {cluster_no} ({cluster_index + 1}/{num_clusters}): {detail}",
+                              0.2 + 0.8 * (cluster_index + fraction) / num_clusters)
+
+        return cluster_progress
+
+    def ccs_model_train(self, progress_callback=None, publish=True):
         """
         :Method Name: ccs_model_train
         :Description: This method integrates all the relevant classes and their methods to perform
                       Data Preprocessing, Clustering and saving the best model for each of the cluster.
+        :param progress_callback: optional function(stage, detail, progress) called at every stage with the
+                                  fraction of the training completed. It may raise to abort the training.
+        :param publish: Whether the new models are loaded into the model registry once saved. False when they
+                        are saved to a staging directory which the caller moves into place and publishes.
         :return: None
         :On Failure: Exception
         """
 
         try:
+            if progress_callback is None:
+                progress_callback = self.ccs_ignore_progress
+
             message = f"{self.operation}: Start of Training Pipeline"
             self.ccs_training_pipeline_logging.info(message)
 
@@ -72,7 +102,7 @@ class CCSTrainingPipeline:
             self.ccs_training_pipeline_logging.info(message)
 
             # GETTING THE DATA
-            data_loader = CCSDataLoader(is_training=True)
+            data_loader = CCSDataLoader(is_training=True, workspace=self.workspace)
             validated_data = data_loader.ccs_get_data()
 
             message = f"{self.operation}: Validated Data Obtained"
@@ -82,9 +112,10 @@ class CCSTrainingPipeline:
 
             message = f"{self.operation}: Data Preprocessing started"
             self.ccs_training_pipeline_logging.info(message)
+            progress_callback("preprocessing", "", 0.0)
 
             eda = CCSEda(is_training=True)
-            feature_engineer = CCSFeatureEngineering(is_training=True)
+            feature_engineer = CCSFeatureEngineering(is_training=True, models_dir=self.models_dir)
             feature_selector = CCSFeatureSelection(is_training=True)
             file_operator = CCSFileOperations()
 
@@ -142,8 +173,9 @@ class CCSTrainingPipeline:
 
             message = f"{self.operation}: Data Clustering Started"
             self.ccs_training_pipeline_logging.info(message)
+            progress_callback("clustering", "", 0.1)
 
-            cluster = CCSClusteringTrain()
+            cluster = CCSClusteringTrain(models_dir=self.models_dir)
             num_clusters = cluster.ccs_obtain_optimum_cluster(features)
             features = cluster.ccs_create_cluster(features, num_clusters)
 
@@ -156,7 +188,7 @@ class CCSTrainingPipeline:
 
             # Training of Each Cluster
 
-            for i in list_of_cluster:
+            for cluster_index, i in enumerate(list_of_cluster):
                 message = f"{self.operation}: Start of Training for cluster {i}"
                 self.ccs_training_pipeline_logging.info(message)
 
@@ -165,7 +197,9 @@ class CCSTrainingPipeline:
                 cluster_label = cluster_data['Concrete compressive strength(MPa, megapascals)']
 
                 train_x, test_x, train_y, test_y = train_test_split(cluster_feature, cluster_label, random_state=42)
-                model_finder = CCSModelFinderTrain()
+                model_finder = CCSModelFinderTrain(
+                    progress_callback=self.ccs_cluster_progress(progress_callback, i, cluster_index,
+                                                                len(list_of_cluster)))
                 model_name, model = model_finder.ccs_best_model(train_x=train_x, train_y=train_y,
                                                                 test_x=test_x, test_y=test_y)
 
@@ -178,6 +212,13 @@ class CCSTrainingPipeline:
             message = f"{self.operation}: Successful End of Training "
             self.ccs_training_pipeline_logging.info(message)
 
+            if publish:
+                # The freshly saved artifacts replace the in-memory set used for predictions in one atomic swap.
+                CCSModelRegistry().ccs_publish_artifacts()
+
+                message = f"{self.operation}: New models loaded into the model registry for prediction"
+                self.ccs_training_pipeline_logging.info(message)
+
             message = f"{self.operation}: Training Pipeline Successfully Completed"
             self.ccs_training_pipeline_logging.info(message)
 
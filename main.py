@@ -1,21 +1,80 @@
 import os
-import shutil
-import threading
+import json
+import argparse
 from datetime import datetime
 from wsgiref import simple_server
-from flask import Flask, render_template, request, url_for
+from flask import Flask, Response, jsonify, render_template, request, url_for
 from flask_cors import cross_origin, CORS
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from CCSCommonTasks.CCSDataInjestionComplete import CCSDataInjestionComplete
-from CCSTraining.CCSTrainingPipeline import CCSTrainingPipeline
+from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
+from CCSCommonTasks.CCSDBSyncWorker import CCSDBSyncWorker
+from CCSCommonTasks.CCSLogger import CCSLogger
+from CCSCommonTasks.CCSModelRegistry import CCSModelRegistry
+from CCSCommonTasks.CCSUploadCache import CCSUploadCache
+from CCSCommonTasks.CCSWorkspace import CCSWorkspace
+from CCSTraining.CCSTrainingJobManager import CCSTrainingJobManager
 from CCSPrediction.CCSPredictionPipeline import CCSPredictionPipeline
+from CCSPrediction.CCSPredictionBatcher import CCSPredictionBatcher
+from CCSServing.CCSUploadRequest import CCSUploadRequest
 
 
 os.putenv('LANG', 'en_US.UTF-8')
 os.putenv('LC_ALL', 'en_US.UTF-8')
 
 app = Flask(__name__)
+app.request_class = CCSUploadRequest
 CORS(app)
 
+# Larger requests are refused before they are read. Uploads are received straight into the upload cache, hashed
+# and checked to be excel workbooks (xls: OLE2 compound file, xlsx: zip archive) from their first bytes as they
+# arrive, see CCSUploadRequest.
+MAX_UPLOAD_BYTES = int(float(os.getenv("CCS_MAX_UPLOAD_MB", 100)) * 1024 * 1024)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+EXCEL_SIGNATURES = (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", b"PK\x03\x04")
+
+if not os.path.isdir("CCSLogFiles/"):
+    os.mkdir("CCSLogFiles/")
+ccs_main_logging = CCSLogger().ccs_get_logger(os.path.join("CCSLogFiles/", "CCSMain.txt"))
+
+# Load the prediction models once at startup so that requests are served from memory.
+# No models exist before the first training run, in that case they are loaded on first use.
+try:
+    CCSModelRegistry().ccs_load_artifacts()
+except Exception as e:
+    ccs_main_logging.info(f"Models not loaded at startup, they are loaded on first use: {str(e)}")
+
+# Small /api/predict requests arriving together are coalesced and predicted as one batch.
+prediction_batcher = CCSPredictionBatcher(max_batch_size=int(os.getenv("CCS_BATCH_MAX_SIZE", 64)),
+                                          max_wait_ms=float(os.getenv("CCS_BATCH_WINDOW_MS", 5)))
+
+# Predictions on uploads are computed and streamed in blocks, the HTML view only shows one page at a time.
+PREDICTION_BLOCK_SIZE = int(os.getenv("CCS_PREDICTION_BLOCK_SIZE", 10000))
+PREVIEW_PAGE_SIZE = int(os.getenv("CCS_PREVIEW_PAGE_SIZE", 100))
+STREAM_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Training uploads are queued and run one at a time in the background.
+training_job_manager = CCSTrainingJobManager(max_queued_jobs=int(os.getenv("CCS_MAX_QUEUED_TRAINING_JOBS", 4)))
+
+# Uploads are hashed while they are received, a workbook submitted again reuses its verdict, dataset and predictions.
+upload_cache = CCSUploadCache()
+CCSUploadRequest.ccs_configure(upload_cache, max_bytes=MAX_UPLOAD_BYTES, signatures=EXCEL_SIGNATURES)
+UPLOAD_CACHE_TTL_HOURS = float(os.getenv("CCS_UPLOAD_CACHE_TTL_HOURS", 24 * 7))
+
+# The validated uploads are loaded into the database one at a time by a single worker, the latest upload wins.
+db_sync_worker = CCSDBSyncWorker()
+
+
+def ccs_new_workspace():
+    """
+    Creates the isolated working directory of a new upload and clears out the ones left behind by old jobs.
+    Workspaces are kept for a while after the response as the database sync and training still use them.
+    """
+    workspace = CCSWorkspace()
+    workspace.ccs_remove_stale_workspaces(max_age_hours=float(os.getenv("CCS_WORKSPACE_TTL_HOURS", 24)))
+    upload_cache.ccs_remove_stale_entries(max_age_hours=UPLOAD_CACHE_TTL_HOURS)
+    return workspace
+
 
 @app.route("/", methods=['GET'])
 @cross_origin()
@@ -36,36 +95,34 @@ def ccs_train_route():
                 dt_string = now.strftime("%d%m%Y_%H%M%S")
                 file_name = f"Concrete_Data_{dt_string}.xls"
 
-                if os.path.isdir("CCSUploadedFiles"):
-                    shutil.rmtree("CCSUploadedFiles")
-                    os.mkdir("CCSUploadedFiles")
-                else:
-                    os.mkdir("CCSUploadedFiles")
-
-                with open(os.path.join("CCSUploadedFiles", file_name), 'wb') as f:
-                    f.write(file_item.read())
+                workspace = ccs_new_workspace()
 
-                train_injestion_obj = CCSDataInjestionComplete(is_training=True, data_dir="CCSUploadedFiles")
-                train_injestion_obj.ccs_data_injestion_complete()
+                cache_key = upload_cache.ccs_save_upload(file_item.stream,
+                                                         os.path.join(workspace.upload_dir, file_name),
+                                                         max_bytes=MAX_UPLOAD_BYTES, signatures=EXCEL_SIGNATURES)
 
-                if os.path.isdir("CCSModels"):
-                    shutil.rmtree("CCSModels")
-                    os.mkdir("CCSModels")
-                else:
-                    os.mkdir("CCSModels")
+                train_injestion_obj = CCSDataInjestionComplete(is_training=True, data_dir=workspace.upload_dir,
+                                                               workspace=workspace.path, upload_cache=upload_cache,
+                                                               db_sync_worker=db_sync_worker)
+                train_injestion_obj.ccs_data_injestion_complete(cache_key=cache_key)
 
-                training_pipeline = CCSTrainingPipeline()
-                t2 = threading.Thread(target=training_pipeline.ccs_model_train)
-                t2.start()
-                print("AFTER THREAD T2 STARTED")
+                job_id = training_job_manager.ccs_submit_job(workspace.path)
+                job_url = url_for('ccs_job_status_route', job_id=job_id)
 
                 return render_template('train.html',
-                                       message="Dataset validated.Training Started. Visit the web Application after "
-                                               "1hr to perform prediction.", image_url=img_url)
+                                       message=f"Dataset validated. Training job {job_id} queued. Its progress can be "
+                                               f"followed at {job_url}", job_url=job_url, image_url=img_url)
 
             else:
                 message = "No records Found\n TRY AGAIN"
                 return render_template("train.html", message=message, image_url=img_url)
+    except RequestEntityTooLarge:
+        message = f"ERROR: The upload is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB\n TRY AGAIN"
+        return render_template('train.html', message=message, image_url=img_url), 413
+
+    except UnsupportedMediaType as e:
+        return render_template('train.html', message=f"ERROR: {e.description}\n TRY AGAIN", image_url=img_url), 415
+
     except ValueError as e:
         return render_template('train.html', message=f"ERROR: {str(e)}\n TRY AGAIN", image_url=img_url)
 
@@ -88,35 +145,39 @@ def ee_prediction_route():
                 dt_string = now.strftime("%d%m%Y_%H%M%S")
                 file_name = f"Concrete_Data_{dt_string}.xls"
 
-                if os.path.isdir("CCSUploadedFiles"):
-                    shutil.rmtree("CCSUploadedFiles")
-                    os.mkdir("CCSUploadedFiles")
-                else:
-                    os.mkdir("CCSUploadedFiles")
-
-                with open(os.path.join("CCSUploadedFiles", file_name), 'wb') as f:
-                    f.write(file_item.read())
+                workspace = ccs_new_workspace()
 
-                pred_injestion_obj = CCSDataInjestionComplete(is_training=False, data_dir="CCSUploadedFiles")
-                pred_injestion_obj.ccs_data_injestion_complete()
+                cache_key = upload_cache.ccs_save_upload(file_item.stream,
+                                                         os.path.join(workspace.upload_dir, file_name),
+                                                         max_bytes=MAX_UPLOAD_BYTES, signatures=EXCEL_SIGNATURES)
 
-                pred_pipeline = CCSPredictionPipeline()
-                result = pred_pipeline.ccs_predict()
+                pred_injestion_obj = CCSDataInjestionComplete(is_training=False, data_dir=workspace.upload_dir,
+                                                              workspace=workspace.path, upload_cache=upload_cache,
+                                                              db_sync_worker=db_sync_worker)
+                pred_injestion_obj.ccs_data_injestion_complete(cache_key=cache_key)
 
-                print(result)
-
-                return render_template("predict.html", records=result, image_url=img_url)
+                return ccs_prediction_response(workspace, img_url, cache_key=cache_key)
 
             else:
                 message = "Using Default CCSPrediction Dataset"
 
-                pred_injestion = CCSDataInjestionComplete(is_training=False, data_dir="CCSPredictionDatasets")
-                pred_injestion.ccs_data_injestion_complete()
+                workspace = ccs_new_workspace()
+                cache_key = upload_cache.ccs_hash_directory("CCSPredictionDatasets")
+
+                pred_injestion = CCSDataInjestionComplete(is_training=False, data_dir="CCSPredictionDatasets",
+                                                          workspace=workspace.path, upload_cache=upload_cache,
+                                                          db_sync_worker=db_sync_worker)
+                pred_injestion.ccs_data_injestion_complete(cache_key=cache_key)
 
-                pred_pipeline = CCSPredictionPipeline()
-                result = pred_pipeline.ccs_predict()
+                return ccs_prediction_response(workspace, img_url, message=message, cache_key=cache_key)
 
-                return render_template("predict.html", message=message, records=result, image_url=img_url)
+    except RequestEntityTooLarge:
+        message = f"Error: The upload is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB\nTry Again"
+        return render_template("predict.html", message=message, image_url=img_url), 413
+
+    except UnsupportedMediaType as e:
+        message = f"Error: {e.description}\nTry Again"
+        return render_template("predict.html", message=message, image_url=img_url), 415
 
     except ValueError as e:
         message = f"Value Error: {str(e)}\nTry Again"
@@ -131,6 +192,184 @@ def ee_prediction_route():
         return render_template("predict.html", message=message, image_url=img_url)
 
 
+def ccs_prediction_response(workspace, img_url, message=None, cache_key=None):
+    """
+    Predicts on the data ingested in the workspace. If the form asks for a 'csv' or 'ndjson' output the predictions
+    are streamed as a download while they are computed. Otherwise they are saved to the result file of the workspace
+    and only the first page is rendered, with links to the following pages and to the full download.
+    If the upload (cache_key) has been predicted before with the current models, the cached results are used.
+    """
+    pred_pipeline = CCSPredictionPipeline(workspace=workspace.path)
+    output_format = request.form.get("output", "html")
+
+    model_version = CCSModelRegistry().ccs_read_version() if cache_key is not None else ""
+    cached_result = upload_cache.ccs_get_predictions(cache_key, model_version) if model_version else None
+    if cached_result is not None:
+        upload_cache.ccs_link(cached_result, pred_pipeline.result_file)
+
+    def ccs_cache_predictions():
+        # The results are only cached if the models were not replaced while predicting.
+        if model_version and model_version == CCSModelRegistry().ccs_read_version():
+            upload_cache.ccs_put_predictions(cache_key, model_version, pred_pipeline.result_file)
+
+    if output_format in STREAM_MIMETYPES:
+        if cached_result is not None:
+            blocks = pred_pipeline.ccs_stream_result_file(PREDICTION_BLOCK_SIZE, output_format)
+        else:
+            # The streamed results are saved as well and cached once the whole stream has been sent.
+            blocks = pred_pipeline.ccs_stream_predictions(PREDICTION_BLOCK_SIZE, output_format,
+                                                          on_complete=ccs_cache_predictions)
+        # The blocks are generated after this route returns, the generators log an error themselves and end
+        # the download with an error line.
+        return Response(blocks, mimetype=STREAM_MIMETYPES[output_format],
+                        headers={"Content-Disposition":
+                                 f"attachment; filename=prediction_result.{output_format}"})
+
+    if cached_result is not None:
+        records, num_rows, _ = pred_pipeline.ccs_read_result_page(1, PREVIEW_PAGE_SIZE)
+    else:
+        records, num_rows = pred_pipeline.ccs_predict_to_file(PREDICTION_BLOCK_SIZE, PREVIEW_PAGE_SIZE)
+        ccs_cache_predictions()
+
+    return render_template("predict.html", message=message, records=records, image_url=img_url,
+                           workspace_id=workspace.workspace_id, page=1, num_rows=num_rows,
+                           num_pages=max(1, -(-num_rows // PREVIEW_PAGE_SIZE)))
+
+
+@app.route('/prediction/<workspace_id>/page/<int:page>', methods=["GET"])
+@cross_origin()
+def ccs_prediction_page_route(workspace_id, page):
+    img_url = url_for('static', filename='ineuron-logo.webp')
+    try:
+        workspace = CCSWorkspace(workspace_id)
+        records, num_rows, page = CCSPredictionPipeline(workspace=workspace.path).ccs_read_result_page(
+            page, PREVIEW_PAGE_SIZE)
+        return render_template("predict.html", records=records, image_url=img_url,
+                               workspace_id=workspace_id, page=page, num_rows=num_rows,
+                               num_pages=max(1, -(-num_rows // PREVIEW_PAGE_SIZE)))
+
+    except Exception as e:
+        message = f"Error: {str(e)}\nTry Again"
+        return render_template("predict.html", message=message, image_url=img_url)
+
+
+@app.route('/prediction/<workspace_id>/download', methods=["GET"])
+@cross_origin()
+def ccs_prediction_download_route(workspace_id):
+    """
+    Streams the saved predictions of an earlier upload as csv (default) or ndjson (?format=ndjson).
+    """
+    output_format = request.args.get("format", "csv")
+    if output_format not in STREAM_MIMETYPES:
+        return jsonify(error=f"Value Error: Unknown format {output_format}"), 400
+
+    try:
+        workspace = CCSWorkspace(workspace_id)
+        pred_pipeline = CCSPredictionPipeline(workspace=workspace.path)
+        if not os.path.isfile(pred_pipeline.result_file):
+            raise ValueError(f"No predictions saved for {workspace_id}")
+        # A result file which cannot be read is answered with an error here instead of ending a started download.
+        open(pred_pipeline.result_file, 'rb').close()
+
+        return Response(pred_pipeline.ccs_stream_result_file(PREDICTION_BLOCK_SIZE, output_format),
+                        mimetype=STREAM_MIMETYPES[output_format],
+                        headers={"Content-Disposition":
+                                 f"attachment; filename=prediction_result.{output_format}"})
+
+    except ValueError as e:
+        return jsonify(error=f"Value Error: {str(e)}"), 404
+
+    except Exception as e:
+        return jsonify(error=f"Error: {str(e)}"), 500
+
+
+@app.route('/api/predict', methods=["POST"])
+@cross_origin()
+def ccs_api_prediction_route():
+    """
+    Machine facing prediction endpoint. The rows are sent either as a JSON list of objects (optionally wrapped
+    as {"records": [...]}) or as NDJSON with one object per line. They are validated and predicted in memory
+    without any of the file based ingestion. The response is NDJSON if the client accepts it, JSON otherwise.
+    """
+    try:
+        if request.mimetype in ("application/x-ndjson", "application/ndjson"):
+            records = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            records = json.loads(request.get_data(as_text=True))
+            if isinstance(records, dict):
+                records = records.get("records", [records])
+
+        validator = CCSDataFormatValidator(is_training=False, path=None)
+        prediction_data = validator.ccs_validate_records(records)
+
+        result = prediction_batcher.ccs_predict(prediction_data).to_dict(orient="records")
+
+        if request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == \
+                "application/x-ndjson":
+            return Response("".join(json.dumps(record) + "\n" for record in result),
+                            mimetype="application/x-ndjson")
+        return jsonify(records=result)
+
+    except RequestEntityTooLarge:
+        return jsonify(error=f"Error: The request is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"), 413
+
+    except ValueError as e:
+        return jsonify(error=f"Value Error: {str(e)}"), 400
+
+    except Exception as e:
+        return jsonify(error=f"Error: {str(e)}"), 500
+
+
+@app.route('/jobs/<job_id>', methods=["GET"])
+@cross_origin()
+def ccs_job_status_route(job_id):
+    """
+    Returns the status of a training job: its state (queued, running, completed, failed or cancelled), the current
+    stage with the fraction of the training completed, and the history of the stages.
+    """
+    try:
+        status = training_job_manager.ccs_get_job(job_id)
+        if status is None:
+            return jsonify(error=f"No job with id {job_id}"), 404
+        return jsonify(status)
+
+    except ValueError as e:
+        return jsonify(error=f"Value Error: {str(e)}"), 404
+
+    except Exception as e:
+        return jsonify(error=f"Error: {str(e)}"), 500
+
+
+@app.route('/jobs/<job_id>/cancel', methods=["POST"])
+@cross_origin()
+def ccs_job_cancel_route(job_id):
+    """
+    Cancels a queued or running training job. A running job stops at its next stage.
+    """
+    try:
+        status = training_job_manager.ccs_cancel_job(job_id)
+        if status is None:
+            return jsonify(error=f"No job with id {job_id}"), 404
+        return jsonify(status)
+
+    except ValueError as e:
+        return jsonify(error=f"Value Error: {str(e)}"), 404
+
+    except Exception as e:
+        return jsonify(error=f"Error: {str(e)}"), 500
+
+
+@app.route('/metrics', methods=["GET"])
+@cross_origin()
+def ccs_metrics_route():
+    """
+    Returns the metrics of the process answering the request as JSON: the depth of its database sync queue, the
+    table it is syncing and the counts of its syncs submitted, superseded by a newer upload, completed, failed and
+    retried. In pre-fork mode every worker process has its own sync queue and reports only that one.
+    """
+    return jsonify(db_sync=db_sync_worker.ccs_metrics())
+
+
 @app.route("/logs", methods=["POST"])
 @cross_origin()
 def ee_get_logs():
@@ -139,8 +378,16 @@ def ee_get_logs():
         if request.form is not None:
             log_type = request.form['log_type']
 
-            with open(os.path.join("CCSLogFiles/", log_type), "r") as f:
-                logs = f.readlines()
+            # The workers of the pre-fork server write to files of their own next to the one of the main process.
+            log_files = CCSLogger.ccs_log_files(os.path.join("CCSLogFiles/", log_type))
+            if not log_files:
+                return render_template("logs.html", message="No logs found", image_url=img_url)
+            logs = []
+            for log_file in log_files:
+                if len(log_files) > 1:
+                    logs.append(f"==> {os.path.basename(log_file)} <==")
+                with open(log_file, "r") as f:
+                    logs.extend(f.readlines())
             return render_template("logs.html", heading=log_type.split("/")[1], logs=logs, image_url=img_url)
         else:
             message = "No logs found"
@@ -154,6 +401,20 @@ def ee_get_logs():
 port = int(os.getenv("PORT", 5000))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concrete Compressive Strength web application")
+    parser.add_argument("--server", choices=["simple", "prefork"], default=os.getenv("CCS_SERVER", "simple"),
+                        help="'simple' serves one request at a time, 'prefork' runs multiple worker processes")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="number of worker processes in prefork mode")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("CCS_THREADS", 4)),
+                        help="number of threads per worker process in prefork mode")
+    args = parser.parse_args()
+
     host = '0.0.0.0'
-    httpd = simple_server.make_server(host, port, app)
-    httpd.serve_forever()
+    if args.server == "prefork":
+        from CCSServing.CCSPreforkServer import CCSPreforkServer
+        CCSPreforkServer(app, host=host, port=args.port, workers=args.workers, threads=args.threads).ccs_serve()
+    else:
+        httpd = simple_server.make_server(host, args.port, app)
+        httpd.serve_forever()
@@ -1,7 +1,37 @@
 import unittest
 
 from main import app
+import io
+import json
 import os
+import sys
+import uuid
+import hashlib
+import types
+import time
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+from unittest import mock
+
+from CCSCommonTasks.CCSLogger import CCSLogger
+from CCSCommonTasks.CCSSchemaValidator import CCSSchemaValidator
+from CCSCommonTasks.CCSSessionManager import CCSSessionManager
+from CCSCommonTasks.CCSDataFormatValidator import CCSDataFormatValidator
+from CCSCommonTasks.CCSDBOperation import CCSDBOperation
+from CCSCommonTasks.CCSSQLiteBackend import CCSSQLiteBackend
+from CCSCommonTasks.CCSDBSyncWorker import CCSDBSyncWorker
+from CCSCommonTasks.CCSModelRegistry import CCSModelRegistry
+from CCSCommonTasks.CCSWorkspace import CCSWorkspace
+from CCSCommonTasks.CCSColumnarStore import CCSColumnarStore
+from CCSCommonTasks.CCSUploadCache import CCSUploadCache
+from CCSCommonTasks.CCSDataInjestionComplete import CCSDataInjestionComplete
+from CCSTraining.CCSTrainingJobManager import CCSTrainingJobManager
+from CCSPrediction.CCSPredictionBatcher import CCSPredictionBatcher
+from CCSPrediction.CCSPredictionPipeline import CCSPredictionPipeline
 
 
 class TestToPerform(unittest.TestCase):
@@ -16,6 +46,513 @@ class TestToPerform(unittest.TestCase):
         print(response)
         self.assertEqual(response.status_code, 200)
 
+    def test_api_predict_rejects_invalid_records(self):
+        response = self.app.post('/api/predict', json=[{"Cement (component 1)(kg in a m^3 mixture)": "abc"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+    def test_api_predict_applies_the_schema_ranges(self):
+        with open("CCSSchemas/prediction_schema.json") as f:
+            column_names = list(json.load(f)["ColumnNames"])
+        record = {column: 1.0 for column in column_names}
+        record["Age (day)"] = -3.0
+        response = self.app.post('/api/predict', json=[record])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Record 0: Age (day): out of range", response.get_json()["error"])
+
+    def test_unknown_job_status(self):
+        response = self.app.get('/jobs/0123456789abcdef0123456789abcdef')
+        self.assertEqual(response.status_code, 404)
+
+    def test_prediction_rejects_upload_which_is_not_excel(self):
+        response = self.app.post('/prediction', data={'dataset': (io.BytesIO(b'a,b\n1,2\n'), 'data.xls')},
+                                 content_type='multipart/form-data')
+        self.assertIn(b"not a file of an accepted format", response.data)
+
+    def test_schema_validator_quarantines_only_bad_rows(self):
+        validator = CCSSchemaValidator("CCSSchemas/prediction_schema.json")
+        row = [540.0, 0.0, 0.0, 162.0, 2.5, 1040.0, 676.0, 28.0]
+        rows = pd.DataFrame([row, ["abc"] + row[1:], [-1.0] + row[1:], row], columns=validator.schema["column_names"])
+        good_rows, bad_rows = validator.ccs_validate_rows(rows)
+        self.assertEqual(list(good_rows.index), [0, 3])
+        self.assertEqual(len(bad_rows), 2)
+        self.assertIn("wrong datatype", bad_rows["reason"][1])
+        self.assertIn("out of range", bad_rows["reason"][2])
+
+    def test_session_manager_connects_once_and_reconnects_after_connection_loss(self):
+        from cassandra import OperationTimedOut
+        from cassandra.cluster import NoHostAvailable
+
+        class FakeSession:
+            is_shutdown = False
+
+            def execute(self, query):
+                pass
+
+        class FakeCluster:
+            connections = 0
+
+            def connect(self):
+                FakeCluster.connections += 1
+                return FakeSession()
+
+            def shutdown(self):
+                pass
+
+        CCSSessionManager.ccs_set_cluster_factory(FakeCluster)
+        try:
+            session = CCSSessionManager().ccs_get_session()
+            self.assertIs(CCSSessionManager().ccs_get_session(), session)
+            self.assertFalse(CCSSessionManager().ccs_invalidate(ValueError("bad row")))
+            self.assertFalse(CCSSessionManager().ccs_invalidate(OperationTimedOut("slow query")))
+            self.assertEqual(FakeCluster.connections, 1)
+
+            self.assertTrue(CCSSessionManager().ccs_invalidate(NoHostAvailable("lost", {})))
+            self.assertIsNot(CCSSessionManager().ccs_get_session(), session)
+            self.assertEqual(FakeCluster.connections, 2)
+        finally:
+            CCSSessionManager.ccs_set_cluster_factory(None)
+
+    def test_db_pipeline_runs_on_sqlite(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            validator = CCSDataFormatValidator(is_training=False, path=workspace, workspace=workspace)
+            column_names = validator.ccs_value_from_schema()[2]
+            rows = pd.DataFrame([[540.0, 0.0, 0.0, 162.0, 2.5, 1040.0, 676.0, 28.0]] * 5, columns=list(column_names))
+            rows.iloc[1, 1] = None
+
+            db_operator = CCSDBOperation(is_training=False, workspace=workspace, fetch_size=2,
+                                         storage_backend=CCSSQLiteBackend(os.path.join(workspace, "good.sqlite3")))
+            num_exported = db_operator.ccs_complete_db_pipeline(column_names, validator,
+                                                                {"data.xls": rows, "more_data.xls": rows.head(3)})
+
+            exported = pd.read_csv(db_operator.data_file)
+            self.assertEqual(list(exported.columns), ["id"] + list(column_names))
+            # The rows of the second file do not replace those of the first one.
+            self.assertEqual(num_exported, 8)
+            self.assertEqual(list(exported["id"]), list(range(8)))
+            self.assertTrue(pd.isna(exported.iloc[1, 2]))
+            self.assertEqual(exported.iloc[4, 1], 540.0)
+
+    def test_db_sync_worker_runs_latest_upload_and_retries(self):
+        synced = []
+        started = threading.Event()
+        release = threading.Event()
+
+        class FakeDBOperation:
+            operation = "TEST"
+            table_name = "test_sync_table"
+
+            def __init__(self, name, failures=0):
+                self.name = name
+                self.failures = failures
+
+            def ccs_complete_db_pipeline(self, column_names, data_format_validator, upload_files):
+                started.set()
+                release.wait(5)
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("database unavailable")
+                synced.append(self.name)
+
+        lock_dir = tempfile.mkdtemp()
+        worker = CCSDBSyncWorker(max_retries=2, backoff_seconds=0.01, lock_dir=lock_dir)
+        before = worker.ccs_metrics()
+        worker.ccs_submit(FakeDBOperation("first"), {}, None)
+        self.assertTrue(started.wait(5))
+        for name in ("second", "third", "latest"):
+            worker.ccs_submit(FakeDBOperation(name, failures=1 if name == "latest" else 0), {}, None)
+
+        response = self.app.get('/metrics')
+        self.assertEqual(response.get_json()["db_sync"]["queue_depth"], 1)
+
+        release.set()
+        self.assertTrue(worker.ccs_wait_idle(5))
+        after = worker.ccs_metrics()
+        self.assertEqual(synced, ["first", "latest"])
+        self.assertEqual(after["superseded"] - before["superseded"], 2)
+        self.assertEqual(after["retries"] - before["retries"], 1)
+        self.assertEqual(after["queue_depth"], 0)
+
+        # An upload older than the one another process has already loaded is skipped.
+        with open(os.path.join(lock_dir, "test_sync_table.synced"), 'w') as f:
+            f.write(repr(time.time() + 3600))
+        worker.ccs_submit(FakeDBOperation("older than another process"), {}, None)
+        self.assertTrue(worker.ccs_wait_idle(5))
+        self.assertEqual(synced, ["first", "latest"])
+        self.assertEqual(worker.ccs_metrics()["superseded"] - after["superseded"], 1)
+        shutil.rmtree(lock_dir)
+
+    def test_training_job_replaces_the_models_only_once_completed(self):
+        outcome = {}
+
+        class FakeTrainingPipeline:
+            def __init__(self, workspace, models_dir, rel_info_dir):
+                self.models_dir = models_dir
+                self.rel_info_dir = rel_info_dir
+
+            def ccs_model_train(self, progress_callback=None, publish=True):
+                os.makedirs(self.models_dir)
+                os.makedirs(self.rel_info_dir)
+                with open(os.path.join(self.models_dir, "model.sav"), 'w') as f:
+                    f.write(outcome["model"])
+                if outcome["cancel_path"]:
+                    open(outcome["cancel_path"], 'w').close()
+                if outcome["error"]:
+                    raise RuntimeError(outcome["error"])
+                progress_callback("training", "fake training", 0.5)
+
+        training_module = types.ModuleType("CCSTraining.CCSTrainingPipeline")
+        training_module.CCSTrainingPipeline = FakeTrainingPipeline
+
+        root = tempfile.mkdtemp()
+        manager = CCSTrainingJobManager(jobs_dir=os.path.join(root, "CCSJobs"),
+                                        models_dir=os.path.join(root, "CCSModels/"),
+                                        rel_info_dir=os.path.join(root, "CCSRelInfo/"))
+
+        def run_job(model, cancel=False, error=None):
+            job_id = uuid.uuid4().hex
+            cancel_path = manager.ccs_job_path(job_id, "cancel") if cancel else None
+            outcome.update(model=model, error=error, cancel_path=cancel_path)
+            manager.ccs_write_status(job_id, state="queued", stage="queued", detail="", progress=0.0)
+            manager.ccs_run_job(job_id, root)
+            return manager.ccs_get_job(job_id)
+
+        def served_model():
+            with open(os.path.join(root, "CCSModels", "model.sav")) as f:
+                return f.read()
+
+        with mock.patch.dict(sys.modules, {"CCSTraining.CCSTrainingPipeline": training_module}), \
+                mock.patch.object(CCSModelRegistry, "ccs_publish_artifacts") as publish_artifacts:
+            self.assertEqual(run_job("first")["state"], "completed")
+            self.assertEqual(served_model(), "first")
+
+            self.assertEqual(run_job("cancelled", cancel=True)["state"], "cancelled")
+            self.assertEqual(served_model(), "first")
+
+            status = run_job("failed", error="out of memory")
+            self.assertEqual((status["state"], status["error"]), ("failed", "out of memory"))
+            self.assertEqual(served_model(), "first")
+
+            self.assertEqual(run_job("second")["state"], "completed")
+            self.assertEqual(served_model(), "second")
+
+        self.assertEqual(publish_artifacts.call_count, 2)
+        # The staging directories and the cancellation flags of the jobs are removed.
+        self.assertEqual(sorted(os.listdir(root)), ["CCSJobs", "CCSModels", "CCSModels.lock", "CCSRelInfo"])
+        self.assertEqual([filename for filename in os.listdir(os.path.join(root, "CCSJobs"))
+                          if filename.endswith(".cancel")], [])
+        shutil.rmtree(root)
+
+    def test_prediction_batcher_coalesces_concurrent_requests(self):
+        batch_sizes = []
+
+        def fake_predict_dataframe(pipeline, prediction_data):
+            batch_sizes.append(len(prediction_data))
+            return prediction_data.assign(Predicted=prediction_data["x"] * 2)
+
+        # The window is long enough for the batch to be run only once it is full.
+        batcher = CCSPredictionBatcher(max_batch_size=6, max_wait_ms=5000)
+        requests = [pd.DataFrame({"x": [10.0 * n, 10.0 * n + 1]}) for n in range(3)]
+        results = [None] * len(requests)
+
+        def send(n):
+            results[n] = batcher.ccs_predict(requests[n])
+
+        with mock.patch.object(CCSPredictionPipeline, "ccs_predict_dataframe", fake_predict_dataframe):
+            threads = [threading.Thread(target=send, args=[n]) for n in range(len(requests))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+            self.assertEqual(batch_sizes, [6])
+            for request, result in zip(requests, results):
+                self.assertEqual(list(result["x"]), list(request["x"]))
+                self.assertEqual(list(result["Predicted"]), list(request["x"] * 2))
+
+            # A request filling a batch on its own is predicted directly.
+            batcher.ccs_predict(pd.DataFrame({"x": [float(n) for n in range(6)]}))
+            self.assertEqual(batch_sizes, [6, 6])
+
+    def test_workspaces_are_isolated_and_only_opened_by_valid_id(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            first = CCSWorkspace(root_dir=root_dir)
+            second = CCSWorkspace(root_dir=root_dir)
+            self.assertNotEqual(first.path, second.path)
+
+            # The intermediate files of two uploads are kept apart.
+            validators = [CCSDataFormatValidator(is_training=False, path=workspace.upload_dir,
+                                                 workspace=workspace.path) for workspace in (first, second)]
+            self.assertNotEqual(validators[0].columnar_path, validators[1].columnar_path)
+            self.assertNotEqual(validators[0].quarantine_file, validators[1].quarantine_file)
+            with open(os.path.join(first.upload_dir, "data.xls"), 'w') as f:
+                f.write("first")
+            self.assertEqual(os.listdir(second.upload_dir), [])
+
+            self.assertEqual(CCSWorkspace(first.workspace_id, root_dir=root_dir).path, first.path)
+            for workspace_id in ("../" + first.workspace_id, first.workspace_id.upper(), uuid.uuid4().hex, ""):
+                with self.assertRaises(ValueError):
+                    CCSWorkspace(workspace_id, root_dir=root_dir)
+
+            # Only the workspaces left untouched for long are removed, never the one of the current upload.
+            os.utime(second.path, (0, 0))
+            os.utime(first.path, (0, 0))
+            first.ccs_remove_stale_workspaces(max_age_hours=1)
+            self.assertEqual(os.listdir(root_dir), [first.workspace_id])
+
+    def test_prediction_pages_and_downloads_are_streamed_from_the_result_file(self):
+        workspace = CCSWorkspace()
+        result = pd.DataFrame({"Age (day)": [float(n) for n in range(23)], "Predicted": [n / 2 for n in range(23)]})
+        result.to_csv(os.path.join(workspace.path, "prediction_result.csv"), index=False)
+        url = f"/prediction/{workspace.workspace_id}"
+
+        try:
+            with mock.patch("main.PREDICTION_BLOCK_SIZE", 7), mock.patch("main.PREVIEW_PAGE_SIZE", 10):
+                downloaded = pd.read_csv(io.BytesIO(self.app.get(f"{url}/download").data))
+                self.assertEqual(len(downloaded), 23)
+                pd.testing.assert_frame_equal(downloaded, result)
+
+                lines = self.app.get(f"{url}/download?format=ndjson").data.decode().splitlines()
+                self.assertEqual([json.loads(line)["Predicted"] for line in lines], list(result["Predicted"]))
+
+                response = self.app.get(f"{url}/download?format=xml")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.get_json())
+
+                # A page past the last one shows the last page.
+                for page in (3, 12):
+                    response = self.app.get(f"{url}/page/{page}")
+                    self.assertIn(b"Showing page 3 of 3 (23 rows)", response.data)
+                    self.assertEqual(response.data.count(b"<tr>"), 1 + 3)
+        finally:
+            workspace.ccs_remove_workspace()
+
+    def fitted_artifacts(self, features):
+        """
+        Small prediction artifacts fitted on the given features, in place of the stored models, which depend on
+        the installed xgboost version.
+        """
+        from sklearn.cluster import KMeans
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+
+        scalar = StandardScaler().fit(features)
+        scaled = pd.DataFrame(scalar.transform(features), columns=features.columns)
+        cluster = KMeans(n_clusters=3, n_init=10, random_state=42).fit(scaled)
+        cluster_labels = cluster.predict(scaled)
+        target = features.sum(axis=1)
+        ml_models = {cluster_no: LinearRegression().fit(scaled[cluster_labels == cluster_no],
+                                                        target[cluster_labels == cluster_no])
+                     for cluster_no in range(3)}
+        return {"scalar": scalar, "imputer": None, "cluster": cluster, "ml_models": ml_models,
+                "columns_to_drop": []}
+
+    def test_block_wise_scoring_equals_whole_file_scoring(self):
+        workspace = CCSWorkspace()
+        prediction_data = pd.read_excel("CCSPredictionDatasets/Concrete_Data_30052022_094600.xls").head(250)
+        artifacts = self.fitted_artifacts(prediction_data)
+        prediction_data.insert(0, "id", range(len(prediction_data)))
+        prediction_data.to_csv(os.path.join(workspace.path, "prediction_file.csv"), index=False)
+
+        try:
+            with mock.patch.object(CCSModelRegistry, "ccs_get_artifacts", return_value=artifacts):
+                pred_pipeline = CCSPredictionPipeline(workspace=workspace.path)
+                whole_file = pd.DataFrame(pred_pipeline.ccs_predict())
+                blocks = list(pred_pipeline.ccs_predict_in_blocks(64))
+                preview, num_rows = pred_pipeline.ccs_predict_to_file(64, 10)
+
+            self.assertEqual([len(block) for block in blocks], [64, 64, 64, 58])
+            pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), whole_file, check_dtype=False)
+            self.assertEqual((len(preview), num_rows), (10, 250))
+            pd.testing.assert_frame_equal(pd.read_csv(pred_pipeline.result_file), whole_file, check_dtype=False)
+        finally:
+            workspace.ccs_remove_workspace()
+
+    def cluster_dispatch_inputs(self):
+        """
+        Scaled features, their clusters and a model per cluster whose prediction tells the cluster and row apart.
+        The models record the threads they predict on.
+        """
+        class FakeClusterModel:
+            threads = set()
+
+            def __init__(self, cluster_no):
+                self.cluster_no = cluster_no
+
+            def predict(self, block):
+                FakeClusterModel.threads.add(threading.current_thread().name)
+                return block.to_numpy() @ np.array([1.0, 10.0, 100.0]) + 1000 * self.cluster_no
+
+        generator = np.random.default_rng(0)
+        features = pd.DataFrame(generator.normal(size=(2000, 3)), columns=["a", "b", "c"])
+        cluster_labels = generator.choice([0, 1, 2, 5], size=len(features))
+        return features, cluster_labels, {cluster_no: FakeClusterModel(cluster_no) for cluster_no in (0, 1, 2, 5)}
+
+    def filter_and_merge(self, features, cluster_labels, ml_models):
+        """
+        The dispatch as it was done before the argsort: a filter per cluster, zipped with the ids and merged back.
+        """
+        features = features.assign(clusters=cluster_labels, id=range(len(features)))
+        result = []
+        for cluster_no in features["clusters"].unique():
+            cluster_data = features[features["clusters"] == cluster_no]
+            ids = cluster_data["id"]
+            cluster_data = cluster_data.drop(columns=["clusters", "id"])
+            result.extend(zip(ids, ml_models[cluster_no].predict(cluster_data)))
+
+        res_dataframe = pd.DataFrame(data=result, columns=["id", "prediction"])
+        merged = features[["id"]].merge(right=res_dataframe, on="id", how="outer")
+        return merged["prediction"].to_numpy()
+
+    def test_argsort_dispatch_equals_filter_and_merge_in_row_order(self):
+        features, cluster_labels, ml_models = self.cluster_dispatch_inputs()
+        expected = self.filter_and_merge(features, cluster_labels, ml_models)
+
+        predictions = CCSPredictionPipeline(cluster_threads=1).ccs_dispatch_clusters(features, cluster_labels,
+                                                                                      ml_models)
+        np.testing.assert_allclose(predictions, expected)
+        # Every row got the prediction of its own cluster's model.
+        np.testing.assert_array_equal(np.round(predictions / 1000), cluster_labels)
+
+    def test_thread_pool_dispatch_equals_filter_and_merge_in_row_order(self):
+        features, cluster_labels, ml_models = self.cluster_dispatch_inputs()
+        expected = self.filter_and_merge(features, cluster_labels, ml_models)
+        thread_names = type(ml_models[0]).threads
+        thread_names.clear()
+
+        pred_pipeline = CCSPredictionPipeline(cluster_threads=4)
+        pred_pipeline.parallel_min_rows = 1
+        predictions = pred_pipeline.ccs_dispatch_clusters(features, cluster_labels, ml_models)
+
+        np.testing.assert_allclose(predictions, expected)
+        self.assertTrue(thread_names)
+        self.assertTrue(all(name.startswith("ccs_cluster") for name in thread_names))
+
+        # Inputs below the threshold are predicted on the calling thread.
+        thread_names.clear()
+        pred_pipeline.parallel_min_rows = len(features) + 1
+        np.testing.assert_allclose(pred_pipeline.ccs_dispatch_clusters(features, cluster_labels, ml_models), expected)
+        self.assertEqual(thread_names, {threading.current_thread().name})
+
+    def test_columnar_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            rows = pd.DataFrame({"Cement": [540.0, None, 332.5, 198.6, 266.0], "Age (day)": [28, 28, 270, 365, 90]})
+            store = CCSColumnarStore(os.path.join(workspace, "prediction_data"))
+            self.assertFalse(store.ccs_exists())
+            store.ccs_write(rows, ["float", "int"])
+            self.assertTrue(store.ccs_exists())
+
+            num_rows, columns = store.ccs_open_columns()
+            self.assertEqual(num_rows, 5)
+            self.assertIsInstance(columns["Cement"], np.memmap)
+            self.assertEqual(columns["Age (day)"].dtype, np.int64)
+
+            expected = rows.reset_index().rename(columns={"index": "id"})
+            pd.testing.assert_frame_equal(store.ccs_read(), expected)
+            chunks = list(store.ccs_read_chunks(2))
+            self.assertEqual([list(chunk.index) for chunk in chunks], [[0, 1], [2, 3], [4]])
+            pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+            # A dataset written block by block is the same as one written at once.
+            chunked_store = CCSColumnarStore(os.path.join(workspace, "chunked_data"))
+            chunked_store.ccs_write_chunks([expected.head(3), expected.tail(2)], list(expected.columns),
+                                           {"id": "int", "Age (day)": "int"}, block_size=2)
+            pd.testing.assert_frame_equal(chunked_store.ccs_read(), expected)
+
+            store.ccs_export_csv(os.path.join(workspace, "prediction_file.csv"), chunk_size=2)
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(workspace, "prediction_file.csv")), expected)
+
+    def test_upload_cache_hit_miss_and_invalidation(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            cache = CCSUploadCache(os.path.join(root_dir, "cache"))
+            upload = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"workbook" * 1000
+            key = cache.ccs_save_upload(io.BytesIO(upload), os.path.join(root_dir, "data.xls"), chunk_size=100)
+            self.assertEqual(key, hashlib.sha256(upload).hexdigest())
+
+            self.assertIsNone(cache.ccs_get_verdict(key, False, "schema v1"))
+            os.makedirs(os.path.join(root_dir, "data"))
+            with open(os.path.join(root_dir, "data", "0.npy"), 'w') as f:
+                f.write("validated")
+            cache.ccs_put_entry(key, False, {"valid": True, "reason": "", "schema": "schema v1"},
+                                {"data": os.path.join(root_dir, "data"), "missing": os.path.join(root_dir, "none")})
+
+            self.assertTrue(cache.ccs_get_verdict(key, False, "schema v1")["valid"])
+            # Another schema, or the same upload for training, is a miss.
+            self.assertIsNone(cache.ccs_get_verdict(key, False, "schema v2"))
+            self.assertIsNone(cache.ccs_get_verdict(key, True, "schema v1"))
+
+            cache.ccs_restore_entry(key, False, {"data": os.path.join(root_dir, "restored")})
+            with open(os.path.join(root_dir, "restored", "0.npy")) as f:
+                self.assertEqual(f.read(), "validated")
+
+            # The cached predictions are only those of the model version they were predicted with.
+            with open(os.path.join(root_dir, "prediction_result.csv"), 'w') as f:
+                f.write("Predicted\n1.0\n")
+            cache.ccs_put_predictions(key, "models v1", os.path.join(root_dir, "prediction_result.csv"))
+            self.assertIsNotNone(cache.ccs_get_predictions(key, "models v1"))
+            self.assertIsNone(cache.ccs_get_predictions(key, "models v2"))
+            self.assertIsNone(cache.ccs_get_predictions(key, ""))
+
+    def test_cached_upload_is_not_validated_again_but_loaded_into_the_database(self):
+        db_sync_worker = mock.Mock()
+        with tempfile.TemporaryDirectory() as root_dir:
+            cache = CCSUploadCache(os.path.join(root_dir, "cache"))
+            cache_key = cache.ccs_hash_directory("CCSPredictionDatasets")
+
+            def ingest():
+                workspace = tempfile.mkdtemp(dir=root_dir)
+                shutil.copytree("CCSPredictionDatasets", os.path.join(workspace, "CCSUploadedFiles"))
+                CCSDataInjestionComplete(is_training=False, data_dir=os.path.join(workspace, "CCSUploadedFiles"),
+                                         workspace=workspace, validation_workers=1, upload_cache=cache,
+                                         db_sync_worker=db_sync_worker).ccs_data_injestion_complete(cache_key)
+                return CCSColumnarStore(os.path.join(workspace, "prediction_data")).ccs_read()
+
+            validated = ingest()
+            with mock.patch.object(CCSDataFormatValidator, "ccs_regex_file_name",
+                                   side_effect=AssertionError("validated again")):
+                pd.testing.assert_frame_equal(ingest(), validated)
+
+            self.assertEqual(db_sync_worker.ccs_submit.call_count, 2)
+            cached_upload = db_sync_worker.ccs_submit.call_args[0][3]
+            self.assertEqual(sum(len(rows) for rows in cached_upload.values()), len(validated))
+
+            # Once the schema changes the upload is validated again.
+            with mock.patch.object(CCSUploadCache, "ccs_hash_file", return_value="another schema"), \
+                    mock.patch.object(CCSDataFormatValidator, "ccs_regex_file_name",
+                                      side_effect=AssertionError("validated again")):
+                with self.assertRaisesRegex(AssertionError, "validated again"):
+                    ingest()
+
+    @unittest.skipUnless("forkserver" in multiprocessing.get_all_start_methods(), "needs the forkserver start method")
+    def test_logger_gives_forked_children_files_of_their_own(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_path = os.path.join(log_dir, "CCSTest.txt")
+            CCSLogger().ccs_get_logger(log_path).info("parent")
+
+            # The child is forked by the fork server, which has the logger imported, as a pre-fork server worker
+            # is forked from a master which has the application loaded. pytest itself is not forked.
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["CCSCommonTasks.CCSLogger"])
+            child = context.Process(target=log_in_forked_child, args=[log_path, os.path.join(log_dir, ".slots")])
+            child.start()
+            child.join(60)
+            self.assertEqual(child.exitcode, 0)
+
+            log_files = CCSLogger.ccs_log_files(log_path)
+            self.assertEqual([os.path.basename(log_file) for log_file in log_files],
+                             ["CCSTest.txt", "CCSTest.worker0.txt"])
+            with open(log_files[1]) as f:
+                self.assertIn("child", f.read())
+
+
+def log_in_forked_child(log_path, slot_dir):
+    """
+    Logs a record from a forked child process, see test_logger_gives_forked_children_files_of_their_own.
+    """
+    os.environ["CCS_LOG_SLOT_DIR"] = slot_dir
+    CCSLogger().ccs_get_logger(log_path).info("child")
+    CCSLogger.ccs_stop_listener()
+
 
 if __name__ == '__main__':
     unittest.main()